@@ -6,6 +6,8 @@ import sys
 
 from .benchmarks.run_benchmarks import benchmarks_parser, run_benchmarks
 from .benchmarks.logging_utils import configure_logger
+from .benchmarks.regression_utils import get_regressed_variants
+from .benchmarks.reextract_utils import reextract_benchmarks, reextract_parser
 from .load_lib_utils.cli import load_lib_build_parser, load_lib_builder_run
 from .testing.test_copyright import copyright_argparser, test_copyrights
 from .paperspace_utils import paperspace_parser, run_paperspace
@@ -30,6 +32,10 @@ def main(raw_args):
 
     benchmarks_subparser = subparsers.add_parser("benchmark", description="Run examples benchmarks")
     benchmarks_parser(benchmarks_subparser)
+    reextract_subparser = subparsers.add_parser(
+        "benchmark-reextract", description="Extract the metrics of a previous benchmarking run from its logs again"
+    )
+    reextract_parser(reextract_subparser)
     platform_assessment_subparser = subparsers.add_parser(
         "platform_assessment", description="Run applications benchmarks from arbitrary directories and platforms."
     )
@@ -53,7 +59,12 @@ def main(raw_args):
         load_lib_builder_run(args)
     elif args.subparser == "benchmark":
         configure_logger(args)
-        run_benchmarks(args)
+        results = run_benchmarks(args)
+        if get_regressed_variants(results):
+            sys.exit(1)
+    elif args.subparser == "benchmark-reextract":
+        configure_logger(args)
+        reextract_benchmarks(args)
     elif args.subparser == "platform_assessment":
         if "jupyter" in _MISSING_REQUIREMENTS:
             raise _MISSING_REQUIREMENTS["jupyter"][0] from _MISSING_REQUIREMENTS["jupyter"][1]
@@ -68,6 +79,7 @@ def main(raw_args):
             "Please select from one of:"
             "\n\t`load_lib_build`"
             "\n\t`benchmark`"
+            "\n\t`benchmark-reextract`"
             "\n\t`platform_assessment`"
             "\n\t`test_copyright`"
             "\n\t`paperspace`"
@@ -0,0 +1,156 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Optional, Union
+
+from examples_utils.benchmarks.command_utils import BenchmarkCommand
+
+# Get the module logger
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULTS_CACHE_DIR = Path.home().joinpath(".cache", "examples_utils", "benchmark_results")
+
+# Environment variables which depend on the shell the benchmarks were launched
+# from rather than on the benchmark itself
+VOLATILE_ENV_VARS = {
+    "_",
+    "DISPLAY",
+    "OLDPWD",
+    "PWD",
+    "SHLVL",
+    "SSH_AUTH_SOCK",
+    "SSH_CLIENT",
+    "SSH_CONNECTION",
+    "SSH_TTY",
+    "TERM",
+    "TMUX",
+    "TMUX_PANE",
+    "WINDOWID",
+    "XDG_SESSION_ID",
+    # The executable cache only changes how long compilation takes
+    "POPLAR_EXECUTABLE_CACHE_DIR",
+    "POPTORCH_CACHE_DIR",
+}
+
+CACHE_ENTRY_FILE = "cache_entry.json"
+CACHED_LOGS = ("stdout", "stderr")
+
+
+def hash_file(file_path: Optional[Union[str, Path]]) -> str:
+    """Get the sha256 hash of the content of a file, or '' if there is no file"""
+    if not file_path or not Path(file_path).exists():
+        return ""
+    return hashlib.sha256(Path(file_path).read_bytes()).hexdigest()
+
+
+def get_variant_fingerprint(
+    command: Union[str, BenchmarkCommand],
+    env: dict,
+    git_commit_hash: str,
+    sdk_version: str,
+    requirements_file: Optional[Union[str, Path]] = None,
+) -> str:
+    """Get a fingerprint of everything which determines the outcome of a variant.
+
+    Args:
+        command (str or BenchmarkCommand): The command as created by
+            `get_benchmark_command`, identified by its canonical hash so that
+            equivalent ways of writing it share a fingerprint
+        env (dict): The environment variables the variant is run with
+        git_commit_hash (str): The commit of the repository of the benchmark
+        sdk_version (str): The version of the Poplar SDK in use
+        requirements_file (str or Path): Python requirements of the benchmark
+
+    Returns:
+        fingerprint (str): sha256 digest identifying the variant
+
+    """
+
+    fingerprint_inputs = {
+        "command": BenchmarkCommand.parse(command).canonical_hash(),
+        "env": {k: v for k, v in env.items() if k not in VOLATILE_ENV_VARS},
+        "git_commit_hash": git_commit_hash,
+        "sdk_version": sdk_version,
+        "requirements": hash_file(requirements_file),
+    }
+    serialised = json.dumps(fingerprint_inputs, sort_keys=True)
+    return hashlib.sha256(serialised.encode()).hexdigest()
+
+
+def load_cached_result(cache_dir: Union[str, Path], fingerprint: str, variant_log_dir: Path) -> Optional[dict]:
+    """Restore the logs and result of a previous run of a variant.
+
+    Args:
+        cache_dir (str or Path): Directory containing the cached results
+        fingerprint (str): Fingerprint of the variant to restore
+        variant_log_dir (Path): Log directory of the variant, where the cached
+            logs are restored
+
+    Returns:
+        variant_result (dict): The cached result, or None if the variant has
+            not been cached
+
+    """
+
+    entry_dir = Path(cache_dir, fingerprint)
+    entry_file = entry_dir / CACHE_ENTRY_FILE
+    if not entry_file.exists() or not all((entry_dir / log).exists() for log in CACHED_LOGS):
+        return None
+
+    with open(entry_file) as f:
+        variant_result = json.load(f)
+    for log in CACHED_LOGS:
+        shutil.copyfile(entry_dir / log, variant_log_dir / log)
+
+    # Mark the entry as recently used for the eviction policy
+    os.utime(entry_dir)
+    logger.info(f"Reusing cached result {fingerprint} from {variant_result.get('start_time')}")
+    return variant_result
+
+
+def store_result(
+    cache_dir: Union[str, Path],
+    fingerprint: str,
+    variant_result: dict,
+    variant_log_dir: Path,
+    max_entries: Optional[int] = None,
+):
+    """Store the logs and result of a variant so that it can be reused.
+
+    Args:
+        cache_dir (str or Path): Directory containing the cached results
+        fingerprint (str): Fingerprint of the variant to store
+        variant_result (dict): Result of the variant
+        variant_log_dir (Path): Log directory of the variant
+        max_entries (int): Maximum number of cached results to keep, the least
+            recently used entries are removed first
+
+    """
+
+    entry_dir = Path(cache_dir, fingerprint)
+    entry_dir.mkdir(parents=True, exist_ok=True)
+    for log in CACHED_LOGS:
+        shutil.copyfile(variant_log_dir / log, entry_dir / log)
+    # Write the entry file last, an entry without it is incomplete
+    with open(entry_dir / CACHE_ENTRY_FILE, "w") as f:
+        json.dump(variant_result, f)
+    logger.info(f"Stored result of '{variant_result['variant_name']}' in cache as {fingerprint}")
+
+    if max_entries is not None:
+        evict_cache_entries(cache_dir, max_entries)
+
+
+def evict_cache_entries(cache_dir: Union[str, Path], max_entries: int):
+    """Remove the least recently used entries to keep at most `max_entries`"""
+    entries = sorted(
+        (p for p in Path(cache_dir).iterdir() if p.is_dir()),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for entry_dir in entries[max_entries:]:
+        logger.info(f"Evicting cached result {entry_dir.name}")
+        shutil.rmtree(entry_dir, ignore_errors=True)
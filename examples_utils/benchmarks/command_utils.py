@@ -1,16 +1,52 @@
 # Copyright (c) 2022 Graphcore Ltd. All rights reserved.
+import copy
+import hashlib
+import json
 import logging
 import os
 import re
 import subprocess
 from argparse import ArgumentParser, Namespace
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Tuple, Optional
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 import shlex
 
+from examples_utils.benchmarks.expression_utils import placeholder_regex
+from examples_utils.benchmarks.variant_utils import VariantSpace, iter_variants
+
 # Get the module logger
 logger = logging.getLogger(__name__)
 
+# Tokens which are the python interpreter, e.g. 'python3' or '/venv/bin/python3.8'
+PYTHON_INTERPRETER = re.compile(r"python[\d.]*")
+OPTION_PATTERN = re.compile("^[-]+")
+# Tokens which `shlex.split` leaves as they are
+UNQUOTED_TOKEN = re.compile(r"[^\s'\"\\]+")
+
+# Subset of the poprun options stored in the poprun configuration
+POPRUN_CONFIG_OPTIONS = [
+    ["-H", "--host"],
+    ["--num-instances"],
+    ["--vipu-server-host"],
+    ["--vipu-server-port"],
+    ["--vipu-partition"],
+    ["--num-ilds"],
+    ["--vipu-cluster", "--vipu-allocation"],
+    ["--synchronise-python-venv"],
+    ["--synchronise-poplar-sdk"],
+    ["--distribute-ssh-key"],
+    ["--mpi-global-args"],
+    ["--mpi-local-args"],
+    ["--host-subnet"],
+]
+
+# Report of the variants which were run once for several parameter combinations
+COALESCED_VARIANTS_FILE = "coalesced_variants.json"
+
+# vipu settings which prevent from running in compile-only mode
+COMPILE_ONLY_REMOVED_OPTIONS = ("--vipu-partition", "--vipu-server-host", "--vipu-server-port")
+
 
 def determine_variant_timeout(global_timeout: Optional[float], benchmark_dict):
     """Determine timeout for a benchmark variant,
@@ -54,7 +90,8 @@ def create_variants(benchmark_name: str, benchmark_dict: dict) -> list:
             - variant 3: batch_size=4, gradient_accumulation=150
             - variant 4: batch_size=4, gradient_accumulation=120
         Dicts can have varying numbers of values, the above rule will still
-        apply.
+        apply. Their values can also be given as a list, or generated with
+        'range', 'logspace' or 'pow2' (see `generate_values`).
 
     Args:
         benchmark_name (str): Benchmarks name as given in the spec yaml file
@@ -65,55 +102,30 @@ def create_variants(benchmark_name: str, benchmark_dict: dict) -> list:
 
     """
 
-    variants = [{}]
-    if "parameters" in benchmark_dict:
-        # Matching parameters as listed (see notes)
-        if isinstance(benchmark_dict["parameters"], list):
-            names = benchmark_dict["parameters"][0]
-
-            variants = []
-            for vals in benchmark_dict["parameters"][1:]:
-                new_variant = {}
-                for k, v in zip(names, vals):
-                    new_variant[k] = str(v)
-
-                variants.append(new_variant)
-
-        # Matching parameters by every possible combination
-        elif isinstance(benchmark_dict["parameters"], dict):
-            for name, valstr in benchmark_dict["parameters"].items():
-                current_variants = variants
-                variants = []
-
-                vals = str(valstr).split(",")
-                for v in vals:
-                    if v is not None:
-                        for c in current_variants:
-                            x = c.copy()
-                            x[name] = v
-                            variants.append(x)
-
-        else:
-            err = (
-                f"In {benchmark_name} in {benchmark_dict['benchmark_path']},"
-                " the 'parameters' are defined in neither a list style or "
-                "a dict style. They must be defined as one of the two "
-                "(using a comma seperated list, optionally surrounded by "
-                "square brackets, or as a dict, surrounded by curly "
-                "brackets)."
-            )
-            logger.error(err)
-            raise ValueError(err)
-
-    return variants
+    return list(VariantSpace(benchmark_name, benchmark_dict))
 
 
-def get_benchmark_variants(benchmark_name: str, benchmark_dict: dict) -> list:
+def get_benchmark_variants(
+    benchmark_name: str,
+    benchmark_dict: dict,
+    variant_filter: Optional[str] = None,
+    num_samples: Optional[int] = None,
+    sampling_method: str = "random",
+    seed: int = 0,
+    coalesce: bool = False,
+) -> list:
     """Get all named variations of a benchmark.
 
     Args:
         benchmark_name (str): Benchmarks name as given in the spec yaml file
         benchmark_dict (dict): benchmark entry itself in yaml file
+        variant_filter (str): Expression over the parameters selecting the
+            variants to run
+        num_samples (int): Number of variants to pick, all of them if None
+        sampling_method (str): 'random' or 'latin-hypercube'
+        seed (int): Seed of the sampling
+        coalesce (bool): Keep only the first of the variants which would run
+            the same thing, see `coalesce_variants`
 
     Returns:
         variations (list): List of all possible variants from this benchmark
@@ -121,54 +133,341 @@ def get_benchmark_variants(benchmark_name: str, benchmark_dict: dict) -> list:
     """
 
     # Create variants from benchmark
-    variant_names = create_variants(benchmark_name, benchmark_dict)
+    variant_names = iter_variants(benchmark_name, benchmark_dict, variant_filter, num_samples, sampling_method, seed)
+    variants = [{"name": get_variant_name(benchmark_name, variant), "config": variant} for variant in variant_names]
 
-    variants = []
-    for variant in variant_names:
-        work_str = benchmark_name
+    if coalesce:
+        variants = coalesce_variants(benchmark_name, benchmark_dict, variants)
 
-        for k in sorted(variant.keys()):
-            work_str += "_" + k + "_" + variant[k]
+    return variants
 
-        variants.append({"name": work_str, "config": variant})
 
-    return variants
+def get_variant_key(benchmark_dict: dict, variant_dict: dict) -> Optional[str]:
+    """Identify what a variant runs: its formatted command, the environment
+    variables of the benchmark and the parameters its derived metrics use.
+    None if the command cannot be formatted."""
+    try:
+        command = BenchmarkCommand.parse(benchmark_dict["cmd"].format(**variant_dict))
+    except (KeyError, IndexError, ValueError):
+        return None
 
+    derived_placeholders = set(placeholder_regex.findall(json.dumps(benchmark_dict.get("derived", {}))))
+    variant_key = {
+        "command": command.canonical_tokens(),
+        "env": benchmark_dict.get("env", {}),
+        "derived_params": {k: v for k, v in variant_dict.items() if k in derived_placeholders},
+    }
+    return json.dumps(variant_key, sort_keys=True, default=str)
 
-def remove_wandb_args(cmd: str) -> str:
-    """Remove all wandb args and their values from command strings."""
 
-    new_arg_list = []
-    arg_list = shlex.split(cmd)
-    # Avoid out of bounds access attempt
-    arg_list.append("")
+def coalesce_variants(benchmark_name: str, benchmark_dict: dict, variants: List[dict]) -> List[dict]:
+    """Keep only the first of the variants which would run the same thing.
 
-    skip = False
-    arg_pattern = re.compile("^[-]+")
-    for i in range(len(arg_list) - 1):
-        if arg_pattern.match(arg_list[i]) and "wandb" in arg_list[i]:
-            # Also remove the values given to wandb args using a skip bool for
-            # next iteration
-            if not arg_pattern.match(arg_list[i + 1]):
-                skip = True
-            continue
+    Note:
+        Different parameters can give identical commands, for example when a
+        parameter is not used in the 'cmd' of the benchmark, or when the same
+        variant is listed twice. Such duplicates are listed in the 'aliases'
+        of the variant which is kept, and they are given its results with
+        `fan_out_results`.
+
+    Args:
+        benchmark_name (str): Benchmarks name as given in the spec yaml file
+        benchmark_dict (dict): benchmark entry itself in yaml file
+        variants (list): Named variants, as given by `get_benchmark_variants`
+
+    Returns:
+        variants (list): The unique variants, in their order
+
+    """
+
+    unique_variants: Dict[str, dict] = {}
+    coalesced = []
+    for variant in variants:
+        variant_key = get_variant_key(benchmark_dict, variant["config"])
+        if variant_key is None:
+            variant_key = variant["name"]
+        if variant_key in unique_variants:
+            unique_variants[variant_key].setdefault("aliases", []).append(variant)
+        else:
+            unique_variants[variant_key] = variant
+            coalesced.append(variant)
+
+    num_aliases = len(variants) - len(coalesced)
+    if num_aliases:
+        logger.info(
+            f"{num_aliases} variants of '{benchmark_name}' run the same command as another variant, "
+            f"running {len(coalesced)} unique variants"
+        )
+        for variant in coalesced:
+            for alias in variant.get("aliases", []):
+                logger.info(f"	'{alias['name']}' is coalesced with '{variant['name']}'")
+    return coalesced
 
+
+def fan_out_results(variants: List[dict], variant_results: List[dict]) -> List[dict]:
+    """Give the results of each variant to its aliases, see `coalesce_variants`.
+
+    Args:
+        variants (list): The unique variants which were run
+        variant_results (list): The result of each of these variants
+
+    Returns:
+        variant_results (list): The results of all the variants, each alias
+            following the variant which was run for it
+
+    """
+
+    all_results = []
+    for variant, variant_result in zip(variants, variant_results):
+        all_results.append(variant_result)
+        for alias in variant.get("aliases", []):
+            alias_result = copy.deepcopy(variant_result)
+            alias_result["variant_name"] = alias["name"]
+            alias_result["params"] = alias["config"]
+            alias_result["coalesced_with"] = variant["name"]
+            all_results.append(alias_result)
+    return all_results
+
+
+def save_coalesced_variants(log_dir: Union[str, Path], variant_dictionary: Dict[str, List[dict]]):
+    """Save a report of the variants which were coalesced with another one, to
+    help remove duplicates from the specs. The parameters of each alias are
+    saved, so that `load_coalesced_variants` can fan results out again."""
+    report = {
+        benchmark_name: {
+            variant["name"]: {alias["name"]: alias["config"] for alias in variant["aliases"]}
+            for variant in variants
+            if variant.get("aliases")
+        }
+        for benchmark_name, variants in variant_dictionary.items()
+    }
+    report = {benchmark_name: aliases for benchmark_name, aliases in report.items() if aliases}
+    if not report:
+        return
+    report_path = Path(log_dir, COALESCED_VARIANTS_FILE)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Report of coalesced variants saved to {str(report_path)}")
+
+
+def load_coalesced_variants(log_dir: Union[str, Path]) -> Dict[str, Dict[str, List[dict]]]:
+    """Load the aliases saved by `save_coalesced_variants`.
+
+    Args:
+        log_dir (str or Path): Log directory of the benchmarking run
+
+    Returns:
+        aliases (dict): For each benchmark, the aliases of each variant which
+            was run, with their 'name' and 'config' as in `coalesce_variants`
+
+    """
+
+    report_path = Path(log_dir, COALESCED_VARIANTS_FILE)
+    if not report_path.exists():
+        return {}
+    with open(report_path) as f:
+        report = json.load(f)
+    return {
+        benchmark_name: {
+            variant_name: [{"name": name, "config": config} for name, config in aliases.items()]
+            for variant_name, aliases in variants.items()
+        }
+        for benchmark_name, variants in report.items()
+    }
+
+
+def get_variant_name(benchmark_name: str, variant: dict) -> str:
+    """Name a variant after its benchmark and its parameters"""
+    work_str = benchmark_name
+
+    for k in sorted(variant.keys()):
+        work_str += "_" + k + "_" + variant[k]
+
+    return work_str
+
+
+def join_command(tokens: Sequence[str]) -> str:
+    """Join command tokens into a string which `shlex.split` splits back into
+    the same tokens. Unlike `shlex.join`, tokens without whitespace or quotes
+    are left as they are, so that environment variables can still be expanded
+    and split into several arguments"""
+    return " ".join(token if UNQUOTED_TOKEN.fullmatch(token) else shlex.quote(token) for token in tokens)
+
+
+def is_wandb_arg(token: str) -> bool:
+    return token.startswith("-") and "wandb" in token
+
+
+class BenchmarkCommand(NamedTuple):
+    """A benchmark command split once into its parts, for example:
+
+        poprun --num-instances 2 python3 -u train.py --epochs 2
+        |----------------------| |-----| |-| |------| |--------|
+                launcher       interpreter  script     args
+                               interpreter_options
+
+    Note:
+        Commands without a python interpreter have all their tokens in `args`.
+        Instances are immutable, the methods modifying a command return a new
+        one.
+    """
+
+    launcher: Tuple[str, ...] = ()
+    interpreter: Optional[str] = None
+    interpreter_options: Tuple[str, ...] = ()
+    script: Optional[str] = None
+    is_module: bool = False
+    args: Tuple[str, ...] = ()
+
+    @classmethod
+    def parse(cls, command: Union[str, Sequence[str], "BenchmarkCommand"]) -> "BenchmarkCommand":
+        """Parse a command string, or a command already split into tokens"""
+        if isinstance(command, BenchmarkCommand):
+            return command
+        tokens = shlex.split(command) if isinstance(command, str) else list(command)
+
+        python_index = next(
+            (i for i, token in enumerate(tokens) if PYTHON_INTERPRETER.fullmatch(Path(token).name)), None
+        )
+        if python_index is None:
+            return cls(args=tuple(tokens))
+
+        # Interpreter options (e.g. '-u') come before the script or module
+        script_index = python_index + 1
+        while script_index < len(tokens) and tokens[script_index].startswith("-") and tokens[script_index] != "-m":
+            script_index += 1
+        is_module = script_index < len(tokens) and tokens[script_index] == "-m"
+        options_end = script_index
+        if is_module:
+            script_index += 1
+        script = tokens[script_index] if script_index < len(tokens) else None
+
+        return cls(
+            launcher=tuple(tokens[:python_index]),
+            interpreter=tokens[python_index],
+            interpreter_options=tuple(tokens[python_index + 1 : options_end]),
+            script=script,
+            is_module=is_module,
+            args=tuple(tokens[script_index + 1 :]),
+        )
+
+    @property
+    def python_tokens(self) -> List[str]:
+        """The tokens of the python command, without the launcher"""
+        if self.interpreter is None:
+            return list(self.args)
+        module_flag = ["-m"] if self.is_module else []
+        script = [self.script] if self.script is not None else []
+        return [self.interpreter, *self.interpreter_options, *module_flag, *script, *self.args]
+
+    @property
+    def tokens(self) -> List[str]:
+        return [*self.launcher, *self.python_tokens]
+
+    def __str__(self) -> str:
+        return join_command(self.tokens)
+
+    @property
+    def launcher_names(self) -> List[str]:
+        return [Path(token).name for token in self.launcher]
+
+    @property
+    def poprun_config(self) -> Dict:
+        """The poprun options of the command, see `get_poprun_config`"""
+        return copy.deepcopy(parse_poprun_options(self.launcher))
+
+    @property
+    def mpinum(self) -> int:
+        """Number of processes started by mpirun, 1 without mpirun"""
+        if "mpirun" not in self.launcher_names:
+            return 1
+        mpirun_options = self.launcher[self.launcher_names.index("mpirun") + 1 :]
+        value = get_option_value(mpirun_options, ("--np", "-np", "-n"))
+        return int(value) if value is not None and value.isdigit() else 1
+
+    def get_arg(self, *names: str) -> Optional[str]:
+        """Get the value given to a script argument, written either as
+        `--name value` or `--name=value`"""
+        return get_option_value(self.args, tuple(f"--{name}" for name in names))
+
+    @property
+    def uses_wandb(self) -> bool:
+        return any("--wandb" in token for token in self.tokens)
+
+    def with_resolved_script(self) -> "BenchmarkCommand":
+        """Make the path to the script absolute, modules are left as they are"""
+        if self.script is None or self.is_module:
+            return self
+        return self._replace(script=str(Path(self.script).resolve()))
+
+    def with_args(self, *args: str) -> "BenchmarkCommand":
+        return self._replace(args=self.args + args)
+
+    def without_wandb_args(self) -> "BenchmarkCommand":
+        """Remove all wandb args and their values"""
+        return BenchmarkCommand.parse(remove_options(self.tokens, is_wandb_arg))
+
+    def without_options(self, *names: str) -> "BenchmarkCommand":
+        """Remove options and their values, from the launcher and the script
+        arguments"""
+        return BenchmarkCommand.parse(remove_options(self.tokens, lambda token: token.split("=", 1)[0] in names))
+
+    def canonical_tokens(self) -> List[str]:
+        """Tokens which do not depend on how the command was written: quotes
+        and whitespace are normalised by the parsing, and `--option=value`
+        is split like `--option value`"""
+        canonical = []
+        for token in self.tokens:
+            if token.startswith("--") and "=" in token:
+                canonical.extend(token.split("=", 1))
+            else:
+                canonical.append(token)
+        return canonical
+
+    def canonical_hash(self) -> str:
+        """sha256 digest identifying the command, see `canonical_tokens`"""
+        return hashlib.sha256(json.dumps(self.canonical_tokens()).encode()).hexdigest()
+
+
+def get_option_value(tokens: Sequence[str], names: Tuple[str, ...]) -> Optional[str]:
+    """Get the value of the first of the options `names` found in `tokens`"""
+    for i, token in enumerate(tokens):
+        name, equals, value = token.partition("=")
+        if name in names:
+            if equals:
+                return value
+            return tokens[i + 1] if i + 1 < len(tokens) else None
+    return None
+
+
+def remove_options(tokens: Sequence[str], is_removed: Callable[[str], bool]) -> List[str]:
+    """Remove the options matching `is_removed` and the values given to them"""
+    kept = []
+    skip = False
+    for i, token in enumerate(tokens):
         if skip:
             skip = False
             continue
+        if OPTION_PATTERN.match(token) and is_removed(token):
+            # Also remove the value, unless it is given with '=' or the
+            # option is a flag followed by another option
+            next_token = tokens[i + 1] if i + 1 < len(tokens) else None
+            skip = "=" not in token and next_token is not None and not OPTION_PATTERN.match(next_token)
+            continue
+        kept.append(token)
+    return kept
 
-        new_arg_list.append(arg_list[i])
-
-    new_cmd = shlex.join(new_arg_list)
 
-    return new_cmd
+def remove_wandb_args(cmd: str) -> str:
+    """Remove all wandb args and their values from command strings."""
+    return str(BenchmarkCommand.parse(cmd).without_wandb_args())
 
 
-def formulate_benchmark_command(
+def get_benchmark_command(
     benchmark_dict: dict,
     variant_dict: dict,
     args: Namespace,
-) -> str:
+) -> BenchmarkCommand:
     """Create the actual command to be run from an unformatted string.
 
     Args:
@@ -179,32 +478,20 @@ def formulate_benchmark_command(
         args (Namespace): Arguments passed to this benchmarking run
 
     Returns:
-        cmd (str): The final, formatted command to be run
+        command (BenchmarkCommand): The final, formatted command to be run
 
     """
 
     # Format the command (containing variables) by using the variant dict
     # (containing the actual values)
     cmd = benchmark_dict["cmd"].format(**variant_dict)
-    cmd = cmd.replace("\n", " ")
-
-    cmd = " ".join(cmd.split())
-    logger.info(f"original cmd = '{cmd}'")
+    logger.info(f"original cmd = '{' '.join(cmd.split())}'")
     logger.info(f"Cleaning and modifying command if required...")
 
-    # Append application location from yaml to command
-    cmd_parts = cmd.split(" ")
-    if "python3" in cmd_parts:
-        py_name = "python3"
-    else:
-        py_name = "python"
-    called_file = cmd_parts[cmd_parts.index(py_name) + 1]
-    # if the first argument is `-m` we are calling a module and shouldn't resolve it
-    if called_file != "-m":
-        resolved_file = str(Path(called_file).resolve())
-        cmd = cmd.replace(called_file, resolved_file)
-
-    if not (args.allow_wandb or benchmark_dict.get("allow_wandb", False)) and "--wandb" in cmd:
+    # Make the application location absolute, unless a module is called
+    command = BenchmarkCommand.parse(cmd).with_resolved_script()
+
+    if not (args.allow_wandb or benchmark_dict.get("allow_wandb", False)) and command.uses_wandb:
         logger.info(
             "'--allow-wandb' was not passed or set in the benchmark entry,"
             " however '--wandb' is an "
@@ -213,48 +500,53 @@ def formulate_benchmark_command(
             "and all args containing 'wandb' from command."
         )
 
-        cmd = remove_wandb_args(cmd)
+        command = command.without_wandb_args()
 
     if args.compile_only:
         logger.info("'--compile-only' was passed here. Appending '--compile-only' to the benchmark command.")
-        cmd = cmd + " --compile-only"
+        command = command.with_args("--compile-only")
 
         # Dont import wandb if compile only mode
-        if "--wandb" in cmd:
+        if command.uses_wandb:
             logger.info(
                 "--compile-only was passed, and wandb is not used for "
                 "compile only runs, purging '--wandb' and all args "
                 "containing 'wandb' in their names from command."
             )
-            cmd = remove_wandb_args(cmd)
+            command = command.without_wandb_args()
 
         # Remove vipu settings that prevent from running in compile-only mode
-        cmd = re.sub(r"--vipu-partition.*?=.*?\S*", "", cmd)
-        cmd = re.sub(r"--vipu-server-host.*?=.*?\S*", "", cmd)
-        cmd = re.sub(r"--vipu-server-port.*?.*?\S*", "", cmd)
+        command = command.without_options(*COMPILE_ONLY_REMOVED_OPTIONS)
 
-    # Cleanse the string of new line chars and extra spaces
-    cmd = " ".join(cmd.replace("\n", " ").split())
+    logger.info(f"new cmd = '{command}'")
 
-    logger.info(f"new cmd = '{cmd}'")
+    return command
 
-    return cmd
+
+def formulate_benchmark_command(
+    benchmark_dict: dict,
+    variant_dict: dict,
+    args: Namespace,
+) -> str:
+    """Create the actual command to be run, as a string, see
+    `get_benchmark_command`"""
+    return str(get_benchmark_command(benchmark_dict, variant_dict, args))
 
 
 def get_num_ipus(benchmark_name: str) -> int:
-    num_ipus = re.findall(pattern="pod(\d+)", string=benchmark_name)
-    if len(num_ipus) < 0:
+    num_ipus = re.findall(pattern=r"pod(\d+)", string=benchmark_name)
+    if len(num_ipus) == 0:
         err = (
             f"Processing benchmark variant: {benchmark_name}."
             " Malformed name. Benchmark must specify the number of IPUs "
             "to be used in the form "
-            "[alphanumeric chars and underscore]+pod(\d+)"
+            "[alphanumeric chars and underscore]+pod(\\d+)"
             "[alphanumeric_chars and underscore]+"
         )
         logger.error(err)
         raise ValueError(err)
     else:
-        num_ipus = num_ipus[0]
+        num_ipus = int(num_ipus[0])
         return num_ipus
 
 
@@ -266,6 +558,35 @@ def query_option_in_cmd(cmd: list, option: list):
         return None
 
 
+@lru_cache(maxsize=None)
+def get_poprun_parser() -> ArgumentParser:
+    """Parser of the subset of poprun options needed to ensure that the job
+    submission environment is correct"""
+    parser = ArgumentParser(add_help=False)
+    for opt in POPRUN_CONFIG_OPTIONS:
+        parser.add_argument(*opt, type=str, default=None)
+    return parser
+
+
+@lru_cache(maxsize=None)
+def parse_poprun_options(launcher: Tuple[str, ...]) -> Dict:
+    """Parse the poprun options of a launcher, see `get_poprun_config`"""
+    launcher_names = [Path(token).name for token in launcher]
+    # If poprun is not called, then it cannot be multihost + multi-instance
+    if "poprun" not in launcher_names:
+        return {}
+
+    parse_range = list(launcher[launcher_names.index("poprun") + 1 :])
+    known_options, other_options = get_poprun_parser().parse_known_args(parse_range)
+    poprun_config = vars(known_options)
+    poprun_config["other_args"] = shlex.join(other_options)
+
+    if poprun_config["host"] is not None:
+        poprun_config["host"] = poprun_config["host"].split(",")
+
+    return poprun_config
+
+
 def get_poprun_config(args, cmd) -> Dict:
     """Get a poprun configuration dict storing key,value pairs of poprun options
     and supplied arguments. We store only a subset of options that are going
@@ -274,58 +595,33 @@ def get_poprun_config(args, cmd) -> Dict:
     Args:
        args (argparse.Namespace): Arguments passed to run the benchmarks
             with
-        cmd: (list): benchmark variant command
+        cmd: (list, str or BenchmarkCommand): benchmark variant command
     Return:
         poprun configuration (Dict): key value pairs of poprun options and arguments
     """
-    poprun_config = {}
+    return BenchmarkCommand.parse(cmd).poprun_config
 
-    # Find where in the command list "poprun" and "python" exist
-    # If poprun is not called, then it cannot be multihost + multi-instance
-    poprun_index = query_option_in_cmd(cmd, ["poprun"])
-    if poprun_index is None:
-        return poprun_config
-
-    # Watch out for "python" instead of "python3"
-    python_index = query_option_in_cmd(cmd, ["python3", "python"])
-
-    parser = ArgumentParser()
-
-    configuration_options = [
-        ["-H", "--host"],
-        ["--num-instances"],
-        ["--vipu-server-host"],
-        ["--vipu-server-port"],
-        ["--vipu-partition"],
-        ["--num-ilds"],
-        ["--vipu-cluster", "--vipu-allocation"],
-        ["--synchronise-python-venv"],
-        ["--synchronise-poplar-sdk"],
-        ["--distribute-ssh-key"],
-        ["--mpi-global-args"],
-        ["--mpi-local-args"],
-        ["--host-subnet"],
-    ]
-
-    for opt in configuration_options:
-        if "--host" in opt:
-            parser.add_argument(*opt, type=str, default=None)
-        else:
-            parser.add_argument(*opt, type=str, default=None)
 
-    parse_range = cmd[poprun_index + 1 : python_index]
-    known_options, other_options = parser.parse_known_args(parse_range)
-    poprun_config = vars(known_options)
-    poprun_config["other_args"] = shlex.join(other_options)
-
-    if poprun_config["host"] is not None:
-        poprun_config["host"] = poprun_config["host"].split(",")
-
-    return poprun_config
+@lru_cache(maxsize=None)
+def get_local_host_identities() -> Tuple[str, ...]:
+    """Get all forms of ID for this local machine: its name and its
+    internal/external IPs. The system is only queried once."""
+    possible_hostnames = [os.uname()[1]]
+    try:
+        ips, _ = subprocess.Popen(
+            ["hostname", "-I"],
+            stdout=subprocess.PIPE,
+        ).communicate()
+        # All possible IPs (formatted output)
+        possible_hostnames.extend(ips.decode("utf-8").split())
+    except Exception:
+        logger.debug("Could not query the IPs of this machine with 'hostname -I'")
+    return tuple(possible_hostnames)
 
 
-def get_local_poprun_hosts(poprun_config: Dict) -> Tuple[list, int]:
-    """Get names/IPs of poprun hosts defined in the `--host` argument.
+def get_local_poprun_hosts(poprun_config: Dict) -> list:
+    """Get names/IPs of poprun hosts defined in the `--host` argument, other
+    than this machine.
 
     Args:
         poprun_config (dict): extracted poprun configurations from get_poprun_config
@@ -340,8 +636,7 @@ def get_local_poprun_hosts(poprun_config: Dict) -> Tuple[list, int]:
         return []
 
     # If "--host" is not defined, then instances must be running on one host
-    poprun_hostnames = poprun_config["host"]
-    if poprun_hostnames is None:
+    if poprun_config["host"] is None:
         logger.info(
             "'--host' argument not provided, assuming all poprun "
             "instances defined in this benchmark will run on a single host "
@@ -349,7 +644,7 @@ def get_local_poprun_hosts(poprun_config: Dict) -> Tuple[list, int]:
         )
         return []
 
-    num_hosts = len(poprun_hostnames)
+    num_hosts = len(poprun_config["host"])
 
     if num_hosts > 1:
         logger.info("Benchmark is running multiple instances over multiple hosts, preparing all hosts.")
@@ -360,25 +655,11 @@ def get_local_poprun_hosts(poprun_config: Dict) -> Tuple[list, int]:
             "run on this host only"
         )
 
-    # Find all forms of ID for this local machine
-    possible_hostnames = []
-    possible_hostnames.append(os.uname()[1])
-
-    # Query system for internal/external IPs
-    try:
-        possible_hostnames, _ = subprocess.Popen(
-            ["hostname", "-I"],
-            stdout=subprocess.PIPE,
-        ).communicate()
-        # All possible IPs (formatted output)
-        possible_hostnames = str(possible_hostnames.decode("utf-8")).split(" ")[:-1]
-    except:
-        possible_hostnames = [""]
-
     # Remove this machines name/IP from the list
-    for hostname in poprun_hostnames:
-        if any(hostname in x for x in possible_hostnames):
-            poprun_hostnames.remove(hostname)
+    possible_hostnames = get_local_host_identities()
+    poprun_hostnames = [
+        hostname for hostname in poprun_config["host"] if not any(hostname in x for x in possible_hostnames)
+    ]
 
     if len(poprun_hostnames) == num_hosts:
         logger.warn(
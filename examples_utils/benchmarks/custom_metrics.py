@@ -25,18 +25,84 @@ def log_lengths(stdout: str, stderr: str, exitcode: int):
 register_custom_metric("log_lengths", log_lengths)
 ```
 
+Metric functions are run concurrently, each in a forked process, and are
+stopped if they take longer than their time budget (``--metric-hook-timeout``
+or the ``timeout`` given to ``register_custom_metric``). Metrics which process
+large logs can be registered with ``streaming=True``, they are then given
+iterators over the lines of stdout and stderr instead of whole strings:
+
+```
+def count_warnings(stdout_lines, stderr_lines, exitcode: int):
+    return sum("Warning" in line for line in stderr_lines)
+
+
+register_custom_metric("num_warnings", count_warnings, streaming=True)
+```
+
+Installed packages can also provide metric plugins through the
+``examples_utils.metrics`` entry point group, e.g. in ``setup.py``:
+
+```
+entry_points={"examples_utils.metrics": ["num_warnings = my_package.metrics:count_warnings"]}
+```
+
+Plugins are only imported and run for benchmarks which reference them, with
+``--metric-plugins num_warnings`` or ``metric_plugins: [num_warnings]`` in the
+benchmark spec. A plugin declares the logs it needs with the ``metric_plugin``
+decorator, the other logs are given to it empty:
+
+```
+@metric_plugin(streams=["stderr"], streaming=True)
+def count_warnings(stdout_lines, stderr_lines, exitcode: int):
+    return sum("Warning" in line for line in stderr_lines)
+```
+
 """
-from typing import List, Callable, Optional, Any, Dict, Union
+from typing import List, Callable, Optional, Any, Dict, Iterator, Sequence, Tuple, Union
+from functools import lru_cache
+from importlib.metadata import EntryPoint, entry_points
 import logging
+import multiprocessing
+import multiprocessing.connection
+import os
 import pathlib
 import importlib.util
+import time
+
+from examples_utils.benchmarks.scanning_utils import iter_lines
+from examples_utils.benchmarks.log_view_utils import LogView
 
 logger = logging.getLogger(__name__)
 
 MetricFunction = Callable[[str, str, int], Optional[Any]]
+StreamingMetricFunction = Callable[[Iterator[str], Iterator[str], int], Optional[Any]]
 
 REGISTERED_HOOKS: Dict[str, MetricFunction] = {}
 
+# Options given when registering each metric: 'streaming' and 'timeout'
+HOOK_OPTIONS: Dict[str, Dict[str, Any]] = {}
+
+# Default time budget of each metric function, in seconds
+DEFAULT_HOOK_TIMEOUT = 600
+
+# Name of the results entry with the time taken by each metric function
+HOOK_TIMES_RESULT = "metric_hook_times"
+
+# Logs which can be given to a metric function
+LOG_STREAMS = ("stdout", "stderr")
+
+# Entry point group through which installed packages provide metric plugins
+METRIC_PLUGINS_GROUP = "examples_utils.metrics"
+
+# Metric plugins of this package, loaded in the same way as entry points
+BUILTIN_METRIC_PLUGINS = {
+    "total_compiling_time": "examples_utils.benchmarks.metrics_utils:get_results_for_compile_time",
+}
+
+# Plugins run for every benchmark, others are only run for the benchmarks
+# which reference them
+DEFAULT_METRIC_PLUGINS = ("total_compiling_time",)
+
 
 def import_metrics_hooks_files(hook_files: List[Union[str, pathlib.Path]]):
     """Imports files which define additional metrics in python"""
@@ -52,20 +118,236 @@ def import_metrics_hooks_files(hook_files: List[Union[str, pathlib.Path]]):
             logger.info(f"Imported {module_name} from '{file_path}'")
 
 
-def register_custom_metric(name: str, function: MetricFunction):
-    """Register a new metric function to be run during processing of the benchmark."""
+def get_hook_options(
+    streaming: bool = False, timeout: Optional[float] = None, streams: Sequence[str] = LOG_STREAMS
+) -> Dict[str, Any]:
+    """Check and gather the options of a metric function"""
+    unknown_streams = set(streams) - set(LOG_STREAMS)
+    if unknown_streams:
+        raise ValueError(f"Unknown log streams {sorted(unknown_streams)}, metrics can use {', '.join(LOG_STREAMS)}")
+    return {"streaming": streaming, "timeout": timeout, "streams": tuple(streams)}
+
+
+def register_custom_metric(
+    name: str,
+    function: Union[MetricFunction, StreamingMetricFunction],
+    streaming: bool = False,
+    timeout: Optional[float] = None,
+    streams: Sequence[str] = LOG_STREAMS,
+):
+    """Register a new metric function to be run during processing of the benchmark.
+
+    Args:
+        name (str): Name of the metric in the results
+        function (callable): Function computing the metric from stdout, stderr
+            and the exit code
+        streaming (bool): Give the function iterators over the lines of stdout
+            and stderr instead of strings
+        timeout (float): Time budget of the function in seconds, overrides the
+            ``--metric-hook-timeout``
+        streams (list): Logs needed by the function, 'stdout' and/or 'stderr',
+            the others are given to it empty
+
+    """
     if name in REGISTERED_HOOKS:
         logger.warning(f"Metric '{name}' multiply defined, only the last registered implementation will be executed.")
     REGISTERED_HOOKS[name] = function
+    HOOK_OPTIONS[name] = get_hook_options(streaming, timeout, streams)
     logger.info(f"    Registered metric hook: {name} with object: {function}")
 
 
-def process_registered_metrics(results: dict, stdout: str, stderr: str, exitcode: int):
-    """Process the metrics registered with ``register_custom_metric``"""
-    for metric_name, metric_function in REGISTERED_HOOKS.items():
-        try:
-            results[metric_name] = metric_function(stdout, stderr, exitcode)
-        except Exception as error:
-            err = f"Metric '{metric_name}' failed during execution with: {type(error).__name__} {error}"
-            logger.error(err)
+def metric_plugin(streaming: bool = False, timeout: Optional[float] = None, streams: Sequence[str] = LOG_STREAMS):
+    """Decorator declaring the options of a metric plugin function, which are
+    those of ``register_custom_metric``"""
+    options = get_hook_options(streaming, timeout, streams)
+
+    def declare_options(function: Union[MetricFunction, StreamingMetricFunction]):
+        function.metric_options = options
+        return function
+
+    return declare_options
+
+
+@lru_cache(maxsize=None)
+def get_available_metric_plugins() -> Dict[str, EntryPoint]:
+    """Find the metric plugins of this package and of the installed packages,
+    without importing them"""
+    plugins = {name: EntryPoint(name, value, METRIC_PLUGINS_GROUP) for name, value in BUILTIN_METRIC_PLUGINS.items()}
+    installed = entry_points()
+    if hasattr(installed, "select"):
+        installed = installed.select(group=METRIC_PLUGINS_GROUP)
+    else:
+        installed = installed.get(METRIC_PLUGINS_GROUP, [])
+    for entry_point in installed:
+        if entry_point.name in plugins:
+            logger.warning(f"Metric plugin '{entry_point.name}' multiply defined, using '{entry_point.value}'.")
+        plugins[entry_point.name] = entry_point
+    return plugins
+
+
+@lru_cache(maxsize=None)
+def load_metric_plugin(name: str) -> Tuple[Union[MetricFunction, StreamingMetricFunction], Dict[str, Any]]:
+    """Import a metric plugin the first time it is used.
+
+    Args:
+        name (str): Name of the plugin, which is the name of its metric
+
+    Returns:
+        function (callable): The metric function
+        options (dict): Its 'streaming', 'timeout' and 'streams' options
+
+    Raises:
+        ValueError: If no plugin has this name
+
+    """
+    plugins = get_available_metric_plugins()
+    if name not in plugins:
+        raise ValueError(f"Metric plugin '{name}' not found, available plugins: {', '.join(sorted(plugins))}")
+    function = plugins[name].load()
+    logger.info(f"    Loaded metric plugin: {name} from '{plugins[name].value}'")
+    return function, getattr(function, "metric_options", get_hook_options())
+
+
+def get_metric_plugin_names(benchmark_dict: dict, requested_plugins: Optional[Sequence[str]] = None) -> List[str]:
+    """Get the metric plugins to run for a benchmark: the default plugins,
+    those given on the command line and those in its 'metric_plugins'"""
+    names = list(DEFAULT_METRIC_PLUGINS) + list(requested_plugins or []) + benchmark_dict.get("metric_plugins", [])
+    return list(dict.fromkeys(names))
+
+
+def combine_hook_times(run_hook_times: Sequence[Dict[str, float]]) -> Dict[str, float]:
+    """Total time taken by each metric function over several runs"""
+    combined: Dict[str, float] = {}
+    for hook_times in run_hook_times:
+        for name, duration in hook_times.items():
+            combined[name] = combined.get(name, 0.0) + duration
+    return combined
+
+
+def _run_hook(
+    function: Union[MetricFunction, StreamingMetricFunction],
+    options: Dict[str, Any],
+    connection: multiprocessing.connection.Connection,
+    stdout: Union[str, LogView],
+    stderr: Union[str, LogView],
+    exitcode: int,
+):
+    """Entry point of the process running a metric function, which sends back
+    ('result', value, duration) or ('error', message, duration)"""
+    start = time.perf_counter()
+    try:
+        logs = []
+        for stream, log in zip(LOG_STREAMS, (stdout, stderr)):
+            # Logs the function does not need are not read
+            if stream not in options.get("streams", LOG_STREAMS):
+                log = ""
+            # Memory mapped logs are shared with the parent process, not
+            # copied, and are only decoded here for the functions given strings
+            logs.append(iter_lines(log) if options.get("streaming") else str(log))
+        value = function(*logs, exitcode)
+        connection.send(("result", value, time.perf_counter() - start))
+    except Exception as error:
+        connection.send(("error", f"{type(error).__name__} {error}", time.perf_counter() - start))
+    finally:
+        connection.close()
+
+
+def process_registered_metrics(
+    results: dict,
+    stdout: Union[str, LogView],
+    stderr: Union[str, LogView],
+    exitcode: int,
+    timeout: float = DEFAULT_HOOK_TIMEOUT,
+    max_workers: Optional[int] = None,
+    plugins: Sequence[str] = DEFAULT_METRIC_PLUGINS,
+):
+    """Process the metrics registered with ``register_custom_metric`` and the
+    given metric plugins.
+
+    Note:
+        Each metric function is run in a forked process, so that it has access
+        to the logs and functions of this process without copying them, and
+        can be stopped when it runs out of time. Metrics which fail or time out
+        are None in the results.
+
+    Args:
+        results (dict): The results of the benchmark, metrics are added to it
+        stdout (str or LogView): stdout of the benchmark
+        stderr (str or LogView): stderr of the benchmark
+        exitcode (int): Exit code of the benchmark
+        timeout (float): Time budget of each metric function, in seconds
+        max_workers (int): Most metric functions run at once, defaults to the
+            number of CPUs
+        plugins (list): Names of the metric plugins to run, see
+            ``get_metric_plugin_names``, defaults to the plugins run for
+            every benchmark
+
+    Returns:
+        results (dict): The results, with the registered metrics and the time
+            taken by each metric function in 'metric_hook_times'
+
+    """
+
+    hooks = {name: load_metric_plugin(name) for name in plugins}
+    # Functions registered explicitly take precedence over plugins
+    hooks.update({name: (function, HOOK_OPTIONS.get(name, {})) for name, function in REGISTERED_HOOKS.items()})
+    if not hooks:
+        return results
+    context = multiprocessing.get_context("fork")
+    max_workers = max_workers or os.cpu_count() or 1
+    pending = list(hooks)
+    running: Dict[multiprocessing.connection.Connection, tuple] = {}
+    hook_times = {}
+
+    def finish(metric_name: str, process, outcome: Optional[tuple], start: float):
+        process.join()
+        if outcome is None:
+            outcome = ("error", f"process exited with code {process.exitcode}", time.perf_counter() - start)
+        kind, value, duration = outcome
+        hook_times[metric_name] = duration
+        if kind == "result":
+            results[metric_name] = value
+        else:
+            logger.error(f"Metric '{metric_name}' failed during execution with: {value}")
+            results[metric_name] = None
+
+    while pending or running:
+        while pending and len(running) < max_workers:
+            metric_name = pending.pop(0)
+            function, options = hooks[metric_name]
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_run_hook, args=(function, options, sender, stdout, stderr, exitcode), daemon=True
+            )
+            process.start()
+            sender.close()
+            hook_timeout = options.get("timeout") or timeout
+            start = time.perf_counter()
+            running[receiver] = (metric_name, process, start, start + hook_timeout)
+
+        next_deadline = min(deadline for _, _, _, deadline in running.values())
+        ready = multiprocessing.connection.wait(list(running), max(0.0, next_deadline - time.perf_counter()))
+        for receiver in ready:
+            metric_name, process, start, _ = running.pop(receiver)
+            try:
+                outcome = receiver.recv()
+            except EOFError:
+                outcome = None
+            receiver.close()
+            finish(metric_name, process, outcome, start)
+
+        now = time.perf_counter()
+        for receiver, (metric_name, process, start, deadline) in list(running.items()):
+            if now >= deadline:
+                running.pop(receiver)
+                process.kill()
+                receiver.close()
+                finish(
+                    metric_name,
+                    process,
+                    ("error", f"timed out after {deadline - start:.0f} seconds", now - start),
+                    start,
+                )
+
+    results[HOOK_TIMES_RESULT] = hook_times
     return results
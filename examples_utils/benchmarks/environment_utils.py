@@ -1,5 +1,5 @@
 # Copyright (c) 2022 Graphcore Ltd. All rights reserved.
-from typing import Optional, List
+from typing import Optional, List, Union
 import argparse
 import copy
 import logging
@@ -9,6 +9,8 @@ import subprocess
 import sys
 from pathlib import Path
 
+from examples_utils.benchmarks.command_utils import BenchmarkCommand
+
 # Get the module logger
 logger = logging.getLogger(__name__)
 
@@ -182,24 +184,19 @@ def enter_benchmark_dir(benchmark_dict: dict):
     return current_working_dir
 
 
-def get_mpinum(command: str) -> int:
+def get_mpinum(command: Union[str, BenchmarkCommand]) -> int:
     """Get num replicas (mpinum) from the cmd.
 
     Args:
-        command (str): The command line that includes a call to mpirun
+        command (str or BenchmarkCommand): The command line that includes a
+            call to mpirun
 
     Returns:
         mpinum (int): Number of processes passed to mpirun
 
     """
 
-    m = re.search(r"mpirun.+--np.(\d*) ", command)
-    if m:
-        mpinum = float(m.group(1))
-    else:
-        mpinum = 1
-
-    return mpinum
+    return BenchmarkCommand.parse(command).mpinum
 
 
 def infer_paths(args: argparse.Namespace, benchmark_dict: dict) -> argparse.Namespace:
@@ -0,0 +1,373 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import ast
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+# Get the module logger
+logger = logging.getLogger(__name__)
+
+# Names of metrics and variant parameters in expressions, e.g. '{throughput}'
+placeholder_regex = re.compile(r"\{([^{}]+)\}")
+
+# Integer powers are exact up to this many bits, larger ones are computed as
+# floats so that e.g. '9**9**9' overflows instead of running for hours
+MAX_INTEGER_POWER_BITS = 1024
+
+
+def power(base: Any, exponent: Any) -> Any:
+    """`base ** exponent`, computed as a float unless the result is a small
+    enough integer"""
+    if (
+        isinstance(base, int)
+        and isinstance(exponent, int)
+        and 0 <= exponent
+        and exponent * max(abs(base), 2).bit_length() <= MAX_INTEGER_POWER_BITS
+    ):
+        return base**exponent
+    return math.pow(base, exponent)
+
+
+# Functions and constants which can be used in expressions
+EXPRESSION_FUNCTIONS = {
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "round": round,
+    "sqrt": math.sqrt,
+    "exp": math.exp,
+    "log": math.log,
+    "log2": math.log2,
+    "log10": math.log10,
+    "ceil": math.ceil,
+    "floor": math.floor,
+    "pow": power,
+}
+EXPRESSION_CONSTANTS = {"pi": math.pi, "e": math.e}
+
+# Syntax allowed in expressions: arithmetic on numbers and calls to the
+# functions above
+ALLOWED_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.FloorDiv,
+    ast.Mod,
+    ast.Pow,
+    ast.UAdd,
+    ast.USub,
+    ast.Call,
+    ast.Name,
+    ast.Load,
+    ast.Constant,
+)
+
+# Syntax also allowed in variant filters: comparisons and logical operators
+FILTER_NODES = ALLOWED_NODES + (
+    ast.Compare,
+    ast.Eq,
+    ast.NotEq,
+    ast.Lt,
+    ast.LtE,
+    ast.Gt,
+    ast.GtE,
+    ast.In,
+    ast.NotIn,
+    ast.BoolOp,
+    ast.And,
+    ast.Or,
+    ast.Not,
+    ast.Tuple,
+)
+
+
+class PowerToCall(ast.NodeTransformer):
+    """Replace 'a ** b' by '_power(a, b)'"""
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            return ast.copy_location(
+                ast.Call(func=ast.Name(id="_power", ctx=ast.Load()), args=[node.left, node.right], keywords=[]), node
+            )
+        return node
+
+
+class DerivedExpression:
+    """A derived metric expression, parsed and compiled once.
+
+    Expressions name the metrics and variant parameters they use in braces,
+    e.g. '{throughput} * {batch_size} / 1000'. Only arithmetic operators,
+    numbers, the functions in `EXPRESSION_FUNCTIONS` and the constants in
+    `EXPRESSION_CONSTANTS` are allowed, so that the expression cannot run
+    arbitrary code.
+
+    Args:
+        name (str): Name of the derived metric
+        expression (str): The expression, as written in the benchmark spec
+
+    Raises:
+        ValueError: If the expression is invalid or uses forbidden syntax
+
+    """
+
+    kind = "Derived metric"
+    allowed_nodes = ALLOWED_NODES
+    constant_types: Tuple[type, ...] = (int, float)
+
+    def __init__(self, name: str, expression: str):
+        self.name = name
+        self.expression = expression
+
+        # Placeholders may not be valid identifiers, give them one each
+        self.dependencies: List[str] = []
+
+        def to_identifier(match: re.Match) -> str:
+            if match.group(1) not in self.dependencies:
+                self.dependencies.append(match.group(1))
+            return f"_v{self.dependencies.index(match.group(1))}"
+
+        try:
+            tree = ast.parse(placeholder_regex.sub(to_identifier, expression).strip(), mode="eval")
+        except SyntaxError as error:
+            raise ValueError(f"{self.kind} '{name}' expression '{expression}' is invalid: {error.msg}")
+        self.identifiers = [f"_v{i}" for i in range(len(self.dependencies))]
+        self._validate(tree)
+        self.code = compile(self._rewrite(tree), f"<{self.kind.lower()} '{name}'>", "eval")
+
+    def _validate(self, tree: ast.AST):
+        allowed_names = set(self.identifiers) | set(EXPRESSION_FUNCTIONS) | set(EXPRESSION_CONSTANTS)
+        for node in ast.walk(tree):
+            if not isinstance(node, self.allowed_nodes):
+                raise ValueError(
+                    f"{self.kind} '{self.name}' expression '{self.expression}' uses "
+                    f"forbidden syntax: '{type(node).__name__}'"
+                )
+            if isinstance(node, ast.Name) and node.id not in allowed_names:
+                raise ValueError(
+                    f"{self.kind} '{self.name}' expression '{self.expression}' uses unknown name "
+                    f"'{node.id}', metrics and variant parameters must be written in braces"
+                )
+            if isinstance(node, ast.Call) and (
+                not isinstance(node.func, ast.Name) or node.func.id not in EXPRESSION_FUNCTIONS or node.keywords
+            ):
+                raise ValueError(
+                    f"{self.kind} '{self.name}' expression '{self.expression}' may only call "
+                    f"{', '.join(EXPRESSION_FUNCTIONS)} with positional arguments"
+                )
+            if isinstance(node, ast.Constant) and (
+                not isinstance(node.value, self.constant_types) or isinstance(node.value, bool)
+            ):
+                raise ValueError(
+                    f"{self.kind} '{self.name}' expression '{self.expression}' may only contain "
+                    + ("numbers" if str not in self.constant_types else "numbers and strings")
+                )
+
+    def _rewrite(self, tree: ast.Expression) -> ast.Expression:
+        """Adapt the validated syntax tree before it is compiled: '**' calls
+        `power`, which bounds the size of the result"""
+        return ast.fix_missing_locations(PowerToCall().visit(tree))
+
+    def _bind(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Values of the identifiers of the compiled expression"""
+        return dict(zip(self.identifiers, (values[name] for name in self.dependencies)))
+
+    def evaluate(self, values: Dict[str, Any]) -> Any:
+        """Evaluate the expression with the values of its dependencies"""
+        namespace = {"__builtins__": {}, "_power": power, **EXPRESSION_FUNCTIONS, **EXPRESSION_CONSTANTS}
+        namespace.update(self._bind(values))
+        return eval(self.code, namespace)
+
+
+class VariantFilter(DerivedExpression):
+    """An expression selecting the variants of a benchmark from their
+    parameters, e.g. '{batch_size} * {gradient_accumulation} <= 1024'.
+
+    Filters may also compare values, with strings, and combine conditions
+    with 'and', 'or' and 'not'. Parameters are used as numbers, except where
+    they are compared with strings, e.g. "{precision} == '16.16'".
+
+    Args:
+        name (str): Where the filter comes from, for error messages
+        expression (str): The filter expression
+
+    Raises:
+        ValueError: If the expression is invalid or uses forbidden syntax
+
+    """
+
+    kind = "Variant filter"
+    allowed_nodes = FILTER_NODES
+    constant_types = (int, float, str)
+
+    def _rewrite(self, tree: ast.Expression) -> ast.Expression:
+        tree = super()._rewrite(tree)
+        # Parameters compared with strings are given as strings, '_s<i>'
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Compare):
+                operands = [node.left, *node.comparators]
+                if any(is_string_constant(operand) for operand in operands):
+                    for operand in operands:
+                        if isinstance(operand, ast.Name) and operand.id in self.identifiers:
+                            operand.id = "_s" + operand.id[2:]
+        return tree
+
+    def _bind(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        bound = {}
+        for i, name in enumerate(self.dependencies):
+            bound[f"_v{i}"] = to_number(values[name])
+            bound[f"_s{i}"] = str(values[name])
+        return bound
+
+    def matches(self, variant_dict: Dict[str, str]) -> bool:
+        """Check if a variant is selected by the filter"""
+        return bool(self.evaluate(variant_dict))
+
+
+def is_string_constant(node: ast.AST) -> bool:
+    """Check if a node is a string, or a tuple of strings"""
+    if isinstance(node, ast.Tuple):
+        return any(is_string_constant(element) for element in node.elts)
+    return isinstance(node, ast.Constant) and isinstance(node.value, str)
+
+
+def sort_by_dependencies(expressions: Dict[str, DerivedExpression]) -> List[str]:
+    """Order derived metrics so that each comes after those it depends on.
+
+    Args:
+        expressions (dict): The expression of each derived metric
+
+    Returns:
+        order (list): Names of the derived metrics, in spec order where the
+            dependencies allow it
+
+    Raises:
+        ValueError: If derived metrics depend on each other in a cycle
+
+    """
+
+    order = []
+    visiting = []
+
+    def visit(name: str):
+        if name in order:
+            return
+        if name in visiting:
+            cycle = visiting[visiting.index(name) :] + [name]
+            raise ValueError(f"Derived metrics depend on each other in a cycle: {' -> '.join(cycle)}")
+        visiting.append(name)
+        for dependency in expressions[name].dependencies:
+            if dependency in expressions:
+                visit(dependency)
+        visiting.pop()
+        order.append(name)
+
+    for name in expressions:
+        visit(name)
+    return order
+
+
+def to_number(value: Any) -> Any:
+    """Variant parameters are often strings, use them as numbers if they are"""
+    if isinstance(value, str):
+        for number_type in (int, float):
+            try:
+                return number_type(value)
+            except ValueError:
+                pass
+    return value
+
+
+class DerivedMetrics:
+    """The derived metrics of a benchmark, parsed once and evaluated for each
+    variant in the order of their dependencies.
+
+    Args:
+        derivation_config (dict): The 'derived' section of the benchmark spec,
+            with the 'expr' and 'reduction_type' of each derived metric
+
+    Raises:
+        ValueError: If an expression is invalid or the derived metrics depend
+            on each other in a cycle
+
+    """
+
+    def __init__(self, derivation_config: Dict[str, dict]):
+        self.reduction_types = {
+            name: config.get("reduction_type", "mean") for name, config in derivation_config.items()
+        }
+        expressions = {name: DerivedExpression(name, config["expr"]) for name, config in derivation_config.items()}
+        self.expressions = [expressions[name] for name in sort_by_dependencies(expressions)]
+
+    def get_value(self, name: str, results: dict, variant_dict: dict) -> Any:
+        """Get the value of a metric or variant parameter, variant parameters
+        take precedence as when they were formatted into the expression"""
+        if name in variant_dict:
+            return to_number(variant_dict[name])
+        if name in results:
+            metric_results = results[name]
+            reduction_type = self.reduction_types.get(name, "mean")
+            if reduction_type in metric_results:
+                return metric_results[reduction_type]
+            # Metrics are reported with their own reduction type first
+            return next(iter(metric_results.values()), None)
+        raise KeyError(f"'{name}' is neither a metric nor a variant parameter")
+
+    def evaluate(self, results: dict, variant_dict: dict) -> Tuple[dict, bool]:
+        """Evaluate all derived metrics for one variant.
+
+        Args:
+            results (dict): The metrics of the variant, derived metrics are
+                added to it
+            variant_dict (dict): The parameters of the variant
+
+        Returns:
+            results (dict): The metrics, including the derived metrics
+            did_derivation_fail (bool): Whether any derived metric could not be
+                evaluated
+
+        """
+
+        did_derivation_fail = False
+        for expression in self.expressions:
+            result = None
+            try:
+                values = {name: self.get_value(name, results, variant_dict) for name in expression.dependencies}
+                missing = [name for name, value in values.items() if value is None]
+                if missing:
+                    raise ValueError(f"{', '.join(missing)} has no value")
+                result = expression.evaluate(values)
+                logger.info(f"   '{expression.name}' = '{str(result)}'")
+            except Exception as error:
+                logger.error(
+                    f"   ERROR: '{expression.name}' = 'derived' expression: '{expression.expression}' "
+                    f"excepted: {error}"
+                )
+            results[expression.name] = {self.reduction_types[expression.name]: result}
+            did_derivation_fail |= result is None
+
+        return results, did_derivation_fail
+
+
+@lru_cache(maxsize=None)
+def _compile_derived_metrics(derivation_items: Tuple[Tuple[str, str, str], ...]) -> DerivedMetrics:
+    return DerivedMetrics(
+        {name: {"expr": expr, "reduction_type": reduction} for name, expr, reduction in derivation_items}
+    )
+
+
+def get_derived_metrics(derivation_config: Dict[str, dict]) -> DerivedMetrics:
+    """Get the parsed derived metrics of a benchmark, which are only parsed
+    the first time they are used by any of its variants"""
+    return _compile_derived_metrics(
+        tuple(
+            (name, str(config["expr"]), config.get("reduction_type", "mean"))
+            for name, config in derivation_config.items()
+        )
+    )
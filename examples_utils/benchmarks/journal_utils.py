@@ -0,0 +1,88 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Union
+
+# Get the module logger
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE = "benchmark_journal.jsonl"
+
+
+class BenchmarkJournal:
+    """Append-only record of the variants completed in a benchmarking run.
+
+    Each completed variant is written as one JSON line and synced to disk
+    before the next variant starts, so that the journal survives the harness
+    being killed at any point. A partially written last line (the harness
+    died while writing it) is ignored when the journal is read back.
+
+    Args:
+        log_dir (str or Path): Log directory of the benchmarking run
+        resume (bool): Continue the journal already in `log_dir` instead of
+            starting a new one
+
+    """
+
+    def __init__(self, log_dir: Union[str, Path], resume: bool = False):
+        self.path = Path(log_dir, JOURNAL_FILE)
+        self.completed = load_journal(self.path) if resume else {}
+        self._file = open(self.path, "a" if resume else "w")
+        # Do not append to a partially written line
+        if self._file.tell() > 0:
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")
+
+    def get(self, variant_name: str) -> dict:
+        """Get the result of a variant completed in a previous run, if any"""
+        return self.completed.get(variant_name)
+
+    def record(self, benchmark_name: str, variant_result: dict):
+        """Durably record the result of a completed variant"""
+        entry = {"benchmark_name": benchmark_name, "variant_result": variant_result}
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.completed[variant_result["variant_name"]] = variant_result
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_journal(journal_path: Union[str, Path]) -> Dict[str, dict]:
+    """Read the variant results recorded in a journal.
+
+    Args:
+        journal_path (str or Path): Path to the journal file
+
+    Returns:
+        completed (dict): Results of the completed variants, keyed by variant
+            name
+
+    """
+
+    completed = {}
+    if not Path(journal_path).exists():
+        return completed
+
+    with open(journal_path) as f:
+        for line_number, line in enumerate(f, start=1):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Ignoring incomplete entry on line {line_number} of '{journal_path}'")
+                continue
+            variant_result = entry["variant_result"]
+            completed[variant_result["variant_name"]] = variant_result
+
+    return completed
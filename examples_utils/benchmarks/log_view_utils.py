@@ -0,0 +1,164 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+from __future__ import annotations
+import logging
+import mmap
+import os
+import re
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Union
+
+# Get the module logger
+logger = logging.getLogger(__name__)
+
+# Size of the blocks in which lines are decoded when iterating over a log
+LINE_BLOCK_SIZE = 1024 * 1024
+
+
+def decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="backslashreplace")
+
+
+class LogView:
+    """Read-only view of a log which can be used in place of its content as a
+    string, without loading the whole log in memory.
+
+    Note:
+        Log files are memory mapped: lines, blocks and the tail of the log are
+        only decoded when they are used, and searches run directly on the
+        mapped bytes. Text added with `+` is kept in memory after the content
+        of the file, which is left unchanged. `splitlines` returns a list,
+        like `str.splitlines`, and so decodes the whole log.
+
+    Args:
+        file_path (str or Path): The log file, if None the log is only `text`
+        text (str or bytes): Text of the log, after the content of the file
+
+    """
+
+    def __init__(self, file_path: Optional[Union[str, Path]] = None, text: Union[str, bytes] = b""):
+        self.file_path = file_path
+        self._file = None
+        self._buffer: Union[bytes, mmap.mmap] = b""
+        if file_path is not None:
+            self._file = open(file_path, "rb")
+            # Empty files cannot be mapped
+            if os.fstat(self._file.fileno()).st_size:
+                self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._overlay = text.encode() if isinstance(text, str) else bytes(text)
+
+    def _segments(self) -> List[Union[bytes, mmap.mmap]]:
+        return [segment for segment in (self._buffer, self._overlay) if len(segment)]
+
+    def iter_blocks(self, block_size: int) -> Iterator[str]:
+        """Yield the content in blocks of about `block_size` bytes, made of
+        whole lines and without the newline which ends each block"""
+        remainder = b""
+        for segment in self._segments():
+            start = 0
+            while start < len(segment):
+                end = min(start + block_size, len(segment))
+                data = remainder + segment[start:end]
+                start = end
+                block_end = data.rfind(b"\n")
+                if block_end == -1:
+                    remainder = data
+                    continue
+                yield decode(data[:block_end])
+                remainder = data[block_end + 1 :]
+        if remainder:
+            yield decode(remainder)
+
+    def iter_lines(self) -> Iterator[str]:
+        """Yield the lines one at a time, without their newline"""
+        for block in self.iter_blocks(LINE_BLOCK_SIZE):
+            yield from block.split("\n")
+
+    def splitlines(self) -> List[str]:
+        return list(self.iter_lines())
+
+    def split(self, str_pattern: str) -> Iterator[str]:
+        """Lazy `str.split`, lines are yielded without their newline"""
+        if str_pattern == "\n":
+            yield from self.iter_lines()
+        else:
+            for line in self.iter_lines():
+                yield from line.split(str_pattern)
+
+    def tail(self, num_lines: int) -> List[str]:
+        """Get the last `num_lines` lines, reading only the end of the log"""
+        if num_lines <= 0:
+            return []
+        # Find the start of the last lines from the end of the log
+        position = len(self._buffer)
+        newlines = self._overlay.count(b"\n")
+        while newlines <= num_lines and position > 0:
+            position = self._buffer.rfind(b"\n", 0, position)
+            if position == -1:
+                position = 0
+                break
+            newlines += 1
+
+        text = decode(self._buffer[position:] + self._overlay)
+        if position > 0:
+            # Drop the newline which ends the line before the tail
+            text = text[1:]
+        lines = text.split("\n")
+        if lines[-1] == "":
+            lines.pop()
+        return lines[-num_lines:]
+
+    def finditer(self, pattern: Union[str, bytes, re.Pattern], flags: int = 0) -> Iterator[re.Match]:
+        """Find the matches of a regex in the log, without decoding it. The
+        matches are over bytes, the text added with `+` is searched
+        separately from the file."""
+        if isinstance(pattern, str):
+            pattern = pattern.encode()
+        regex = re.compile(pattern, flags)
+        for segment in self._segments():
+            yield from regex.finditer(segment)
+
+    def search(self, pattern: Union[str, bytes, re.Pattern], flags: int = 0) -> Optional[re.Match]:
+        """Find the first match of a regex in the log, see `finditer`"""
+        return next(self.finditer(pattern, flags), None)
+
+    def __contains__(self, value: Any) -> bool:
+        needle = value.encode() if isinstance(value, str) else bytes(value)
+        if self._buffer.find(needle) != -1 or needle in self._overlay:
+            return True
+        # The value may straddle the end of the file and the added text
+        if len(needle) > 1 and len(self._buffer) and self._overlay:
+            boundary = self._buffer[-(len(needle) - 1) :] + self._overlay[: len(needle) - 1]
+            return needle in boundary
+        return False
+
+    def __add__(self, rh_str: str) -> LogView:
+        if isinstance(rh_str, str):
+            self._overlay += rh_str.encode()
+            return self
+        else:
+            raise ValueError(
+                "binary operator `+` with `LogView` objects only supported with `str` right hand side operands"
+            )
+
+    def __str__(self) -> str:
+        return decode(self._buffer[:] + self._overlay)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (str, LogView)):
+            return str(self) == str(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def close(self) -> None:
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._buffer = b""
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self) -> LogView:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
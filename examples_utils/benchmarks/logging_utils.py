@@ -1,5 +1,5 @@
 # Copyright (c) 2022 Graphcore Ltd. All rights reserved.
-from typing import Sequence
+from typing import Sequence, Union
 import argparse
 import csv
 import json
@@ -13,6 +13,10 @@ import re
 from time import time
 import xml.etree.ElementTree as ET
 
+from examples_utils.benchmarks.command_utils import BenchmarkCommand
+from examples_utils.benchmarks.metrics_utils import get_compile_time
+from examples_utils.benchmarks.regression_utils import format_regressions
+
 # Attempt to import wandb silently, if app being benchmarked has required it
 WANDB_AVAILABLE = True
 try:
@@ -35,8 +39,12 @@ def configure_logger(args: argparse.Namespace):
 
     """
 
-    # Setup dir
-    if not args.log_dir:
+    # Setup dir, resumed runs continue in the log directory of the run
+    if getattr(args, "resume", None):
+        if not Path(args.resume).is_dir():
+            raise FileNotFoundError(f"Cannot resume run, log directory '{args.resume}' does not exist")
+        args.log_dir = Path(args.resume).resolve()
+    elif not args.log_dir:
         time_str = datetime.fromtimestamp(time()).strftime("%Y-%m-%d-%H.%M.%S.%f")
         args.log_dir = Path(os.getcwd(), f"log_{time_str}").resolve()
     else:
@@ -85,12 +93,13 @@ def print_benchmark_summary(results: dict):
         print(f"================ {failed} failed, {passed} passed ===============")
 
 
-def get_latest_checkpoint_path(checkpoint_root_dir: Path, variant_cmd: str) -> Path:
+def get_latest_checkpoint_path(checkpoint_root_dir: Path, variant_cmd: Union[str, BenchmarkCommand]) -> Path:
     """Get the path to the latest available checkpoint for a model.
 
     Args:
         checkpoint_root_dir (Path): The path to the benchmarking dir
-        variant_cmd (str): The command used for this model run (benchmark)
+        variant_cmd (str or BenchmarkCommand): The command used for this model
+            run (benchmark)
 
     Returns:
         latest_checkpoint_path (Path): The directory containing all checkpoints
@@ -98,15 +107,7 @@ def get_latest_checkpoint_path(checkpoint_root_dir: Path, variant_cmd: str) -> P
 
     """
 
-    cmd_args = variant_cmd.split(" --")
-
-    # Look at each arg to see if it could be a checkpoint path
-    checkpoint_dir = None
-    for arg in cmd_args:
-        if any([variant in arg for variant in ("checkpoint-output-dir", "checkpoint_output_dir")]):
-            checkpoint_dir = arg.replace("=", " ").split(" ")[1]
-            checkpoint_dir = checkpoint_dir.replace('"', "").replace("'", "")
-            break
+    checkpoint_dir = BenchmarkCommand.parse(variant_cmd).get_arg("checkpoint-output-dir", "checkpoint_output_dir")
 
     latest_checkpoint_path = None
 
@@ -191,12 +192,16 @@ def save_results(log_dir: str, additional_metrics: bool, results: dict, extra_cs
     if additional_metrics:
         csv_metrics.extend(["test_duration", "loss", "result", "cmd", "env", "git_commit_hash"])
     csv_metrics.extend(extra_csv_metrics)
+    # Only runs compared with a baseline report regressions
+    compared_to_baseline = any("regressions" in r for result in results.values() for r in result)
 
     csv_filepath = Path(log_dir, "benchmark_results.csv")
     with open(csv_filepath, "w") as csv_file:
         writer = csv.writer(csv_file, quoting=csv.QUOTE_ALL)
         # Use a fixed set of headers, any more detail belongs in the JSON file
-        writer.writerow(["benchmark name", "Variant name"] + csv_metrics)
+        writer.writerow(
+            ["benchmark name", "Variant name"] + csv_metrics + (["regressions"] if compared_to_baseline else [])
+        )
 
         # Write a row for each variant
         for benchmark, result in results.items():
@@ -205,8 +210,17 @@ def save_results(log_dir: str, additional_metrics: bool, results: dict, extra_cs
 
                 # Find all the metrics we have available from the list defined
                 for metric in csv_metrics:
-                    value = list(r["results"].get(metric, {0: None}).values())[0]
+                    # 'metric:reduction_type' selects one of several reduction types
+                    name, _, reduction_type = metric.partition(":")
+                    # Metrics whose function failed are None
+                    metric_results = r["results"].get(name) or {0: None}
+                    if reduction_type:
+                        value = metric_results.get(reduction_type)
+                    else:
+                        value = list(metric_results.values())[0]
                     csv_row.append(value)
+                if compared_to_baseline:
+                    csv_row.append(format_regressions(r))
 
                 writer.writerow(csv_row)
     logger.info(f"Results saved to {str(csv_filepath)}")
@@ -220,6 +234,10 @@ def save_results(log_dir: str, additional_metrics: bool, results: dict, extra_cs
             tc.set("name", benchmark)
             if r["exitcode"] != 0:
                 ET.SubElement(tc, "failure")
+            elif r.get("regressions"):
+                failure = ET.SubElement(tc, "failure")
+                failure.set("type", "regression")
+                failure.set("message", f"{r['variant_name']}: {format_regressions(r)}")
 
     junit_filepath = Path(log_dir, "benchmark_results.xml")
     xml = ET.ElementTree(testsuites)
@@ -362,7 +380,7 @@ def upload_compile_time(wandb_link: str, results: dict):
     os.environ["WANDB_SILENT"] = "true"
 
     run = wandb.init(project=link_parts[-3], id=link_parts[-1], resume="allow")
-    run.log({"Total compile time": results["total_compiling_time"]["mean"]})
+    run.log({"Total compile time": get_compile_time(results)})
 
     # Revert to normal
     os.environ["WANDB_SILENT"] = "false"
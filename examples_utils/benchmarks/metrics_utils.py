@@ -1,11 +1,25 @@
 # Copyright (c) 2022 Graphcore Ltd. All rights reserved.
+import heapq
 import logging
 import math
 import re
 import statistics
+from array import array
 from datetime import datetime
-from typing import Tuple
-from examples_utils.benchmarks.custom_metrics import register_custom_metric
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from examples_utils.benchmarks.custom_metrics import metric_plugin
+from examples_utils.benchmarks.expression_utils import get_derived_metrics
+from examples_utils.benchmarks.quantile_utils import TDigest, needs_distribution, reduce_samples
+from examples_utils.benchmarks.samples_utils import SampleRecorder
+from examples_utils.benchmarks.scanning_utils import (
+    LogScanner,
+    get_findall_value,
+    get_poprun_instance,
+    iter_line_blocks,
+)
+from examples_utils.benchmarks.log_view_utils import LogView
+from examples_utils.benchmarks.statistics_utils import detect_warmup
 
 # Get the module logger
 logger = logging.getLogger(__name__)
@@ -51,10 +65,38 @@ compile_time_lookup = [
     },
 ]
 date_format = "%Y-%m-%d %H:%M:%S.%f"
-poprun_instance_regex = re.compile(r"\[(.*?),(.*?)\]<stderr>:")
 
-
-def get_instance_compile_times(compile_log: str) -> list:
+# How the values of a metric from each poprun instance can be combined, and
+# the default for some metrics
+INSTANCE_REDUCTIONS = {"sum": sum, "max": max, "min": min, "mean": statistics.fmean}
+DEFAULT_INSTANCE_REDUCTIONS = {"throughput": "sum", "latency": "max"}
+
+# Reduction types which only need running totals of the values
+SIMPLE_REDUCTION_TYPES = {"mean", "final", "min", "value", "stddev"}
+
+# Fraction by which the slowest instance compile time must exceed the median
+# instance compile time for the instance to be reported as a straggler
+COMPILE_STRAGGLER_THRESHOLD = 0.2
+
+
+def compile_marker_lines(compile_log: Union[str, LogView]) -> Iterator[str]:
+    """Yield the lines of the log which contain any compile time marker"""
+    scanner = LogScanner(
+        [
+            (None, regex)
+            for comp_time in compile_time_lookup
+            for regex in comp_time["start_regex"] + comp_time["end_regex"]
+        ]
+    )
+    previous_line = None
+    for _, match in scanner.scan_log(compile_log):
+        # A line may match several markers, but must be examined once
+        if match.string is not previous_line:
+            previous_line = match.string
+            yield match.string
+
+
+def get_instance_compile_times(compile_log: Union[str, LogView]) -> list:
     """Get compile times for each instance from the logs.
 
     Parameters
@@ -67,8 +109,11 @@ def get_instance_compile_times(compile_log: str) -> list:
 
     """
 
-    results_per_inst = {comp_time["ref"]: {} for comp_time in compile_time_lookup}
-    for line in compile_log.split("\n"):
+    results_per_inst = {
+        comp_time["ref"]: {"N/A": {"start_times": [], "end_times": []}} for comp_time in compile_time_lookup
+    }
+    # Only the lines containing a compile marker need to be examined
+    for line in compile_marker_lines(compile_log):
         for comp_time in compile_time_lookup:
 
             # Get compilation start and end times from line
@@ -79,9 +124,7 @@ def get_instance_compile_times(compile_log: str) -> list:
             # instances
             poprun_inst = "N/A"
             if start_match or end_match:
-                poprun_match = re.search(poprun_instance_regex, line)
-                if poprun_match:
-                    poprun_inst = f"[{poprun_match.group(1)},{poprun_match.group(2)}]"
+                poprun_inst = get_poprun_instance(line) or "N/A"
             if poprun_inst not in results_per_inst[comp_time["ref"]]:
                 results_per_inst[comp_time["ref"]].update({poprun_inst: {"start_times": [], "end_times": []}})
 
@@ -146,6 +189,82 @@ def get_overall_compile_times(results_per_inst: dict, exitcode: int) -> dict:
     return {"mean": total_compiling_time}
 
 
+def get_instance_compile_breakdown(results_per_inst: dict) -> Dict[str, Dict[str, float]]:
+    """Get the duration of each compile phase on each instance.
+
+    Args:
+        results_per_inst (dict): Compile time results per instance for all
+            instances, from `get_instance_compile_times`
+
+    Returns:
+        instance_times (dict): For each instance, the duration in seconds of
+            each phase with both a start and an end time, and 'total' from its
+            earliest start to its latest end
+
+    """
+
+    instance_times = {}
+    instance_spans = {}
+    for comp_time in compile_time_lookup:
+        for instance, times in results_per_inst[comp_time["ref"]].items():
+            if not times["start_times"] or not times["end_times"]:
+                continue
+            start_time = min(times["start_times"])
+            end_time = max(times["end_times"])
+            instance_times.setdefault(instance, {})[comp_time["ref"]] = (end_time - start_time).total_seconds()
+            span_start, span_end = instance_spans.get(instance, (start_time, end_time))
+            instance_spans[instance] = (min(span_start, start_time), max(span_end, end_time))
+
+    for instance, (start_time, end_time) in instance_spans.items():
+        instance_times[instance]["total"] = (end_time - start_time).total_seconds()
+    return instance_times
+
+
+def get_compile_straggler_stats(instance_times: Dict[str, Dict[str, float]]) -> dict:
+    """Summarise how the compile time varies between instances.
+
+    Args:
+        instance_times (dict): Compile phase durations of each instance, from
+            `get_instance_compile_breakdown`
+
+    Returns:
+        straggler_stats (dict): The longest and shortest instance compile
+            times, the skew between them and the slowest instance. Empty if
+            there is no instance with a complete compilation
+
+    """
+
+    totals = {instance: times["total"] for instance, times in instance_times.items() if "total" in times}
+    if not totals:
+        return {}
+
+    slowest_instance = max(totals, key=totals.get)
+    max_time = totals[slowest_instance]
+    min_time = min(totals.values())
+    median_time = statistics.median(totals.values())
+    if len(totals) > 1 and median_time > 0 and max_time > median_time * (1 + COMPILE_STRAGGLER_THRESHOLD):
+        # The phase in which the straggler is furthest behind the other instances
+        phase_delays = {
+            ref: duration - statistics.median(times.get(ref, 0.0) for times in instance_times.values())
+            for ref, duration in instance_times[slowest_instance].items()
+            if ref != "total"
+        }
+        slowest_phase = max(phase_delays, key=phase_delays.get)
+        logger.warning(
+            f"   Compile straggler: instance {slowest_instance} took {max_time:.2f} seconds to compile, "
+            f"{max_time / median_time - 1:.0%} longer than the median instance, mostly in {slowest_phase}"
+        )
+
+    return {
+        "num_instances": len(totals),
+        "max_instance_time": max_time,
+        "min_instance_time": min_time,
+        "skew": max_time - min_time,
+        "slowest_instance": slowest_instance,
+    }
+
+
+@metric_plugin(streams=["stderr"])
 def get_results_for_compile_time(_: str, stderr: str, exitcode: int) -> dict:
     """Function to gather compile time results from stderr.
 
@@ -157,7 +276,9 @@ def get_results_for_compile_time(_: str, stderr: str, exitcode: int) -> dict:
         exitcode (int): The exitcode form the process that ran the benchmark command
 
     Results:
-        total_compiling_time (dict): The compile as a dictionary
+        total_compiling_time (dict): The compile as a dictionary, with the
+            compile time of each phase on each instance in 'instances' and the
+            statistics from `get_compile_straggler_stats`
 
     """
 
@@ -177,9 +298,21 @@ def get_results_for_compile_time(_: str, stderr: str, exitcode: int) -> dict:
 
     logger.info(compile_time_output)
 
+    # Keep the compile time of each phase on each instance to find stragglers
+    if is_recording_legit:
+        instance_times = get_instance_compile_breakdown(results_per_inst)
+        total_compiling_time.update(get_compile_straggler_stats(instance_times))
+        total_compiling_time["instances"] = instance_times
+
     return total_compiling_time
 
 
+def get_compile_time(results: dict) -> Optional[float]:
+    """Get the total compile time of a benchmark from its results, None if
+    it was not found or its metric function failed"""
+    return (results.get("total_compiling_time") or {}).get("mean")
+
+
 def set_config_defaults(data_extraction_dict: dict) -> dict:
     """Set default values for some data configs if they are not defined.
 
@@ -203,6 +336,427 @@ def set_config_defaults(data_extraction_dict: dict) -> dict:
     return data_extraction_dict
 
 
+def reduce_values(values: np.ndarray, reduction_type: str) -> Optional[float]:
+    """Reduce all the values of a metric, see `OnlineReducer` for the
+    reduction types"""
+    if reduction_type == "mean":
+        return float(np.mean(values))
+    elif reduction_type == "final":
+        return float(values[-1])
+    elif reduction_type == "min":
+        return float(np.min(values))
+    elif reduction_type == "value":
+        return float(values[0])
+    elif reduction_type == "stddev":
+        return float(np.std(values, ddof=1)) if len(values) > 1 else None
+    elif needs_distribution(reduction_type):
+        return reduce_samples(values, reduction_type)
+    return None
+
+
+class OnlineReducer:
+    """Reduces the values of a metric as they are found, keeping a constant
+    amount of state whatever the number of values.
+
+    Note:
+        For the 'mean' reduction type the `skip` lowest values (highest for
+        'latency') are discarded, this needs `skip` values to be kept. With
+        `skip` set to 'auto', all values are kept and the leading values
+        taken before the metric reached a steady state are discarded for all
+        reduction types, see `detect_warmup`.
+        Percentiles ('p50', 'p99.9', ...), 'median', 'iqr' and 'trimmed_mean'
+        need the distribution of the values: all the values are kept, unless
+        `streaming` is set, in which case they are estimated with a t-digest.
+
+    Args:
+        name (str): Name of the metric
+        reduction_type (str or list): One or more of 'mean', 'final', 'min',
+            'value', 'stddev', 'median', 'iqr', 'trimmed_mean' or
+            'p<percentile>', the first one is the main value of the metric
+        skip (int or str): Number of values to discard for the 'mean'
+            reduction, or 'auto'
+        streaming (bool): Estimate the distribution of the values in constant
+            memory instead of keeping all of them
+
+    """
+
+    def __init__(
+        self, name: str, reduction_type: Union[str, List[str]], skip: Union[int, str], streaming: bool = False
+    ):
+        self.name = name
+        self.reduction_types = [reduction_type] if isinstance(reduction_type, str) else list(reduction_type)
+        self.reduction_type = self.reduction_types[0]
+        # The warmup is found once all values are known, they must be kept
+        self.auto_skip = skip == "auto"
+        self.skip = 0 if self.auto_skip else skip
+        if self.auto_skip and streaming:
+            logger.warning(f"  '{name}' has 'skip: auto', all of its values are kept even though 'streaming' is set")
+            streaming = False
+        self.count = 0
+        self.total = 0.0
+        self.has_nan = False
+        self.first = None
+        self.last = None
+        self.min = None
+        # Running mean and sum of squared differences for the 'stddev'
+        self._mean = 0.0
+        self._m2 = 0.0
+        # Heap of the values to skip, stored so that the root is the value
+        # which will be kept first if a more extreme one is found
+        self._sign = 1 if name == "latency" else -1
+        self._skipped: List[float] = []
+
+        for reduction_type in self.reduction_types:
+            if reduction_type not in SIMPLE_REDUCTION_TYPES and not needs_distribution(reduction_type):
+                logger.error(f"  '{name}' has an unknown reduction type: '{reduction_type}'")
+        self._samples = None
+        self._digest = None
+        if self.auto_skip or any(needs_distribution(reduction_type) for reduction_type in self.reduction_types):
+            if streaming:
+                self._digest = TDigest()
+            else:
+                self._samples = array("d")
+
+    def add(self, value: float, line: str = ""):
+        if math.isnan(value):
+            self.has_nan = True
+        self.count += 1
+        self.total += value
+        self.last = value
+        if self.first is None:
+            self.first = value
+        if self.min is None or value < self.min:
+            self.min = value
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+        if self.skip and self.reduction_type == "mean":
+            if len(self._skipped) < self.skip:
+                heapq.heappush(self._skipped, self._sign * value)
+            elif self._sign * value > self._skipped[0]:
+                heapq.heapreplace(self._skipped, self._sign * value)
+        if self._samples is not None:
+            self._samples.append(value)
+        elif self._digest is not None:
+            self._digest.add(value)
+
+    def detected_skip(self) -> int:
+        """Number of leading values discarded as warmup with 'skip: auto'"""
+        return detect_warmup(np.frombuffer(self._samples))
+
+    def reduce(self, reduction_type: str) -> Optional[float]:
+        """Get the value of one reduction type, or None if not enough values
+        were found"""
+        if self.auto_skip:
+            steady_values = np.frombuffer(self._samples)[self.detected_skip() :]
+            return reduce_values(steady_values, reduction_type) if len(steady_values) else None
+        if self.count <= self.skip:
+            return None
+        if reduction_type == "mean":
+            skipped_total = self._sign * sum(self._skipped)
+            return (self.total - skipped_total) / (self.count - self.skip)
+        elif reduction_type == "final":
+            return self.last
+        elif reduction_type == "min":
+            return self.min
+        elif reduction_type == "value":
+            return self.first
+        elif reduction_type == "stddev":
+            return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else None
+        elif needs_distribution(reduction_type):
+            if self._digest is not None:
+                return self._digest.reduce(reduction_type)
+            return reduce_samples(np.frombuffer(self._samples), reduction_type)
+        return None
+
+    def value(self) -> Optional[float]:
+        """Get the main reduced value, or None if not enough values were found"""
+        return self.reduce(self.reduction_type)
+
+    def running_value(self) -> Optional[float]:
+        """Get the main value in constant time while values are still being
+        added: the mean of all values so far when the reduction needs all
+        the values or the warmup to be found"""
+        if self.auto_skip or needs_distribution(self.reduction_type):
+            return self._mean if self.count else None
+        return self.value()
+
+    def values(self) -> Dict[str, Optional[float]]:
+        """Get the value of each reduction type"""
+        return {reduction_type: self.reduce(reduction_type) for reduction_type in self.reduction_types}
+
+
+class InstanceReducer:
+    """Reduces the values of a metric separately for each poprun instance,
+    then combines the values of the instances.
+
+    Note:
+        The instance of a value is found from the poprun prefix of its line
+        (see `get_poprun_instance`), values from lines without a prefix are
+        attributed to the instance 'N/A'.
+
+    Args:
+        name (str): Name of the metric
+        reduction_type (str or list): Reduction types of the values of each
+            instance, see `OnlineReducer`
+        skip (int or str): Values to discard for each instance, see
+            `OnlineReducer`
+        streaming (bool): See `OnlineReducer`
+        instance_reduction (str): How the values of the instances are combined,
+            one of 'sum', 'max', 'min' or 'mean', or 'auto' for the default of
+            the metric in `DEFAULT_INSTANCE_REDUCTIONS`
+
+    """
+
+    def __init__(
+        self,
+        name: str,
+        reduction_type: Union[str, List[str]],
+        skip: Union[int, str],
+        streaming: bool,
+        instance_reduction: str,
+    ):
+        if instance_reduction == "auto":
+            instance_reduction = DEFAULT_INSTANCE_REDUCTIONS.get(name, "mean")
+        if instance_reduction not in INSTANCE_REDUCTIONS:
+            raise ValueError(
+                f"'{name}' instance_reduction must be one of {', '.join(INSTANCE_REDUCTIONS)} or 'auto', "
+                f"not '{instance_reduction}'"
+            )
+        self.name = name
+        self.instance_reduction = instance_reduction
+        self._new_reducer = lambda: OnlineReducer(name, reduction_type, skip, streaming)
+        prototype = self._new_reducer()
+        self.reduction_types = prototype.reduction_types
+        self.reduction_type = prototype.reduction_type
+        self.skip = prototype.skip
+        # The warmup of each instance is reported with its own values
+        self.auto_skip = False
+        self.reducers: Dict[str, OnlineReducer] = {}
+
+    def add(self, value: float, line: str = ""):
+        instance = get_poprun_instance(line) or "N/A"
+        if instance not in self.reducers:
+            self.reducers[instance] = self._new_reducer()
+        self.reducers[instance].add(value)
+
+    @property
+    def has_nan(self) -> bool:
+        return any(reducer.has_nan for reducer in self.reducers.values())
+
+    @property
+    def count(self) -> int:
+        """Number of values of the instance with the fewest values"""
+        return min((reducer.count for reducer in self.reducers.values()), default=0)
+
+    def reduce(self, reduction_type: str) -> Optional[float]:
+        """Get the combined value of the instances, or None if any instance
+        has no value"""
+        values = [reducer.reduce(reduction_type) for reducer in self.reducers.values()]
+        if not values or any(value is None for value in values):
+            return None
+        return INSTANCE_REDUCTIONS[self.instance_reduction](values)
+
+    def value(self) -> Optional[float]:
+        """Get the main combined value"""
+        return self.reduce(self.reduction_type)
+
+    def running_value(self) -> Optional[float]:
+        """Get the combined running value of the instances, see
+        `OnlineReducer.running_value`"""
+        values = [reducer.running_value() for reducer in self.reducers.values()]
+        if not values or any(value is None for value in values):
+            return None
+        return INSTANCE_REDUCTIONS[self.instance_reduction](values)
+
+    def values(self) -> Dict[str, Optional[float]]:
+        """Get the combined value of each reduction type"""
+        return {reduction_type: self.reduce(reduction_type) for reduction_type in self.reduction_types}
+
+    def instance_statistics(self) -> dict:
+        """Get the values of each instance and how unbalanced they are.
+
+        Returns:
+            statistics (dict): The values of each instance in 'instances', the
+                ratio of the largest to the smallest main value of the
+                instances in 'imbalance', and the instance with the lowest
+                throughput or highest value of other metrics (e.g. latency) in
+                'slowest_instance'
+
+        """
+
+        instances = {}
+        for instance, reducer in self.reducers.items():
+            instances[instance] = reducer.values()
+            if reducer.auto_skip and reducer.count:
+                instances[instance]["detected_skip"] = reducer.detected_skip()
+        main_values = {
+            instance: values[self.reduction_type]
+            for instance, values in instances.items()
+            if values[self.reduction_type] is not None
+        }
+        stats = {"instances": instances, "imbalance": None, "slowest_instance": None}
+        if main_values:
+            largest, smallest = max(main_values.values()), min(main_values.values())
+            stats["imbalance"] = largest / smallest if smallest > 0 else None
+            slowest = min if self.name == "throughput" else max
+            stats["slowest_instance"] = slowest(main_values, key=main_values.get)
+        return stats
+
+
+class MetricsExtractor:
+    """Extract metrics from the log of a benchmark one line at a time.
+
+    Lines can be passed to `process_line` while the benchmark is running so
+    that the results are available as soon as it has finished.
+
+    Args:
+        extraction_config (dict): Configuration describing how to extract
+            metrics from the log
+        record_samples (bool): Keep every value found in `samples`, see
+            `SampleRecorder`
+
+    """
+
+    def __init__(self, extraction_config: dict, record_samples: bool = False):
+        self.metrics = []
+        for name, metric in extraction_config.items():
+            # Set defaults for any reduction types/skip values that could be missed
+            metric_spec = set_config_defaults(metric)
+            if metric_spec.get("instance_reduction"):
+                reducer = InstanceReducer(
+                    name,
+                    metric_spec["reduction_type"],
+                    metric_spec["skip"],
+                    metric_spec.get("streaming", False),
+                    metric_spec["instance_reduction"],
+                )
+            else:
+                reducer = OnlineReducer(
+                    name, metric_spec["reduction_type"], metric_spec["skip"], metric_spec.get("streaming", False)
+                )
+            self.metrics.append((re.compile(metric_spec["regexp"]), reducer))
+        # All metrics are found in a single pass over the log
+        self.scanner = LogScanner([(reducer, regexp) for regexp, reducer in self.metrics])
+        # Every value found, with its line and time, if requested
+        self.samples = SampleRecorder(list(extraction_config)) if record_samples else None
+        self.lines_seen = {"stdout": 0, "stderr": 0}
+
+    def process_line(self, line: str, stream: str = "stdout", timestamp: Optional[float] = None):
+        """Find the values of all metrics in a line of the log"""
+        if self.samples is not None:
+            self.process_text(line, stream, timestamp)
+            return
+        for reducer, match in self.scanner.scan_line(line):
+            reducer.add(float(get_findall_value(match)), match.string)
+
+    def process_text(self, text: str, stream: str = "stdout", timestamp: Optional[float] = None):
+        """Find the values of all metrics in whole lines of the log.
+
+        Args:
+            text (str): Whole lines of the log, separated by '\\n'
+            stream (str): 'stdout' or 'stderr', the stream of the lines
+            timestamp (float): When the lines were read, as returned by
+                `time.time()`, recorded with the samples
+
+        """
+
+        if self.samples is None:
+            for reducer, match in self.scanner.scan(text):
+                reducer.add(float(get_findall_value(match)), match.string)
+            return
+
+        first_line = self.lines_seen[stream]
+        for line_number, reducer, match in self.scanner.scan_numbered(text):
+            value = float(get_findall_value(match))
+            reducer.add(value, match.string)
+            self.samples.add(reducer.name, value, stream, first_line + line_number, match.string, timestamp)
+        self.lines_seen[stream] += text.count("\n") + 1
+
+    def process_log(self, log: Union[str, LogView], stream: str = "stdout"):
+        """Find the values of all metrics in a whole log, which may be a file"""
+        if self.samples is None:
+            for reducer, match in self.scanner.scan_log(log):
+                reducer.add(float(get_findall_value(match)), match.string)
+            return
+        for block in iter_line_blocks(log):
+            self.process_text(block, stream)
+
+    def running_values(self) -> Dict[str, Optional[float]]:
+        """Get the current value of each metric from the lines seen so far.
+
+        Note:
+            This is called for the progress display while the logs are read,
+            it takes constant time whatever the number of values, see
+            `OnlineReducer.running_value`. The reductions which need all the
+            values are only computed by `get_results`.
+
+        """
+        return {reducer.name: reducer.running_value() for _, reducer in self.metrics}
+
+    def get_results(self, exitcode: int, num_replicas: int) -> Tuple[dict, bool]:
+        """Get the final metrics from all the lines processed.
+
+        Args:
+            exitcode (int): The benchmark process exitcode
+            num_replicas (int): The number of replicas used in this benchmark
+
+        Returns:
+            extracted_metrics (dict): All metrics that were extracted from the log
+            did_extraction_fail (bool): Whether or not the metrics extraction from
+                the logs was a failure
+
+        """
+
+        extracted_metrics = {}
+        did_extraction_fail = False
+
+        for _, reducer in self.metrics:
+            name = reducer.name
+            result = {reduction_type: None for reduction_type in reducer.reduction_types}
+
+            if reducer.has_nan:
+                logger.error(f"  '{name}' is a NaN")
+            elif exitcode:
+                logger.error(f"  '{name}' had non-zero exitcode: '{str(exitcode)}'")
+            # Check results sufficient for 'skip'
+            elif reducer.count <= reducer.skip:
+                logger.error(f"  '{name}' has less results than the skip value: '{reducer.skip}'")
+
+            # Post-process the results
+            else:
+                result = reducer.values()
+
+                # Multiply the result by the number of replicas if mpinum is >1.
+                # NOTE: mpinum will only be > 1 if mpirun was used in the command
+                # and hence throughput values could not have been allreduced within
+                # the app. Throughputs combined from each instance are complete.
+                if name == "throughput" and not isinstance(reducer, InstanceReducer):
+                    result = {k: v * num_replicas if v is not None else None for k, v in result.items()}
+
+            if reducer.auto_skip and reducer.count:
+                result["detected_skip"] = reducer.detected_skip()
+                logger.info(f"   {name} reached a steady state after {result['detected_skip']} values")
+            extracted_metrics[name] = result
+            printable = {k: str(v) if v is not None else "VALUE_NOT_FOUND" for k, v in result.items()}
+            if len(printable) == 1:
+                logger.info(f"   {name} = '{printable[reducer.reduction_type]}'")
+            else:
+                logger.info(f"   {name} = " + ", ".join(f"{k}: '{v}'" for k, v in printable.items()))
+
+            if any(v is None for v in result.values()):
+                did_extraction_fail = True
+
+            if isinstance(reducer, InstanceReducer):
+                result.update(reducer.instance_statistics())
+                logger.info(
+                    f"   {name} from {len(result['instances'])} instances, imbalance: '{result['imbalance']}', "
+                    f"slowest instance: '{result['slowest_instance']}'"
+                )
+
+        return extracted_metrics, did_extraction_fail
+
+
 def extract_metrics(
     extraction_config: dict, stdout: str, stderr: str, exitcode: int, num_replicas: int
 ) -> Tuple[dict, bool]:
@@ -223,65 +777,11 @@ def extract_metrics(
 
     """
 
-    extracted_metrics = {}
-    did_extraction_fail = False
+    extractor = MetricsExtractor(extraction_config)
+    extractor.process_log(stdout, "stdout")
+    extractor.process_log(stderr, "stderr")
 
-    for name, metric in extraction_config.items():
-        result = None
-
-        # Set defaults for any reduction types/skip values that could be missed
-        metric_spec = set_config_defaults(metric)
-
-        # Get all raw results from log according to all regexes given
-        all_results = []
-        for line in stdout.split("\n"):
-            for match in re.findall(metric_spec["regexp"], line):
-                all_results.append(float(match))
-
-        for line in stderr.split("\n"):
-            for match in re.findall(metric_spec["regexp"], line):
-                all_results.append(float(match))
-
-        if any([math.isnan(ar) for ar in all_results]):
-            logger.error(f"  '{name}' is a NaN")
-        elif exitcode:
-            logger.error(f"  '{name}' had non-zero exitcode: '{str(exitcode)}'")
-        # Check results sufficient for 'skip'
-        elif len(all_results) <= metric_spec["skip"]:
-            logger.error(f"  '{name}' has less results than the skip value: '{metric_spec['skip']}'")
-
-        # Post-process the results
-        else:
-            if metric_spec["reduction_type"] == "mean":
-                if name == "latency":
-                    all_results.sort(reverse=True)
-                else:
-                    all_results.sort()
-
-                all_results = all_results[metric_spec["skip"] :]
-                result = sum(all_results) / len(all_results)
-
-            elif metric_spec["reduction_type"] == "final":
-                result = all_results[-1]
-            elif metric_spec["reduction_type"] == "min":
-                result = min(all_results)
-            elif metric_spec["reduction_type"] == "value":
-                result = all_results[0]
-
-            # Multiply the result by the number of replicas if mpinum is >1.
-            # NOTE: mpinum will only be > 1 if mpirun was used in the command
-            # and hence throughput values could not have been allreduced within
-            # the app
-            if name == "throughput":
-                result *= num_replicas
-
-        extracted_metrics[name] = {metric_spec["reduction_type"]: result}
-        logger.info(f"   {name} = '{str(result) if result is not None else 'VALUE_NOT_FOUND'}'")
-
-        if result is None:
-            did_extraction_fail = True
-
-    return extracted_metrics, did_extraction_fail
+    return extractor.get_results(exitcode, num_replicas)
 
 
 def flatten_results(results: dict, derivation_config: dict) -> dict:
@@ -315,6 +815,11 @@ def derive_metrics(
 ) -> Tuple[dict, bool]:
     """Derive metrics from other metrics using specified expressions.
 
+    Note:
+        Expressions are restricted to arithmetic and a few math functions, see
+        `DerivedExpression`. Derived metrics may use other derived metrics,
+        whatever their order in the spec.
+
     Args:
         derivation_config (dict): The config defining how metrics will be
             dervied from other metrics
@@ -329,33 +834,22 @@ def derive_metrics(
 
     """
 
-    did_derivation_fail = False
-
-    for name, config in derivation_config.items():
-        result = None
-        config = set_config_defaults(config)
-
-        # In the case of a non-zero exitcode
-        if exitcode:
+    if exitcode:
+        for name, config in derivation_config.items():
             logger.error(f"  '{name}' had non-zero exitcode: '{str(exitcode)}'")
-        else:
-            # Format the expression to replace parameter names with actual
-            # values for this benchmark/variant
-            expression = config["expr"].format(**{**flatten_results(results, derivation_config), **benchmark_config})
+            results[name] = {set_config_defaults(config)["reduction_type"]: None}
+        return results, bool(derivation_config)
 
-            # Evaluate the expression
-            try:
-                result = eval(expression)
-                logger.info(f"   '{name}' = '{str(result)}'")
-            except:
-                logger.error(f"   ERROR: '{name}' = 'derived' expression: '{expression}' excepted")
+    # The expressions are parsed once for all the variants of a benchmark
+    try:
+        derived_metrics = get_derived_metrics(derivation_config)
+    except ValueError as error:
+        logger.error(f"   ERROR: {error}")
+        for name, config in derivation_config.items():
+            results[name] = {set_config_defaults(config)["reduction_type"]: None}
+        return results, True
 
-        results[name] = {config["reduction_type"]: result}
-
-        if result is None:
-            did_derivation_fail = True
-
-    return results, did_derivation_fail
+    return derived_metrics.evaluate(results, benchmark_config)
 
 
 def get_match_of_list(regex_list: list, line: str) -> str:
@@ -394,6 +888,3 @@ def additional_metrics(
     results["env"] = {"env": env_string}
 
     return results
-
-
-register_custom_metric("total_compiling_time", get_results_for_compile_time)
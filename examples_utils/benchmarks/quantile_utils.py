@@ -0,0 +1,178 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import logging
+import math
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Get the module logger
+logger = logging.getLogger(__name__)
+
+# Percentile reduction types, e.g. 'p50', 'p99' or 'p99.9'
+percentile_regex = re.compile(r"p(\d+(?:\.\d+)?)")
+
+# Reduction types computed from the distribution of all the values of a metric
+DISTRIBUTION_REDUCTION_TYPES = {"median", "iqr", "trimmed_mean"}
+
+# Fraction of the values discarded at each end for the 'trimmed_mean'
+TRIMMED_MEAN_FRACTION = 0.1
+
+# Compression of the t-digest, it keeps about this many centroids and its
+# quantiles are accurate to a fraction of a percent, best at the tails
+TDIGEST_COMPRESSION = 200
+
+
+def get_percentile(reduction_type: str) -> Optional[float]:
+    """Get the percentile of a 'p<percentile>' reduction type, or None if it
+    is not one"""
+    match = percentile_regex.fullmatch(reduction_type)
+    if match is None or float(match.group(1)) > 100:
+        return None
+    return float(match.group(1))
+
+
+def needs_distribution(reduction_type: str) -> bool:
+    """Check if a reduction type needs more than running totals"""
+    return reduction_type in DISTRIBUTION_REDUCTION_TYPES or get_percentile(reduction_type) is not None
+
+
+def reduce_samples(samples: np.ndarray, reduction_type: str) -> Optional[float]:
+    """Reduce all the values of a metric with NumPy.
+
+    Args:
+        samples (np.ndarray): All the values of the metric
+        reduction_type (str): 'median', 'iqr', 'trimmed_mean' or 'p<percentile>'
+
+    Returns:
+        value (float): The reduced value
+
+    """
+
+    if reduction_type == "median":
+        return float(np.median(samples))
+    if reduction_type == "iqr":
+        q1, q3 = np.percentile(samples, [25, 75])
+        return float(q3 - q1)
+    if reduction_type == "trimmed_mean":
+        trimmed = int(len(samples) * TRIMMED_MEAN_FRACTION)
+        return float(np.mean(np.sort(samples)[trimmed : len(samples) - trimmed]))
+    return float(np.percentile(samples, get_percentile(reduction_type)))
+
+
+class TDigest:
+    """Streaming estimate of the quantiles of a metric with a constant amount
+    of memory, for logs with millions of values.
+
+    Note:
+        This is a merging t-digest (Dunning and Ertl, "Computing Extremely
+        Accurate Quantiles Using t-Digests") with the k1 scale function. The
+        values are buffered, and merged into centroids whose size shrinks
+        towards the tails so that extreme quantiles remain accurate.
+
+    Args:
+        compression (int): Larger values keep more centroids and are more
+            accurate
+
+    """
+
+    def __init__(self, compression: int = TDIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.buffer: List[float] = []
+        self.buffer_size = 5 * compression
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.buffer.append(value)
+        self.count += 1
+        if len(self.buffer) >= self.buffer_size:
+            self._merge()
+
+    def _q_limit(self, q: float) -> float:
+        """Largest quantile a centroid starting at `q` may reach"""
+        k = self.compression / (2 * math.pi) * math.asin(2 * q - 1) + 1
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def _merge(self):
+        if not self.buffer:
+            return
+        buffer = np.array(self.buffer)
+        self.buffer = []
+        self.min = min(self.min, float(buffer.min()))
+        self.max = max(self.max, float(buffer.max()))
+
+        means = np.concatenate([self.means, buffer])
+        weights = np.concatenate([self.weights, np.ones(len(buffer))])
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order].tolist(), weights[order].tolist()
+        total = sum(weights)
+
+        new_means, new_weights = [], []
+        mean, weight = means[0], weights[0]
+        q_start = 0.0
+        q_limit = self._q_limit(q_start)
+        for next_mean, next_weight in zip(means[1:], weights[1:]):
+            if q_start + (weight + next_weight) / total <= q_limit:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                new_means.append(mean)
+                new_weights.append(weight)
+                q_start += weight / total
+                q_limit = self._q_limit(q_start)
+                mean, weight = next_mean, next_weight
+        new_means.append(mean)
+        new_weights.append(weight)
+        self.means, self.weights = np.array(new_means), np.array(new_weights)
+
+    def centroids(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the means and weights of the centroids of all values added"""
+        self._merge()
+        return self.means, self.weights
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the `q` quantile, 0 <= q <= 1"""
+        means, weights = self.centroids()
+        if not self.count:
+            return None
+        if len(means) == 1 or q <= 0:
+            return float(means[0]) if q > 0 else self.min
+        if q >= 1:
+            return self.max
+
+        # Each centroid sits at the middle rank of the values it stands for,
+        # interpolate between them and towards the extremes at the ends. With
+        # ranks from 0 to count - 1 this matches `np.percentile` while the
+        # centroids are single values.
+        centres = np.cumsum(weights) - (weights + 1) / 2
+        positions = np.concatenate([[0.0], centres, [self.count - 1]])
+        values = np.concatenate([[self.min], means, [self.max]])
+        return float(np.interp(q * (self.count - 1), positions, values))
+
+    def trimmed_mean(self, fraction: float) -> Optional[float]:
+        """Estimate the mean of the values between the `fraction` and
+        `1 - fraction` quantiles"""
+        means, weights = self.centroids()
+        if not self.count:
+            return None
+        starts = np.cumsum(weights) - weights
+        low, high = fraction * self.count, (1 - fraction) * self.count
+        # Weight of each centroid inside the kept range
+        kept = np.clip(np.minimum(starts + weights, high) - np.maximum(starts, low), 0, None)
+        return float(np.sum(means * kept) / np.sum(kept))
+
+    def reduce(self, reduction_type: str) -> Optional[float]:
+        """Estimate a reduction type which `needs_distribution`"""
+        if reduction_type == "median":
+            return self.quantile(0.5)
+        if reduction_type == "iqr":
+            return self.quantile(0.75) - self.quantile(0.25)
+        if reduction_type == "trimmed_mean":
+            return self.trimmed_mean(TRIMMED_MEAN_FRACTION)
+        return self.quantile(get_percentile(reduction_type) / 100)
@@ -0,0 +1,300 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from examples_utils.benchmarks.command_utils import fan_out_results, load_coalesced_variants
+from examples_utils.benchmarks.custom_metrics import (
+    DEFAULT_HOOK_TIMEOUT,
+    HOOK_TIMES_RESULT,
+    combine_hook_times,
+    get_metric_plugin_names,
+    import_metrics_hooks_files,
+    load_metric_plugin,
+    process_registered_metrics,
+)
+from examples_utils.benchmarks.environment_utils import get_mpinum
+from examples_utils.benchmarks.logging_utils import print_benchmark_summary, save_results
+from examples_utils.benchmarks.metrics_utils import MetricsExtractor, derive_metrics, get_compile_time
+from examples_utils.benchmarks.run_benchmarks import parse_benchmark_specs
+from examples_utils.benchmarks.log_view_utils import LogView
+from examples_utils.benchmarks.statistics_utils import aggregate_results
+
+# Get the module logger
+logger = logging.getLogger(__name__)
+
+VARIANT_RESULT_FILE = "variant_result.json"
+
+# Results added by '--additional-metrics' which do not come from the logs
+ADDITIONAL_RESULTS = ("test_duration", "cmd", "git_commit_hash", "env")
+
+
+def reextract_run(
+    run_log_dir: Path,
+    benchmark_dict: dict,
+    variant_result: dict,
+    exitcode: int,
+    hook_timeout: float,
+    metric_plugins: List[str],
+) -> Tuple[dict, bool, dict]:
+    """Extract the metrics of one run of a variant from its stored logs.
+
+    Args:
+        run_log_dir (Path): Directory containing the 'stdout' and 'stderr' of
+            the run
+        benchmark_dict (dict): The benchmark definition from the yaml file
+        variant_result (dict): The stored result of the variant
+        exitcode (int): Exit code of the benchmark process
+        hook_timeout (float): Time budget of each custom metric function
+        metric_plugins (list): Names of the metric plugins to run
+
+    Returns:
+        results (dict): The metrics of the run
+        did_processing_fail (bool): Whether extraction or derivation failed
+        metric_hook_times (dict): Time taken by each custom metric function
+
+    """
+
+    stdout = LogView(run_log_dir / "stdout")
+    stderr = LogView(run_log_dir / "stderr")
+    try:
+        metrics_extractor = MetricsExtractor(benchmark_dict.get("data", {}))
+        metrics_extractor.process_log(stdout, "stdout")
+        metrics_extractor.process_log(stderr, "stderr")
+        results, extraction_failure = metrics_extractor.get_results(exitcode, get_mpinum(variant_result["command"]))
+
+        # Results which cannot be extracted again are kept from the original run
+        for name in ADDITIONAL_RESULTS:
+            if name in variant_result["results"]:
+                results[name] = variant_result["results"][name]
+        if "result" in variant_result["results"]:
+            results["result"] = {"result": str(bool(not exitcode))}
+
+        results, derivation_failure = derive_metrics(
+            benchmark_dict.get("derived", {}), variant_result["params"], results, exitcode
+        )
+        results = process_registered_metrics(
+            results, stdout, stderr, exitcode, timeout=hook_timeout, plugins=metric_plugins
+        )
+    finally:
+        stdout.close()
+        stderr.close()
+
+    metric_hook_times = results.pop(HOOK_TIMES_RESULT, {})
+    return results, extraction_failure or derivation_failure, metric_hook_times
+
+
+def reextract_variant(
+    variant_log_dir: Path, benchmark_dict: dict, hook_timeout: float, metric_plugins: List[str]
+) -> dict:
+    """Extract again the metrics of a variant from the logs of a previous run
+    and rewrite its 'variant_result.json'.
+
+    Note:
+        Variants which were run several times are re-extracted from the logs
+        of each measured run, then aggregated as when they were run. Variants
+        whose warmup or measured run failed are re-extracted from the logs of
+        that run.
+
+    Args:
+        variant_log_dir (Path): Log directory of the variant
+        benchmark_dict (dict): The benchmark definition from the yaml file
+        hook_timeout (float): Time budget of each custom metric function
+        metric_plugins (list): Names of the metric plugins to run
+
+    Returns:
+        variant_result (dict): The result of the variant with the new metrics
+
+    """
+
+    with open(variant_log_dir / VARIANT_RESULT_FILE) as f:
+        variant_result = json.load(f)
+    logger.info(f"Re-extracting metrics of '{variant_result['variant_name']}'")
+
+    # Failures to extract metrics are not failures of the process
+    exitcode = variant_result.get("process_exitcode", variant_result["exitcode"])
+
+    repeats = variant_result.get("repeats")
+    if repeats is None:
+        run_log_dir = variant_log_dir / variant_result.get("failed_run", "")
+        results, failed, metric_hook_times = reextract_run(
+            run_log_dir, benchmark_dict, variant_result, exitcode, hook_timeout, metric_plugins
+        )
+    else:
+        run_results = []
+        run_failures = []
+        run_hook_times = []
+        for i in range(repeats["measured_runs"]):
+            run_result = dict(variant_result, results=repeats["run_results"][i])
+            results, run_failed, hook_times = reextract_run(
+                variant_log_dir / f"repeat_{i}", benchmark_dict, run_result, exitcode, hook_timeout, metric_plugins
+            )
+            run_results.append(results)
+            run_failures.append(run_failed)
+            run_hook_times.append(hook_times)
+        metric_names = list(benchmark_dict.get("data", {})) + list(benchmark_dict.get("derived", {}))
+        results = aggregate_results(run_results, metric_names, repeats["confidence_level"])
+        failed = any(run_failures)
+        metric_hook_times = combine_hook_times(run_hook_times)
+        repeats["run_results"] = run_results
+
+    variant_result["results"] = results
+    variant_result["metric_hook_times"] = metric_hook_times
+    variant_result["exitcode"] = 1 if failed and exitcode == 0 else exitcode
+    variant_result["compilation_end_time"] = str(get_compile_time(results))
+    # Regressions were found with the old metrics
+    variant_result.pop("regressions", None)
+
+    with open(variant_log_dir / VARIANT_RESULT_FILE, "w") as f:
+        json.dump(variant_result, f)
+    return variant_result
+
+
+def find_variant_log_dirs(log_dir: Path) -> List[Path]:
+    """Find the log directories of the variants of a benchmarking run,
+    directories without a variant result are skipped"""
+    variant_log_dirs = []
+    for path in sorted(Path(log_dir).iterdir()):
+        if not path.is_dir():
+            continue
+        if (path / VARIANT_RESULT_FILE).exists():
+            variant_log_dirs.append(path)
+        else:
+            logger.warning(f"Skipping '{path.name}', it has no '{VARIANT_RESULT_FILE}'")
+    return variant_log_dirs
+
+
+def reextract_benchmarks(args: argparse.Namespace) -> Dict[str, List[dict]]:
+    """Extract again the metrics of all variants of a benchmarking run and
+    save the results, without running any benchmark.
+
+    Note:
+        Variants are processed in parallel, one per process of a pool. Their
+        metrics are extracted with the 'data' and 'derived' sections of the
+        given spec, so that fixed regexes and new metrics apply to past runs.
+
+    Args:
+        args (argparse.Namespace): Arguments passed to 'benchmark-reextract'
+
+    Returns:
+        results (dict): The variant results of each benchmark
+
+    """
+
+    spec = parse_benchmark_specs(args.spec)
+    if args.custom_metrics_files is not None:
+        import_metrics_hooks_files(args.custom_metrics_files)
+
+    jobs = []
+    for variant_log_dir in find_variant_log_dirs(args.log_dir):
+        with open(variant_log_dir / VARIANT_RESULT_FILE) as f:
+            benchmark_name = json.load(f)["benchmark_name"]
+        if benchmark_name not in spec:
+            logger.warning(f"Skipping '{variant_log_dir.name}', benchmark '{benchmark_name}' is not in the spec")
+            continue
+        jobs.append((benchmark_name, variant_log_dir))
+    if not jobs:
+        err = f"No variant results of the given spec found in '{args.log_dir}'"
+        logger.error(err)
+        raise ValueError(err)
+    metric_plugins = {
+        benchmark_name: get_metric_plugin_names(spec[benchmark_name], args.metric_plugins) for benchmark_name, _ in jobs
+    }
+    for plugin_name in set().union(*metric_plugins.values()):
+        load_metric_plugin(plugin_name)
+
+    # Forked workers share the metric functions imported from files and plugins
+    workers = args.workers or os.cpu_count() or 1
+    logger.info(f"Re-extracting metrics of {len(jobs)} variants with {workers} processes")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as executor:
+        futures = [
+            executor.submit(
+                reextract_variant,
+                variant_log_dir,
+                spec[benchmark_name],
+                args.metric_hook_timeout,
+                metric_plugins[benchmark_name],
+            )
+            for benchmark_name, variant_log_dir in jobs
+        ]
+        variant_results = [future.result() for future in futures]
+
+    # Benchmarks are reported in the order of the spec, variants in the order
+    # they were run, followed by the variants which were coalesced with them
+    coalesced_variants = load_coalesced_variants(args.log_dir)
+    results = {}
+    for benchmark_name in spec:
+        benchmark_results = [
+            variant_result for (name, _), variant_result in zip(jobs, variant_results) if name == benchmark_name
+        ]
+        if benchmark_results:
+            benchmark_results = sorted(benchmark_results, key=lambda r: r.get("start_time", ""))
+            aliases = coalesced_variants.get(benchmark_name, {})
+            variants = [
+                {"name": r["variant_name"], "aliases": aliases.get(r["variant_name"], [])} for r in benchmark_results
+            ]
+            results[benchmark_name] = fan_out_results(variants, benchmark_results)
+
+    print_benchmark_summary(results)
+    additional_metrics = any("cmd" in r["results"] for result in results.values() for r in result)
+    save_results(args.log_dir, additional_metrics, results, args.csv_metrics)
+    return results
+
+
+def reextract_parser(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--log-dir",
+        type=str,
+        required=True,
+        help="Log directory of the benchmarking run to extract the metrics of again",
+    )
+    parser.add_argument(
+        "--spec",
+        type=str,
+        nargs="+",
+        default=["./benchmarks.yml"],
+        help="Yaml files with the benchmark spec defining the metrics",
+    )
+    parser.add_argument(
+        "--custom-metrics-files",
+        type=str,
+        nargs="+",
+        help="List of python files containing extra metrics functions.",
+    )
+    parser.add_argument(
+        "--csv-metrics",
+        type=str,
+        nargs="+",
+        default=tuple(),
+        help="List of extra metrics to capture in the CSV output, as for 'benchmark'.",
+    )
+    parser.add_argument(
+        "--metric-plugins",
+        type=str,
+        nargs="+",
+        default=[],
+        help="Metric plugins to run for all benchmarks, as for 'benchmark'.",
+    )
+    parser.add_argument(
+        "--metric-hook-timeout",
+        type=float,
+        default=DEFAULT_HOOK_TIMEOUT,
+        help="Time budget in seconds of each custom metric function.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of variants processed at once, defaults to the number of CPUs.",
+    )
+    parser.add_argument(
+        "--logging",
+        choices=["DEBUG", "INFO", "ERROR", "CRITICAL", "WARNING"],
+        default="INFO",
+        help="Logging level of the re-extraction",
+    )
@@ -0,0 +1,210 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import json
+import logging
+import math
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from examples_utils.benchmarks.statistics_utils import student_t_critical_value
+
+# Get the module logger
+logger = logging.getLogger(__name__)
+
+# Metrics compared with the baseline, and whether higher values are better
+HIGHER_IS_BETTER = {
+    "throughput": True,
+    "latency": False,
+    "total_compiling_time": False,
+}
+
+# Metrics whose growth is checked against the compile time threshold
+COMPILE_TIME_METRICS = {"total_compiling_time"}
+
+
+def load_baseline(baseline_path: Union[str, Path]) -> Dict[str, dict]:
+    """Load the variant results of a previous run to compare against.
+
+    Args:
+        baseline_path (str or Path): 'benchmark_results.json' of the previous run
+
+    Returns:
+        baseline (dict): Variant results keyed by variant name
+
+    """
+
+    with open(baseline_path) as f:
+        baseline_results = json.load(f)
+    return {
+        variant_result["variant_name"]: variant_result
+        for variant_results in baseline_results.values()
+        for variant_result in variant_results
+    }
+
+
+def get_metric_statistics(metric_result: dict) -> Tuple[Optional[float], Optional[float], int]:
+    """Get the value, standard deviation and number of samples of a metric"""
+    value = next(iter(metric_result.values()), None)
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or not math.isfinite(value):
+        return None, None, 0
+    return value, metric_result.get("run_stddev"), metric_result.get("run_num_samples", 1)
+
+
+def is_significant(current: dict, baseline: dict, confidence: float) -> bool:
+    """Welch's t-test of the difference between two metrics.
+
+    Metrics measured only once have no known variance, their difference is
+    always considered significant.
+
+    Args:
+        current (dict): Metric result of the current run
+        baseline (dict): Metric result of the baseline run
+        confidence (float): Confidence level of the test
+
+    Returns:
+        significant (bool): Whether the difference is beyond the noise
+
+    """
+
+    value, stddev, num_samples = get_metric_statistics(current)
+    base_value, base_stddev, base_num_samples = get_metric_statistics(baseline)
+    if stddev is None or base_stddev is None or num_samples < 2 or base_num_samples < 2:
+        return True
+
+    variance, base_variance = stddev**2 / num_samples, base_stddev**2 / base_num_samples
+    standard_error = math.sqrt(variance + base_variance)
+    if standard_error == 0:
+        return value != base_value
+
+    # Welch-Satterthwaite degrees of freedom, rounded down to be conservative
+    dof = (variance + base_variance) ** 2 / (
+        variance**2 / (num_samples - 1) + base_variance**2 / (base_num_samples - 1)
+    )
+    t = abs(value - base_value) / standard_error
+    return t > student_t_critical_value(confidence, max(1, int(dof)))
+
+
+def compare_variant(
+    variant_result: dict,
+    baseline_result: dict,
+    regression_threshold: float,
+    compile_time_threshold: float,
+    confidence: float = 0.95,
+) -> Dict[str, dict]:
+    """Compare the metrics of a variant with those of its baseline.
+
+    Args:
+        variant_result (dict): Result of the variant in this run
+        baseline_result (dict): Result of the variant in the baseline run
+        regression_threshold (float): Largest relative degradation of the
+            throughput or latency which is not a regression
+        compile_time_threshold (float): Largest relative growth of the compile
+            time which is not a regression
+        confidence (float): Confidence level of the significance test, used
+            when the metrics were measured several times
+
+    Returns:
+        comparison (dict): For each metric, its baseline and current values,
+            the relative degradation (positive when worse) and whether it is a
+            regression
+
+    """
+
+    comparison = {}
+    for metric, higher_is_better in HIGHER_IS_BETTER.items():
+        # Metrics whose function failed are None
+        current = variant_result["results"].get(metric) or {}
+        baseline = baseline_result["results"].get(metric) or {}
+        value, _, _ = get_metric_statistics(current)
+        base_value, _, _ = get_metric_statistics(baseline)
+        if value is None or base_value is None or base_value == 0:
+            continue
+
+        degradation = (value - base_value) / abs(base_value)
+        if higher_is_better:
+            degradation = -degradation
+        threshold = compile_time_threshold if metric in COMPILE_TIME_METRICS else regression_threshold
+        beyond_threshold = degradation > threshold
+        significant = is_significant(current, baseline, confidence) if beyond_threshold else False
+        comparison[metric] = {
+            "baseline": base_value,
+            "current": value,
+            "degradation": degradation,
+            "threshold": threshold,
+            "regression": beyond_threshold and significant,
+        }
+        if beyond_threshold and not significant:
+            logger.info(
+                f"'{variant_result['variant_name']}' {metric} degraded by {degradation:.1%}, "
+                "but the difference is within the measurement noise"
+            )
+
+    return comparison
+
+
+def compare_to_baseline(
+    results: Dict[str, List[dict]],
+    baseline: Dict[str, dict],
+    regression_threshold: float,
+    compile_time_threshold: float,
+    confidence: float = 0.95,
+) -> List[str]:
+    """Compare all variants with the baseline, recording regressions.
+
+    Each variant found in the baseline gets a 'baseline_comparison' entry
+    (see `compare_variant`) and a list of its regressed metrics in
+    'regressions'.
+
+    Args:
+        results (dict): The variant results of each benchmark
+        baseline (dict): Baseline variant results keyed by variant name
+        regression_threshold (float): Largest relative degradation of the
+            throughput or latency which is not a regression
+        compile_time_threshold (float): Largest relative growth of the compile
+            time which is not a regression
+        confidence (float): Confidence level of the significance test
+
+    Returns:
+        regressed_variants (list): Names of the variants with regressions
+
+    """
+
+    regressed_variants = []
+    for variant_results in results.values():
+        for variant_result in variant_results:
+            name = variant_result["variant_name"]
+            if name not in baseline:
+                logger.info(f"'{name}' is not in the baseline, it is not compared")
+                continue
+            comparison = compare_variant(
+                variant_result, baseline[name], regression_threshold, compile_time_threshold, confidence
+            )
+            variant_result["baseline_comparison"] = comparison
+            variant_result["regressions"] = [metric for metric, c in comparison.items() if c["regression"]]
+            for metric in variant_result["regressions"]:
+                logger.error(
+                    f"REGRESSION: '{name}' {metric} went from {comparison[metric]['baseline']:.6g} to "
+                    f"{comparison[metric]['current']:.6g} ({comparison[metric]['degradation']:.1%} worse)"
+                )
+            if variant_result["regressions"]:
+                regressed_variants.append(name)
+
+    return regressed_variants
+
+
+def get_regressed_variants(results: Dict[str, List[dict]]) -> List[str]:
+    """Get the names of the variants with regressions recorded in the results"""
+    return [
+        variant_result["variant_name"]
+        for variant_results in results.values()
+        for variant_result in variant_results
+        if variant_result.get("regressions")
+    ]
+
+
+def format_regressions(variant_result: dict) -> str:
+    """Describe the regressions of a variant in one line"""
+    comparison = variant_result.get("baseline_comparison", {})
+    return "; ".join(
+        f"{metric} {comparison[metric]['degradation']:.1%} worse than baseline"
+        for metric in variant_result.get("regressions", [])
+    )
@@ -1,34 +1,38 @@
 # Copyright (c) 2022 Graphcore Ltd. All rights reserved.
 import argparse
+import copy
 import logging
 import os
-import selectors
-import shlex
 import subprocess
 import sys
-import threading
 from collections import OrderedDict
-from datetime import datetime, timedelta
+from datetime import datetime
 from io import TextIOWrapper
 from pathlib import Path
-from typing import Tuple, Union, Dict, List
+from typing import Callable, Tuple, Union, Dict, List, Optional
 import yaml
 import json
-import time
-import psutil
+from examples_utils.benchmarks.cache_utils import (
+    DEFAULT_RESULTS_CACHE_DIR,
+    get_variant_fingerprint,
+    load_cached_result,
+    store_result,
+)
 from examples_utils.benchmarks.command_utils import (
-    formulate_benchmark_command,
+    BenchmarkCommand,
+    fan_out_results,
+    get_benchmark_command,
     get_benchmark_variants,
     get_local_poprun_hosts,
-    get_poprun_config,
+    get_variant_name,
     determine_variant_timeout,
+    save_coalesced_variants,
 )
 from examples_utils.benchmarks.distributed_utils import remove_distributed_filesystems, setup_distributed_filesystems
 from examples_utils.benchmarks.environment_utils import (
     check_env,
     enter_benchmark_dir,
     get_git_commit_hash,
-    get_mpinum,
     infer_paths,
     expand_environment_variables,
     merge_environment_variables,
@@ -43,9 +47,32 @@ from examples_utils.benchmarks.logging_utils import (
     upload_checkpoints,
     upload_compile_time,
 )
-from examples_utils.benchmarks.metrics_utils import additional_metrics, derive_metrics, extract_metrics
-from examples_utils.benchmarks.custom_metrics import process_registered_metrics, import_metrics_hooks_files
+from examples_utils.benchmarks.journal_utils import BenchmarkJournal
+from examples_utils.benchmarks.log_view_utils import LogView
+from examples_utils.benchmarks.metrics_utils import (
+    MetricsExtractor,
+    additional_metrics,
+    derive_metrics,
+    get_compile_time,
+)
+from examples_utils.benchmarks.custom_metrics import (
+    DEFAULT_HOOK_TIMEOUT,
+    HOOK_TIMES_RESULT,
+    combine_hook_times,
+    get_metric_plugin_names,
+    import_metrics_hooks_files,
+    load_metric_plugin,
+    process_registered_metrics,
+)
 from examples_utils.benchmarks.profiling_utils import add_profiling_vars
+from examples_utils.benchmarks.regression_utils import compare_to_baseline, load_baseline
+from examples_utils.benchmarks.samples_utils import SAMPLES_FILE
+from examples_utils.benchmarks.scheduling_utils import CompilePipeline, run_variants_in_parallel
+from examples_utils.benchmarks.search_utils import get_search_config, save_search_results, successive_halving
+from examples_utils.benchmarks.statistics_utils import aggregate_results, get_metric_samples, has_converged
+from examples_utils.benchmarks.supervisor_utils import run_supervised, supervise_process
+from examples_utils.benchmarks.variant_utils import SAMPLING_METHODS
+from examples_utils.benchmarks.slurm_array_utils import SlurmArrayScheduler
 from examples_utils.benchmarks.slurm_utils import (
     check_slurm_configured,
     configure_slurm_job,
@@ -68,21 +95,8 @@ except (ImportError, ModuleNotFoundError) as error:
 # Get the module logger
 logger = logging.getLogger(__name__)
 
-# Progress spinner frames to iterate through
-progress_frames = [
-    "      ",
-    ">     ",
-    "=>    ",
-    "==>   ",
-    "===>  ",
-    "====> ",
-    "<====>",
-    " <====",
-    "  <===",
-    "   <==",
-    "    <=",
-    "     <",
-]
+# Environment variables used by the frameworks to locate their executable cache
+EXECUTABLE_CACHE_ENV_VARS = ("POPLAR_EXECUTABLE_CACHE_DIR", "POPTORCH_CACHE_DIR")
 
 # A dictionary which defines a benchmark
 BenchmarkDict = Dict
@@ -100,139 +114,57 @@ def should_reattempt_benchmark(variant, output, err, exitcode) -> Union[bool, st
 
 
 def run_and_monitor_progress(
-    cmd: list, listener: TextIOWrapper, timeout: int = None, trace_period: int = 1, monitor_ipus: bool = True, **kwargs
-) -> Tuple[str, str, int, List[str]]:
+    cmd: list,
+    listener: TextIOWrapper,
+    timeout: int = None,
+    trace_period: int = 1,
+    monitor_ipus: bool = True,
+    stdout_path: Optional[Union[str, Path]] = None,
+    stderr_path: Optional[Union[str, Path]] = None,
+    metrics_extractor: Optional[MetricsExtractor] = None,
+    **kwargs,
+) -> Tuple[LogView, LogView, int, List[str]]:
     """Run the benchmark monitor progress.
 
+    This runs `supervise_process` in its own event loop, see its documentation
+    for details.
+
     Args:
         cmd (list): The command to be run, as a list for use by subprocess
         listener (TextIOWrapper): Listener that takes the output from the process
         timeout (int): Seconds until the process will timeout, forcing termination
-        kwargs: all additional keyword arguments are passed to `subprocess.Popen`.
+        stdout_path (str or Path): File in which stdout is stored, if not
+            provided stdout is spooled to a temporary file and kept in memory
+        stderr_path (str or Path): File in which stderr is stored, if not
+            provided stderr is spooled to a temporary file and kept in memory
+        metrics_extractor (MetricsExtractor): Extractor which is given each line
+            of the output as soon as it is received, its running values are
+            shown in the progress trace
+        kwargs: all additional keyword arguments are passed to
+            `asyncio.create_subprocess_exec`.
 
     Returns:
-        output (str): stdout from the process
-        err (str): stderr from the process
+        output (LogView): stdout from the process, as a memory mapped
+            view of `stdout_path` if it was provided
+        err (LogView): stderr from the process, as a memory mapped
+            view of `stderr_path` if it was provided
         exitcode (int): The process exitcode
 
     """
 
-    # Begin in subprocess
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=80, **kwargs)
-
-    # All this appears to be for reading process output ------------------------
-    outs = [[], []]
-    ipu_monitoring: List[str] = []
-
-    def kill_process(proc_pid: int):
-        process = psutil.Process(proc_pid)
-        for proc in process.children(recursive=True):
-            logger.info("Killing child process %s", proc.pid)
-            proc.kill()
-        logger.info("Killing process %s", proc_pid)
-        process.kill()
-
-    def proc_thread():
-        sel = selectors.DefaultSelector()
-        sel.register(proc.stdout, selectors.EVENT_READ)
-        sel.register(proc.stderr, selectors.EVENT_READ)
-        eof = False
-        decode_error_count = 0
-        while not eof:
-            selected = 0
-            for key, _ in sel.select(timeout=10):
-                selected += 1
-                stream = key.fileobj
-                data = stream.read1(80)
-                data = data.decode(errors="backslashreplace")
-                if not data:
-                    eof = True
-                listener.write(data)
-                listener.flush()
-
-                if stream is proc.stdout:
-                    outs[0].append(data)
-                else:
-                    outs[1].append(data)
-            if not selected:
-                logger.debug("Selector did not pick any files to explore, polling to check for exit")
-                if proc.poll() is not None:
-                    logger.info("Selector did not pick any files to explore, and subprocess has exited. Terminating.")
-                    eof = True
-        try:
-            out, err = proc.communicate(timeout=20)
-            outs[0].append(out.decode())
-            listener.write(out.decode())
-            outs[1].append(err.decode())
-            listener.write(err.decode())
-        except (subprocess.TimeoutExpired, UnicodeDecodeError):
-            proc.poll()
-            logger.warning(
-                "I/O Thread failed to communicate with process at the end of benchmark, timing out to avoid"
-                " lock up. Benchmark logs may be truncated."
-            )
-        listener.flush()
-
-    t = threading.Thread(target=proc_thread, name="proc_thread")
-    t.start()
-
-    def monitor_thread():
-        while t.is_alive():
-            try:
-                timestamp = datetime.now().strftime("%Y-%m-%d-%H.%M.%S.%f")
-                ipu_log_line = json.dumps(
-                    {"timestamp": timestamp, **json.loads(subprocess.check_output(["gc-monitor", "--json"]))}
-                )
-                ipu_monitoring.append(f"{ipu_log_line}\n")
-                time.sleep(5)
-            except:
-                pass
-
-    if monitor_ipus:
-        t_monitor = threading.Thread(target=monitor_thread, name="monitor_thread")
-        t_monitor.start()
-
-    t0 = int(time.time())
-    next_trace_time = t0 + trace_period
-    frame_idx = 0
-    timeout_error = False
-    while True:
-        # Check if benchmarking process thread has terminated every second
-        t.join(1)
-        if not t.is_alive():
-            if monitor_ipus:
-                t_monitor.join()
-            break
-        curr_time = int(time.time())
-        elapsed_time = curr_time - t0
-
-        # Monitor if benchmark has timed out
-        if timeout is not None and elapsed_time >= timeout:
-            logger.error("TIMEOUT")
-            timeout_error = True
-            kill_process(proc.pid)
-
-        if curr_time > next_trace_time:
-            next_trace_time = curr_time + trace_period
-            frame_idx = (frame_idx + 1) % len(progress_frames)
-            sys.stderr.write("\r")
-            sys.stderr.write(
-                f"\tBenchmark elapsed time: {str(timedelta(seconds=elapsed_time))} "
-                f"({elapsed_time} seconds) {progress_frames[frame_idx]}"
-            )
-            sys.stderr.flush()
-
-    sys.stderr.write("\r")
-    sys.stderr.write("\n")
-    # ---------------------------------------------------------------------------
-
-    # return the info of the running of the benchmark
-    output, err = "".join(outs[0]), "".join(outs[1])
-    exitcode = proc.returncode
-    if timeout_error:
-        err += f"\nTimeout ({timeout})\n"
-
-    return (output, err, exitcode, ipu_monitoring)
+    return run_supervised(
+        supervise_process(
+            cmd,
+            listener,
+            timeout,
+            trace_period=trace_period,
+            monitor_ipus=monitor_ipus,
+            stdout_path=stdout_path,
+            stderr_path=stderr_path,
+            metrics_extractor=metrics_extractor,
+            **kwargs,
+        )
+    )
 
 
 def run_benchmark_variant(
@@ -242,6 +174,8 @@ def run_benchmark_variant(
     benchmark_dict: dict,
     listener: TextIOWrapper,
     args: argparse.Namespace,
+    log_subdir: Optional[str] = None,
+    slurm_runner: Optional[Callable] = None,
 ) -> dict:
     """Run a variant and collect results.
 
@@ -254,6 +188,10 @@ def run_benchmark_variant(
         listener (TextIOWrapper): Open file to collect stdout/stderr from the
             process running the variant
         args (argparse.Namespace): Arguments passed to this script
+        log_subdir (str): Sub directory of the variant log directory in which
+            the logs of this run are stored, when a variant is run several times
+        slurm_runner (Callable): Runs the SLURM job of the variant in place of
+            `run_and_monitor_progress_on_slurm`, with the same arguments
 
     Returns:
         variant_result (dict): The results from this variants run
@@ -274,7 +212,8 @@ def run_benchmark_variant(
     git_commit_hash = get_git_commit_hash()
 
     # Create the actual command for the variant
-    variant_command = formulate_benchmark_command(benchmark_dict, variant_dict, args)
+    command = get_benchmark_command(benchmark_dict, variant_dict, args)
+    variant_command = str(command)
 
     # Set the environment variables
     new_env = {}
@@ -282,6 +221,12 @@ def run_benchmark_variant(
     new_env["POPART_LOG_LEVEL"] = args.logging
     new_env["TF_CPP_VMODULE"] = "poplar_compiler=1"
 
+    # Share the executable cache with the variants compiled ahead of time
+    if getattr(args, "executable_cache_dir", None):
+        for cache_var in EXECUTABLE_CACHE_ENV_VARS:
+            if cache_var not in os.environ:
+                new_env[cache_var] = args.executable_cache_dir
+
     # Add profiling variables
     if args.profile:
         new_env = add_profiling_vars(new_env, variant_name, cwd)
@@ -292,14 +237,15 @@ def run_benchmark_variant(
 
     # Expand any environment variables in the command and split the command
     # into a list, respecting things like quotes, like the shell would
-    cmd = shlex.split(expand_environment_variables(variant_command, env))
+    expanded_command = BenchmarkCommand.parse(expand_environment_variables(variant_command, env))
+    cmd = expanded_command.tokens
 
     # Define where the benchmark should be run (dir containing examples)
     cwd = str(Path.cwd().resolve())
     logger.info(f"\tcwd = '{cwd}'")
 
     # Create the log directory
-    variant_log_dir = Path(args.log_dir, variant_name)
+    variant_log_dir = Path(args.log_dir, variant_name, log_subdir or "")
     if not variant_log_dir.exists():
         variant_log_dir.mkdir(parents=True)
     outlog_path = Path(variant_log_dir, "stdout")
@@ -314,8 +260,14 @@ def run_benchmark_variant(
     if reqs and not Path(reqs).exists():
         raise FileNotFoundError(f"Invalid python requirements where specified at {reqs}")
 
+    # Look for the results of an identical previous run of this variant
+    cached_result = None
+    if args.reuse_results:
+        fingerprint = get_variant_fingerprint(command, env, git_commit_hash, args.sdk_version, reqs)
+        cached_result = load_cached_result(args.results_cache_dir, fingerprint, variant_log_dir)
+
     # Check if poprun is being used
-    poprun_config = get_poprun_config(args, cmd)
+    poprun_config = expanded_command.poprun_config
 
     # Only validate user supplied hosts if not submitting on SLURM
     # Similarly, only install requirements if not submitting on SLURM
@@ -337,12 +289,12 @@ def run_benchmark_variant(
                 # Setup temporary filesystems on all hosts and modify cmd to use this
                 setup_distributed_filesystems(args, poprun_hostnames)
 
-        if reqs:
+        if reqs and cached_result is None:
             logger.info(f"Install python requirements")
             subprocess.check_output([sys.executable, "-m", "pip", "install", "-r", str(reqs)])
 
     # configure benchmark to run on slurm
-    if args.submit_on_slurm:
+    if args.submit_on_slurm and cached_result is None:
         slurm_config = configure_slurm_job(
             args, benchmark_dict, poprun_config, cmd, variant_name, variant_log_dir, cwd, env
         )
@@ -353,9 +305,23 @@ def run_benchmark_variant(
     monitor_log = []
     exitcode = 0
     stdout = stderr = ""
+    if cached_result is not None:
+        # The logs have been restored from the cache, only process them
+        need_to_run = False
+        stdout, stderr = LogView(outlog_path), LogView(errlog_path)
+        metrics_extractor = MetricsExtractor(benchmark_dict.get("data", {}), args.save_samples)
+        metrics_extractor.process_log(stdout, "stdout")
+        metrics_extractor.process_log(stderr, "stderr")
     while need_to_run:
+        # Metrics are extracted from the output while the benchmark is running
+        metrics_extractor = MetricsExtractor(benchmark_dict.get("data", {}), args.save_samples)
         if args.submit_on_slurm:
-            stdout, stderr, exitcode = run_and_monitor_progress_on_slurm(listener=listener, **slurm_config)
+            stdout, stderr, exitcode = (slurm_runner or run_and_monitor_progress_on_slurm)(
+                listener=listener, **slurm_config
+            )
+            # The logs of SLURM jobs are only processed once the job has finished
+            metrics_extractor.process_log(stdout, "stdout")
+            metrics_extractor.process_log(stderr, "stderr")
         else:
             variant_timeout = determine_variant_timeout(args.timeout, benchmark_dict)
             stdout, stderr, exitcode, monitor_log = run_and_monitor_progress(
@@ -364,6 +330,9 @@ def run_benchmark_variant(
                 variant_timeout,
                 trace_period=args.progress_trace_period,
                 monitor_ipus=args.gc_monitor,
+                stdout_path=outlog_path,
+                stderr_path=errlog_path,
+                metrics_extractor=metrics_extractor,
                 cwd=cwd,
                 env=env,
             )
@@ -406,7 +375,7 @@ def run_benchmark_variant(
         err = f"Benchmark ERROR, exited with code: ({str(exitcode)}). Please check logs for more information."
         logger.error(err)
 
-        error_tail = "\n\t".join(stderr.splitlines()[-100:]) + "\n"
+        error_tail = "\n\t".join(stderr.tail(100)) + "\n"
         logger.error(f"Last 100 lines of stderr from {variant_name}:\n{error_tail}")
 
         if args.stop_on_error:
@@ -415,13 +384,7 @@ def run_benchmark_variant(
             logger.info("Continuing to next benchmark as `--stop-on-error` was not passed")
 
     # Get 'data' metrics, these are metrics scraped from the log
-    results, extraction_failure = extract_metrics(
-        benchmark_dict.get("data", {}),
-        stdout,
-        stderr,
-        exitcode,
-        get_mpinum(variant_command),
-    )
+    results, extraction_failure = metrics_extractor.get_results(exitcode, expanded_command.mpinum)
 
     if args.additional_metrics:
         results = additional_metrics(
@@ -447,7 +410,11 @@ def run_benchmark_variant(
         stdout,
         stderr,
         exitcode,
+        timeout=args.metric_hook_timeout,
+        plugins=get_metric_plugin_names(benchmark_dict, args.metric_plugins),
     )
+    # Timings vary from run to run, they are kept apart from the metrics
+    metric_hook_times = results.pop(HOOK_TIMES_RESULT, {})
 
     # Add compile time results to wandb link, if wandb was imported by app
     if WANDB_AVAILABLE:
@@ -458,10 +425,10 @@ def run_benchmark_variant(
     # Find checkpoints from this run
     checkpoint_root_dir = Path(benchmark_dict["benchmark_path"]).parent.joinpath(benchmark_dict.get("location", ""))
 
-    latest_checkpoint_path = get_latest_checkpoint_path(checkpoint_root_dir, variant_command)
+    latest_checkpoint_path = get_latest_checkpoint_path(checkpoint_root_dir, command)
 
-    # Upload checkpoints if required
-    if args.upload_checkpoints and latest_checkpoint_path is not None:
+    # Upload checkpoints if required, a reused result did not create any
+    if args.upload_checkpoints and latest_checkpoint_path is not None and cached_result is None:
         upload_checkpoints(
             upload_targets=args.upload_checkpoints,
             checkpoint_path=latest_checkpoint_path,
@@ -472,10 +439,6 @@ def run_benchmark_variant(
         )
 
     if not args.submit_on_slurm:
-        with open(outlog_path, "w") as f:
-            f.write(stdout)
-        with open(errlog_path, "w") as f:
-            f.write(stderr)
         if monitor_log:
             with open(variant_log_dir / "ipu-monitor.jsonl", "w") as f:
                 f.writelines(monitor_log)
@@ -494,18 +457,27 @@ def run_benchmark_variant(
         "results": results,
         "start_time": str(start_time),
         "end_time": str(end_time),
-        "compilation_end_time": str(results["total_compiling_time"]["mean"]),
+        "compilation_end_time": str(get_compile_time(results)),
         "test_duration": str(total_runtime),
         "exitcode": exitcode,
+        "process_exitcode": exitcode,
         "log_paths": {"out": str(outlog_path), "err": str(errlog_path)},
         "latest_checkpoint_path": str(latest_checkpoint_path),
         "sdk_path": str(args.sdk_path),
         "sdk_version": args.sdk_version,
+        "metric_hook_times": metric_hook_times,
     }
 
     if WANDB_AVAILABLE and wandb_link is not None:
         variant_result["wandb_link"] = wandb_link
 
+    if cached_result is not None:
+        variant_result["cached_result"] = {
+            "fingerprint": fingerprint,
+            "start_time": cached_result["start_time"],
+            "test_duration": cached_result["test_duration"],
+        }
+
     # These failure points are not caught normally, check here
     possible_failure_points = [
         extraction_failure,
@@ -518,9 +490,335 @@ def run_benchmark_variant(
         with open(variant_log_dir / "variant_result.json", "w") as f:
             json.dump(variant_result, f)
 
+    if args.save_samples:
+        metrics_extractor.samples.save(variant_log_dir / SAMPLES_FILE)
+
+    # Only successful runs are cached, failures may be caused by the machine
+    if args.reuse_results and cached_result is None and exitcode == 0:
+        store_result(args.results_cache_dir, fingerprint, variant_result, variant_log_dir, args.results_cache_size)
+
+    for log in (stdout, stderr):
+        if isinstance(log, LogView):
+            log.close()
+
     return variant_result
 
 
+def run_benchmark_variant_with_own_listener(
+    variant_name: str,
+    benchmark_name: str,
+    variant_dict: dict,
+    benchmark_dict: dict,
+    args: argparse.Namespace,
+    slurm_runner: Optional[Callable] = None,
+) -> dict:
+    """Run a variant, collecting its stdout/stderr in its own log directory.
+
+    This is used when several variants run at the same time, so that their
+    outputs are not interleaved in the shared 'output.log' file.
+
+    Args:
+        variant_name (str): The name of the variant to be run
+        benchmark_name (str): The name of the benchmark to be run
+        variant_dict (dict): The variant definition created by the formatting
+            and evaluation of the benchmark definition
+        benchmark_dict (dict): The benchmark definition from the yaml file
+        args (argparse.Namespace): Arguments passed to this script
+        slurm_runner (Callable): Runs the SLURM jobs of the variant, see
+            `run_benchmark_variant`
+
+    Returns:
+        variant_result (dict): The results from this variants run
+
+    """
+
+    variant_log_dir = Path(args.log_dir, variant_name)
+    variant_log_dir.mkdir(parents=True, exist_ok=True)
+    with open(variant_log_dir / "output.log", "w", buffering=1) as listener:
+        return run_benchmark_variant_repeatedly(
+            variant_name, benchmark_name, variant_dict, benchmark_dict, listener, args, slurm_runner=slurm_runner
+        )
+
+
+def run_benchmark_variant_repeatedly(
+    variant_name: str,
+    benchmark_name: str,
+    variant_dict: dict,
+    benchmark_dict: dict,
+    listener: TextIOWrapper,
+    args: argparse.Namespace,
+    slurm_runner: Optional[Callable] = None,
+) -> dict:
+    """Run a variant several times and collect statistics of its results.
+
+    Note:
+        The results of the '--warmup-runs' first runs are discarded. The
+        variant is then measured up to '--repeat' times, stopping as soon as
+        the confidence interval of each metric of the benchmark is narrower
+        than '--target-ci' (relative to its mean). Each run is logged in its
+        own sub directory of the variant log directory.
+
+    Args:
+        variant_name (str): The name of the variant to be run
+        benchmark_name (str): The name of the benchmark to be run
+        variant_dict (dict): The variant definition created by the formatting
+            and evaluation of the benchmark definition
+        benchmark_dict (dict): The benchmark definition from the yaml file
+        listener (TextIOWrapper): Open file to collect stdout/stderr from the
+            process running the variant
+        args (argparse.Namespace): Arguments passed to this script
+        slurm_runner (Callable): Runs the SLURM jobs of the variant, see
+            `run_benchmark_variant`
+
+    Returns:
+        variant_result (dict): The results of the last run, with the metrics
+            replaced by their mean and statistics over the measured runs
+
+    """
+
+    if args.repeat <= 1 and args.warmup_runs == 0:
+        return run_benchmark_variant(
+            variant_name, benchmark_name, variant_dict, benchmark_dict, listener, args, slurm_runner=slurm_runner
+        )
+
+    if args.reuse_results:
+        logger.warning("'--reuse-results' is ignored for repeated runs, each run must be measured.")
+        args = copy.copy(args)
+        args.reuse_results = False
+
+    def save_variant_result(variant_result: dict) -> dict:
+        # Each outcome is stored, so that 'benchmark-reextract' finds it
+        if not args.submit_on_slurm:
+            with open(Path(args.log_dir, variant_name, "variant_result.json"), "w") as f:
+                json.dump(variant_result, f)
+        return variant_result
+
+    for i in range(args.warmup_runs):
+        logger.info(f"Warmup run {i + 1}/{args.warmup_runs} of '{variant_name}'")
+        variant_result = run_benchmark_variant(
+            variant_name,
+            benchmark_name,
+            variant_dict,
+            benchmark_dict,
+            listener,
+            args,
+            log_subdir=f"warmup_{i}",
+            slurm_runner=slurm_runner,
+        )
+        if variant_result["exitcode"]:
+            variant_result["failed_run"] = f"warmup_{i}"
+            return save_variant_result(variant_result)
+
+    metric_names = list(benchmark_dict.get("data", {})) + list(benchmark_dict.get("derived", {}))
+    run_results = []
+    run_hook_times = []
+    converged = False
+    for i in range(max(args.repeat, 1)):
+        logger.info(f"Measured run {i + 1}/{args.repeat} of '{variant_name}'")
+        variant_result = run_benchmark_variant(
+            variant_name,
+            benchmark_name,
+            variant_dict,
+            benchmark_dict,
+            listener,
+            args,
+            log_subdir=f"repeat_{i}",
+            slurm_runner=slurm_runner,
+        )
+        if variant_result["exitcode"]:
+            variant_result["failed_run"] = f"repeat_{i}"
+            return save_variant_result(variant_result)
+        run_results.append(variant_result["results"])
+        run_hook_times.append(variant_result["metric_hook_times"])
+
+        if args.target_ci is not None:
+            samples = get_metric_samples(run_results, metric_names)
+            converged = has_converged(samples, args.target_ci, args.confidence_level)
+            if converged:
+                logger.info(f"Confidence intervals of '{variant_name}' reached the target after {i + 1} runs")
+                break
+
+    variant_result["results"] = aggregate_results(run_results, metric_names, args.confidence_level)
+    variant_result["metric_hook_times"] = combine_hook_times(run_hook_times)
+    variant_result["repeats"] = {
+        "warmup_runs": args.warmup_runs,
+        "measured_runs": len(run_results),
+        "converged": converged,
+        "confidence_level": args.confidence_level,
+        "run_results": run_results,
+    }
+    return save_variant_result(variant_result)
+
+
+def compile_benchmark_variant(
+    variant_name: str,
+    benchmark_name: str,
+    variant_dict: dict,
+    benchmark_dict: dict,
+    args: argparse.Namespace,
+) -> dict:
+    """Run a variant with '--compile-only' to populate the executable cache.
+
+    The logs of the compile-only run are kept in the 'compile' sub directory
+    of the log directory, the variant is otherwise run as with
+    `run_benchmark_variant`.
+
+    Args:
+        variant_name (str): The name of the variant to be compiled
+        benchmark_name (str): The name of the benchmark to be compiled
+        variant_dict (dict): The variant definition created by the formatting
+            and evaluation of the benchmark definition
+        benchmark_dict (dict): The benchmark definition from the yaml file
+        args (argparse.Namespace): Arguments passed to this script
+
+    Returns:
+        variant_result (dict): The results from the compile-only run
+
+    """
+
+    compile_args = copy.copy(args)
+    compile_args.compile_only = True
+    compile_args.log_dir = Path(args.log_dir, "compile")
+    compile_args.gc_monitor = False
+    compile_args.reuse_results = False
+    compile_args.stop_on_error = False
+    compile_args.upload_checkpoints = ""
+    compile_args.repeat = 1
+    compile_args.warmup_runs = 0
+    compile_args.save_samples = False
+    # Compile-only runs remove the metrics from the benchmark definition
+    return run_benchmark_variant_with_own_listener(
+        variant_name, benchmark_name, variant_dict, copy.deepcopy(benchmark_dict), compile_args
+    )
+
+
+def start_compile_pipeline(
+    variant_dictionary: Dict[str, List[dict]],
+    spec: Dict[str, BenchmarkDict],
+    args: argparse.Namespace,
+    journal: BenchmarkJournal,
+) -> CompilePipeline:
+    """Start compiling all the variants left to run, in the order they will run.
+
+    Args:
+        variant_dictionary (dict): The variants to run for each benchmark
+        spec (dict): The benchmark definitions from the yaml files
+        args (argparse.Namespace): Arguments passed to run the benchmarks
+            with
+        journal (BenchmarkJournal): Journal of the run, variants it already
+            contains are not compiled
+
+    Returns:
+        pipeline (CompilePipeline): The pipeline compiling the variants
+
+    """
+
+    for option, enabled in [
+        ("--compile-only", args.compile_only),
+        ("--parallel", args.parallel),
+        ("--submit-on-slurm", args.submit_on_slurm),
+    ]:
+        if enabled:
+            err = f"'--pipeline-compile' cannot be used with '{option}'."
+            logger.error(err)
+            raise ValueError(err)
+
+    if args.executable_cache_dir is None:
+        args.executable_cache_dir = str(Path(args.log_dir, "executable_cache"))
+    logger.info(
+        f"Compiling variants ahead of their execution with {args.compile_workers} workers, "
+        f"using the executable cache at '{args.executable_cache_dir}'"
+    )
+
+    pipeline = CompilePipeline(compile_benchmark_variant, args.compile_workers)
+    for benchmark_name, variants in variant_dictionary.items():
+        benchmark_spec = spec.get(benchmark_name, {})
+        for variant in variants:
+            if journal.get(variant["name"]) is None:
+                pipeline.submit(
+                    variant["name"], variant["name"], benchmark_name, variant["config"], benchmark_spec, args
+                )
+
+    return pipeline
+
+
+def log_compile_overlap_savings(results: Dict[str, List[dict]]):
+    """Log the compilation time hidden by compiling variants ahead of time"""
+    compile_stats = [
+        variant_result["compile_pipeline"]
+        for variant_results in results.values()
+        for variant_result in variant_results
+        if "compile_pipeline" in variant_result
+    ]
+    if not compile_stats:
+        return
+    total_compile_time = sum(stats["compile_time"] for stats in compile_stats)
+    total_saving = sum(stats["overlap_saving"] for stats in compile_stats)
+    logger.info(
+        f"Compiling ahead of time saved {total_saving:.1f}s out of {total_compile_time:.1f}s "
+        f"of compilation across {len(compile_stats)} variants"
+    )
+
+
+def search_benchmark(
+    benchmark_name: str,
+    variants: List[dict],
+    benchmark_dict: dict,
+    listener: TextIOWrapper,
+    args: argparse.Namespace,
+    journal: BenchmarkJournal,
+) -> Tuple[List[dict], dict]:
+    """Search the variants of a benchmark for the best value of a metric,
+    instead of running all of them.
+
+    Args:
+        benchmark_name (str): The name of the benchmark to be searched
+        variants (list): The variants of the benchmark, the candidates of the
+            search
+        benchmark_dict (dict): The benchmark definition from the yaml file
+        listener (TextIOWrapper): Open file to collect stdout/stderr from the
+            processes running the variants
+        args (argparse.Namespace): Arguments passed to this script
+        journal (BenchmarkJournal): Journal of the run, trials it already
+            contains are not run again and new trials are recorded in it
+
+    Returns:
+        variant_results (list): The result of each run of the search
+        search_summary (dict): The best configuration and the trial history,
+            see `successive_halving`
+
+    """
+
+    search_config = get_search_config(benchmark_name, benchmark_dict)
+
+    # The budget parameter is set by the search, candidates only differ by the others
+    candidates = []
+    for variant in variants:
+        params = {k: v for k, v in variant["config"].items() if k != search_config["budget_parameter"]}
+        if params not in candidates:
+            candidates.append(params)
+
+    def run_variant(variant_name: str, variant_dict: dict) -> dict:
+        variant_result = journal.get(variant_name)
+        if variant_result is not None:
+            logger.info(f"Skipping '{variant_name}', it was completed in the run being resumed")
+            return variant_result
+        variant_result = run_benchmark_variant_repeatedly(
+            variant_name, benchmark_name, variant_dict, benchmark_dict, listener, args
+        )
+        journal.record(benchmark_name, variant_result)
+        return variant_result
+
+    search_summary = successive_halving(
+        benchmark_name,
+        candidates,
+        run_variant,
+        search_config,
+        lambda variant_dict: get_variant_name(benchmark_name, variant_dict),
+    )
+    return [trial.pop("result") for trial in search_summary["trials"]], search_summary
+
+
 def process_notebook_to_command(variant, name="unknown"):
     if "notebook" not in variant:
         return variant
@@ -599,7 +897,12 @@ def run_benchmarks_from_spec(spec: Dict[str, BenchmarkDict], args: argparse.Name
     output_log_path = Path(args.log_dir, "output.log")
     if args.custom_metrics_files is not None:
         import_metrics_hooks_files(args.custom_metrics_files)
-    with open(output_log_path, "w", buffering=1) as listener:
+    resume = getattr(args, "resume", None) is not None
+    with open(output_log_path, "a" if resume else "w", buffering=1) as listener, BenchmarkJournal(
+        args.log_dir, resume
+    ) as journal:
+        if journal.completed:
+            logger.info(f"Resuming run from '{journal.path}', {len(journal.completed)} variants already completed")
         logger.info(f"Logs at: {output_log_path}")
 
         # Only check explicitily listed benchmarks if provided
@@ -651,7 +954,15 @@ def run_benchmarks_from_spec(spec: Dict[str, BenchmarkDict], args: argparse.Name
             # Get all benchmark variants made by combinations of parameters
             # specified in the benchmark
             benchmark_spec = spec.get(benchmark_name, {})
-            variant_list = get_benchmark_variants(benchmark_name, benchmark_spec)
+            variant_list = get_benchmark_variants(
+                benchmark_name,
+                benchmark_spec,
+                args.variant_filter,
+                args.sample_variants,
+                args.sampling_method,
+                args.sampling_seed,
+                coalesce=not (args.run_duplicate_variants or args.search),
+            )
             variant_dictionary[benchmark_name] = variant_list
 
         # If no variants are possible, exit
@@ -659,46 +970,233 @@ def run_benchmarks_from_spec(spec: Dict[str, BenchmarkDict], args: argparse.Name
             err = "No valid benchmarks selected"
             logger.error(err)
             raise ValueError(err)
+        save_coalesced_variants(args.log_dir, variant_dictionary)
 
         # Early check for env variables required by poprun and other calls
         for benchmark_name in variant_dictionary:
             check_env(args, benchmark_name, spec[benchmark_name]["cmd"])
+            # Only the metric plugins used by the selected benchmarks are loaded
+            for plugin_name in get_metric_plugin_names(spec[benchmark_name], args.metric_plugins):
+                load_metric_plugin(plugin_name)
 
-        for benchmark_name in variant_dictionary:
-            benchmark_spec = spec.get(benchmark_name, {})
-            logger.info("Running " + benchmark_name)
-
-            if len(variant_dictionary) > 1:
-                logger.info(f"Running {str(len(variant_dictionary[benchmark_name]))} variants:")
-
-                for variant_name in variant_dictionary[benchmark_name]:
-                    name = variant_name.get("name")
-                    logger.info(f"\t{name}")
-
-            result_list = []
-            benchmark_result = dict()
-            for variant in variant_dictionary[benchmark_name]:
-                benchmark_result = run_benchmark_variant(
-                    variant["name"],
-                    benchmark_name,
-                    variant["config"],
-                    benchmark_spec,
-                    listener,
-                    args,
+        if args.search:
+            if args.parallel:
+                err = "'--search' cannot be used with '--parallel', the candidates of a search are run in turn."
+                logger.error(err)
+                raise ValueError(err)
+            search_summaries = {}
+            for benchmark_name, variants in variant_dictionary.items():
+                results[benchmark_name], search_summaries[benchmark_name] = search_benchmark(
+                    benchmark_name, variants, spec[benchmark_name], listener, args, journal
                 )
-                result_list.append(benchmark_result)
-
-            results[benchmark_name] = result_list
+                save_search_results(args.log_dir, search_summaries)
+        elif args.slurm_job_array:
+            results = run_benchmarks_on_slurm_array(variant_dictionary, spec, args, journal)
+        elif args.parallel:
+            results = run_benchmarks_in_parallel(variant_dictionary, spec, args, journal)
+        else:
+            pipeline = (
+                start_compile_pipeline(variant_dictionary, spec, args, journal) if args.pipeline_compile else None
+            )
+            try:
+                for benchmark_name in variant_dictionary:
+                    benchmark_spec = spec.get(benchmark_name, {})
+                    logger.info("Running " + benchmark_name)
+
+                    if len(variant_dictionary) > 1:
+                        logger.info(f"Running {str(len(variant_dictionary[benchmark_name]))} variants:")
+
+                        for variant_name in variant_dictionary[benchmark_name]:
+                            name = variant_name.get("name")
+                            logger.info(f"\t{name}")
+
+                    result_list = []
+                    benchmark_result = dict()
+                    for variant in variant_dictionary[benchmark_name]:
+                        benchmark_result = journal.get(variant["name"])
+                        if benchmark_result is not None:
+                            logger.info(f"Skipping '{variant['name']}', it was completed in the run being resumed")
+                        else:
+                            compile_stats = pipeline.wait_for(variant["name"]) if pipeline is not None else None
+                            benchmark_result = run_benchmark_variant_repeatedly(
+                                variant["name"],
+                                benchmark_name,
+                                variant["config"],
+                                benchmark_spec,
+                                listener,
+                                args,
+                            )
+                            if compile_stats is not None:
+                                benchmark_result["compile_pipeline"] = compile_stats
+                            journal.record(benchmark_name, benchmark_result)
+                        result_list.append(benchmark_result)
+
+                    results[benchmark_name] = result_list
+            finally:
+                if pipeline is not None:
+                    pipeline.shutdown()
+
+        # Variants run once for several parameter combinations give their
+        # results to each of them
+        if not args.search:
+            results = {
+                benchmark_name: fan_out_results(variant_dictionary[benchmark_name], variant_results)
+                for benchmark_name, variant_results in results.items()
+            }
 
     # Print PASSED/FAILED summary
     print_benchmark_summary(results)
 
+    if args.pipeline_compile:
+        log_compile_overlap_savings(results)
+
+    if args.baseline is not None:
+        regressed_variants = compare_to_baseline(
+            results,
+            load_baseline(args.baseline),
+            args.regression_threshold,
+            args.compile_time_threshold,
+            args.confidence_level,
+        )
+        logger.info(f"{len(regressed_variants)} variants regressed compared to '{args.baseline}'")
+
     save_results(args.log_dir, args.additional_metrics, results, args.csv_metrics)
     if args.gc_monitor:
         plot_ipu_usage(args.log_dir)
     return results
 
 
+def run_variants_with_journal(
+    variant_dictionary: Dict[str, List[dict]],
+    spec: Dict[str, BenchmarkDict],
+    args: argparse.Namespace,
+    journal: BenchmarkJournal,
+    run_jobs: Callable[[list, Callable[[str, dict], None]], Dict[str, dict]],
+) -> Dict[str, List[dict]]:
+    """Run the variants of all benchmarks which are not in the journal at
+    once, recording each result in the journal as soon as it is known.
+
+    Args:
+        variant_dictionary (dict): The variants to run for each benchmark
+        spec (dict): The benchmark definitions from the yaml files
+        args (argparse.Namespace): Arguments passed to run the benchmarks
+            with
+        journal (BenchmarkJournal): Journal of the run, variants it already
+            contains are not run again and new results are recorded in it
+        run_jobs (callable): Runs a list of (variant name, arguments of
+            `run_benchmark_variant_with_own_listener`) jobs, calls the given
+            function with the name and result of each variant when it
+            finishes, and returns the results by variant name
+
+    Returns:
+        results (dict): The variant results of each benchmark, in the same
+            order as the variants were defined
+
+    """
+
+    jobs = []
+    variant_results = {}
+    benchmark_names = {}
+    for benchmark_name, variants in variant_dictionary.items():
+        benchmark_spec = spec.get(benchmark_name, {})
+        for variant in variants:
+            if journal.get(variant["name"]) is not None:
+                logger.info(f"Skipping '{variant['name']}', it was completed in the run being resumed")
+                variant_results[variant["name"]] = journal.get(variant["name"])
+                continue
+            benchmark_names[variant["name"]] = benchmark_name
+            jobs.append((variant["name"], (variant["name"], benchmark_name, variant["config"], benchmark_spec, args)))
+
+    def record_result(variant_name: str, variant_result: dict):
+        journal.record(benchmark_names[variant_name], variant_result)
+
+    variant_results.update(run_jobs(jobs, record_result))
+
+    return {
+        benchmark_name: [variant_results[variant["name"]] for variant in variants]
+        for benchmark_name, variants in variant_dictionary.items()
+    }
+
+
+def run_benchmarks_in_parallel(
+    variant_dictionary: Dict[str, List[dict]],
+    spec: Dict[str, BenchmarkDict],
+    args: argparse.Namespace,
+    journal: BenchmarkJournal,
+) -> Dict[str, List[dict]]:
+    """Run all variants of all benchmarks concurrently within the IPU budget.
+
+    Args:
+        variant_dictionary (dict): The variants to run for each benchmark
+        spec (dict): The benchmark definitions from the yaml files
+        args (argparse.Namespace): Arguments passed to run the benchmarks
+            with
+        journal (BenchmarkJournal): Journal of the run, variants it already
+            contains are not run again and new results are recorded in it
+
+    Returns:
+        results (dict): The variant results of each benchmark, in the same
+            order as the variants were defined
+
+    """
+
+    if args.max_ipus is None:
+        err = "'--parallel' requires the IPU budget to be set with '--max-ipus'."
+        logger.error(err)
+        raise ValueError(err)
+    if args.submit_on_slurm:
+        err = "'--parallel' cannot be used with '--submit-on-slurm'."
+        logger.error(err)
+        raise ValueError(err)
+
+    logger.info(f"Running variants in parallel using up to {args.max_ipus} IPUs at once")
+
+    def run_jobs(jobs: list, on_result: Callable[[str, dict], None]) -> Dict[str, dict]:
+        return run_variants_in_parallel(jobs, run_benchmark_variant_with_own_listener, args.max_ipus, on_result)
+
+    return run_variants_with_journal(variant_dictionary, spec, args, journal, run_jobs)
+
+
+def run_benchmarks_on_slurm_array(
+    variant_dictionary: Dict[str, List[dict]],
+    spec: Dict[str, BenchmarkDict],
+    args: argparse.Namespace,
+    journal: BenchmarkJournal,
+) -> Dict[str, List[dict]]:
+    """Run all variants of all benchmarks as SLURM job arrays, rather than
+    waiting for the job of each variant before submitting the next.
+
+    Args:
+        variant_dictionary (dict): The variants to run for each benchmark
+        spec (dict): The benchmark definitions from the yaml files
+        args (argparse.Namespace): Arguments passed to run the benchmarks
+            with
+        journal (BenchmarkJournal): Journal of the run, variants it already
+            contains are not run again and new results are recorded in it
+
+    Returns:
+        results (dict): The variant results of each benchmark, in the same
+            order as the variants were defined
+
+    """
+
+    if not args.submit_on_slurm:
+        err = "'--slurm-job-array' requires '--submit-on-slurm'."
+        logger.error(err)
+        raise ValueError(err)
+    if args.parallel:
+        err = "'--slurm-job-array' cannot be used with '--parallel'."
+        logger.error(err)
+        raise ValueError(err)
+
+    def run_jobs(jobs: list, on_result: Callable[[str, dict], None]) -> Dict[str, dict]:
+        logger.info(f"Running {len(jobs)} variants as SLURM job arrays")
+        scheduler = SlurmArrayScheduler(args.log_dir)
+        return scheduler.run_variants(jobs, run_benchmark_variant_with_own_listener, on_result)
+
+    return run_variants_with_journal(variant_dictionary, spec, args, journal, run_jobs)
+
+
 def benchmarks_parser(parser: argparse.ArgumentParser):
     """Add benchmarking arguments to argparse parser"""
 
@@ -721,8 +1219,55 @@ def benchmarks_parser(parser: argparse.ArgumentParser):
         nargs="+",
         help="List of benchmark ids to run",
     )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help=(
+            "Search the variants of each benchmark for the best value of a metric with successive halving, "
+            "as configured by the 'search' section of the benchmark, instead of running all of them. The best "
+            "configuration and the history of the trials are saved in 'search_results.json'."
+        ),
+    )
+    parser.add_argument(
+        "--variant-filter",
+        type=str,
+        default=None,
+        help=(
+            "Only run the variants whose parameters match this expression, e.g. "
+            "'{batch_size} * {gradient_accumulation} <= 1024'. Benchmarks without these parameters are not filtered."
+        ),
+    )
+    parser.add_argument(
+        "--sample-variants",
+        type=int,
+        default=None,
+        help="Run this many variants of each benchmark, picked from those matching the filters.",
+    )
+    parser.add_argument(
+        "--sampling-method",
+        choices=SAMPLING_METHODS,
+        default="random",
+        help=(
+            "How '--sample-variants' picks variants: uniformly at random, or with a Latin hypercube design "
+            "which covers the values of every parameter evenly."
+        ),
+    )
+    parser.add_argument(
+        "--sampling-seed",
+        type=int,
+        default=0,
+        help="Seed of '--sample-variants', the same seed picks the same variants.",
+    )
 
     # Additional functionality controls
+    parser.add_argument(
+        "--run-duplicate-variants",
+        action="store_true",
+        help=(
+            "Run every variant, even those whose command and environment are identical to another variant of "
+            "the same benchmark. By default such duplicates are run once and given the same results."
+        ),
+    )
     parser.add_argument(
         "--allow-wandb",
         action="store_true",
@@ -733,12 +1278,23 @@ def benchmarks_parser(parser: argparse.ArgumentParser):
         action="store_true",
         help="Enable compile only options in compatible models",
     )
+    parser.add_argument(
+        "--save-samples",
+        action="store_true",
+        help=(
+            "Save every value of every metric found in the log of each variant, with its line, "
+            f"poprun instance and the time it was read, in '{SAMPLES_FILE}' in the variant log directory"
+        ),
+    )
     parser.add_argument(
         "--csv-metrics",
         type=str,
         nargs="+",
         default=tuple(),
-        help="List of extra metrics to capture in the CSV output.",
+        help=(
+            "List of extra metrics to capture in the CSV output. Use 'metric:reduction_type' "
+            "(e.g. 'latency:p99') for a metric with several reduction types."
+        ),
     )
     parser.add_argument(
         "--custom-metrics-files",
@@ -746,6 +1302,25 @@ def benchmarks_parser(parser: argparse.ArgumentParser):
         nargs="+",
         help="List of python files containing extra metrics functions.",
     )
+    parser.add_argument(
+        "--metric-plugins",
+        type=str,
+        nargs="+",
+        default=[],
+        help=(
+            "Metric plugins, provided by installed packages through the 'examples_utils.metrics' entry points, "
+            "to run for all benchmarks in addition to the 'metric_plugins' of each benchmark."
+        ),
+    )
+    parser.add_argument(
+        "--metric-hook-timeout",
+        type=float,
+        default=DEFAULT_HOOK_TIMEOUT,
+        help=(
+            "Time budget in seconds of each custom metric function, functions which take longer are "
+            "stopped and their metric is left out of the results."
+        ),
+    )
     parser.add_argument(
         "--include-convergence",
         action="store_true",
@@ -833,6 +1408,134 @@ def benchmarks_parser(parser: argparse.ArgumentParser):
         help="Period between progress trace (in seconds)",
     )
 
+    parser.add_argument(
+        "--resume",
+        type=str,
+        help=(
+            "Log directory of an interrupted run to resume. Variants recorded as "
+            "completed in its journal are not run again, and the results of the "
+            "whole suite are saved in that directory."
+        ),
+    )
+    parser.add_argument(
+        "--reuse-results",
+        action="store_true",
+        help=(
+            "Reuse the logs of a previous successful run of a variant when its "
+            "command, environment, git commit, SDK and requirements have not "
+            "changed, instead of running it again. Metrics are extracted again "
+            "from the reused logs."
+        ),
+    )
+    parser.add_argument(
+        "--results-cache-dir",
+        default=str(DEFAULT_RESULTS_CACHE_DIR),
+        type=str,
+        help="Directory in which results are stored for '--reuse-results'",
+    )
+    parser.add_argument(
+        "--results-cache-size",
+        default=200,
+        type=int,
+        help="Maximum number of variant results kept in the cache, the least recently used are removed first",
+    )
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help=(
+            "Run variants concurrently when they fit within the IPU budget "
+            "given by '--max-ipus'. The number of IPUs used by each variant "
+            "is read from 'pod<N>' in its name, and the output of each variant "
+            "is logged in its own log directory."
+        ),
+    )
+    parser.add_argument(
+        "--max-ipus",
+        default=None,
+        type=int,
+        help="Maximum number of IPUs which can be used at once when '--parallel' is set",
+    )
+
+    parser.add_argument(
+        "--repeat",
+        default=1,
+        type=int,
+        help=(
+            "Maximum number of measured runs of each variant. Metrics are "
+            "reported as their mean over the runs, with their standard "
+            "deviation, coefficient of variation and confidence interval"
+        ),
+    )
+    parser.add_argument(
+        "--warmup-runs",
+        default=0,
+        type=int,
+        help="Number of runs of each variant before it is measured, their results are discarded",
+    )
+    parser.add_argument(
+        "--target-ci",
+        default=None,
+        type=float,
+        help=(
+            "Stop repeating a variant once the confidence interval of each of "
+            "its metrics is narrower than this fraction of the mean (e.g. 0.02)"
+        ),
+    )
+    parser.add_argument(
+        "--confidence-level",
+        default=0.95,
+        type=float,
+        help="Confidence level of the intervals computed for repeated runs",
+    )
+    parser.add_argument(
+        "--baseline",
+        default=None,
+        type=str,
+        help=(
+            "'benchmark_results.json' of a previous run to compare the results "
+            "with. Regressions are reported in the CSV and JUnit results and "
+            "make the command exit with a non-zero code"
+        ),
+    )
+    parser.add_argument(
+        "--regression-threshold",
+        default=0.05,
+        type=float,
+        help="Relative degradation of throughput or latency beyond which a variant has regressed",
+    )
+    parser.add_argument(
+        "--compile-time-threshold",
+        default=0.1,
+        type=float,
+        help="Relative growth of the compile time beyond which a variant has regressed",
+    )
+    parser.add_argument(
+        "--pipeline-compile",
+        action="store_true",
+        help=(
+            "Compile upcoming variants with '--compile-only' on CPU worker "
+            "processes while earlier variants execute, so that their executables "
+            "are loaded from the executable cache when they run"
+        ),
+    )
+    parser.add_argument(
+        "--compile-workers",
+        default=1,
+        type=int,
+        help="Number of variants compiled at the same time when '--pipeline-compile' is set",
+    )
+    parser.add_argument(
+        "--executable-cache-dir",
+        default=None,
+        type=str,
+        help=(
+            "Executable cache directory given to the variants (unless already "
+            "set in the environment). Defaults to 'executable_cache' in the log "
+            "directory when '--pipeline-compile' is set"
+        ),
+    )
+
     parser.add_argument("--submit-on-slurm", action="store_true", help=argparse.SUPPRESS)
     parser.add_argument("--slurm-machine-type", choices=["any", "mk2", "mk2w"], default="any", help=argparse.SUPPRESS)
     parser.add_argument("--slurm-resource-reservation", type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--slurm-job-array", action="store_true", help=argparse.SUPPRESS)
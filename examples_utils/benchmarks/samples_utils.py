@@ -0,0 +1,113 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import logging
+import math
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from examples_utils.benchmarks.scanning_utils import get_poprun_instance
+
+# Get the module logger
+logger = logging.getLogger(__name__)
+
+SAMPLES_FILE = "samples.npz"
+
+
+class SampleRecorder:
+    """Keeps every value of every metric found in the log, with where and when
+    it was found, to be saved as columns of a `.npz` file.
+
+    Note:
+        Columns are stored in compact arrays, the metric, stream and instance
+        names are stored once and referred to by index.
+
+    Args:
+        metric_names (list): Names of the metrics which will be recorded
+
+    """
+
+    def __init__(self, metric_names: List[str]):
+        self.metric_names = list(metric_names)
+        self._metric_codes = {name: code for code, name in enumerate(self.metric_names)}
+        self.stream_names = ["stdout", "stderr"]
+        self.instance_names = [""]
+        self._instance_codes = {"": 0}
+        self.metric = array("i")
+        self.value = array("d")
+        self.stream = array("i")
+        self.line = array("q")
+        self.instance = array("i")
+        self.timestamp = array("d")
+
+    def _code(self, names: List[str], codes: Dict[str, int], name: str) -> int:
+        if name not in codes:
+            codes[name] = len(names)
+            names.append(name)
+        return codes[name]
+
+    def add(self, metric: str, value: float, stream: str, line_number: int, line: str, timestamp: Optional[float]):
+        """Record one value of a metric.
+
+        Args:
+            metric (str): Name of the metric
+            value (float): The value found in the log
+            stream (str): 'stdout' or 'stderr'
+            line_number (int): Index of the line in its stream, from 0
+            line (str): The line, to find the poprun instance which printed it
+            timestamp (float): Time at which the harness read the line, as
+                returned by `time.time()`, or None if the log was processed
+                after the benchmark had finished
+
+        """
+
+        instance = get_poprun_instance(line) or ""
+        self.metric.append(self._metric_codes[metric])
+        self.value.append(value)
+        self.stream.append(self.stream_names.index(stream))
+        self.line.append(line_number)
+        self.instance.append(self._code(self.instance_names, self._instance_codes, instance))
+        self.timestamp.append(math.nan if timestamp is None else timestamp)
+
+    def __len__(self) -> int:
+        return len(self.value)
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Get all the samples as one array per column"""
+
+        def names(table: List[str], codes: array) -> np.ndarray:
+            return np.array(table or [""])[np.frombuffer(codes, dtype=np.int32)]
+
+        return {
+            "metric": names(self.metric_names, self.metric),
+            "value": np.frombuffer(self.value, dtype=np.float64),
+            "stream": names(self.stream_names, self.stream),
+            "line": np.frombuffer(self.line, dtype=np.int64),
+            "instance": names(self.instance_names, self.instance),
+            "timestamp": np.frombuffer(self.timestamp, dtype=np.float64),
+        }
+
+    def save(self, path: Union[str, Path]):
+        """Save the samples as a compressed `.npz` file"""
+        np.savez_compressed(path, **self.columns())
+        logger.info(f"   {len(self)} metric samples saved to {str(path)}")
+
+
+def load_samples(path: Union[str, Path]) -> Dict[str, np.ndarray]:
+    """Load the samples saved by a benchmark variant.
+
+    Args:
+        path (str or Path): The 'samples.npz' file, or the variant log directory
+
+    Returns:
+        samples (dict): The 'metric', 'value', 'stream', 'line', 'instance' and
+            'timestamp' columns, one entry per value found in the log
+
+    """
+
+    path = Path(path)
+    if path.is_dir():
+        path = path / SAMPLES_FILE
+    with np.load(path) as samples:
+        return {name: samples[name] for name in samples.files}
@@ -0,0 +1,202 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import logging
+import re
+from typing import Hashable, Iterator, List, Optional, Tuple, Union
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+from examples_utils.benchmarks.log_view_utils import LogView
+
+# Get the module logger
+logger = logging.getLogger(__name__)
+
+# Size of the blocks in which log files are scanned
+SCAN_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Prefix added by poprun/mpirun to each line of output of an instance
+poprun_instance_regex = re.compile(r"\[(\d+),(\d+)\]<std(?:out|err)>:")
+
+# Opcodes of a literal character and of a group in parsed regular expressions
+_LITERAL = sre_parse.LITERAL
+_SUBPATTERN = sre_parse.SUBPATTERN
+
+
+def get_poprun_instance(line: str) -> Optional[str]:
+    """Get the poprun instance which printed a line, as '[<i>,<j>]', or None
+    if the line has no poprun prefix"""
+    instance_match = poprun_instance_regex.search(line)
+    return f"[{instance_match.group(1)},{instance_match.group(2)}]" if instance_match else None
+
+
+def get_required_literal(pattern: str) -> Optional[str]:
+    """Find the longest literal string which every match of a regex contains.
+
+    Args:
+        pattern (str): The regular expression
+
+    Returns:
+        literal (str): A substring of every line matched by the regex, or None
+            if no such literal could be found (e.g. the regex is case
+            insensitive or starts with alternatives)
+
+    """
+
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return None
+    if parsed.state.flags & (re.IGNORECASE | re.VERBOSE):
+        return None
+
+    runs = [""]
+
+    def walk(items):
+        for opcode, argument in items:
+            if opcode == _LITERAL:
+                runs[-1] += chr(argument)
+            elif opcode == _SUBPATTERN and not argument[1] and not argument[2]:
+                # Groups without flags are matched exactly once
+                walk(argument[3])
+            else:
+                runs.append("")
+
+    walk(parsed)
+    literal = max(runs, key=len)
+    return literal or None
+
+
+def iter_line_blocks(log: Union[str, LogView], block_size: int = SCAN_BLOCK_SIZE) -> Iterator[str]:
+    """Yield the content of a log in blocks made of whole lines.
+
+    Args:
+        log (str or LogView): The log, a file is decoded a block at a
+            time so that it is never loaded in memory at once
+        block_size (int): Number of bytes decoded from files at once
+
+    """
+
+    if isinstance(log, str):
+        yield log
+    else:
+        yield from log.iter_blocks(block_size)
+
+
+def iter_lines(log: Union[str, LogView]) -> Iterator[str]:
+    """Yield the lines of a log one at a time, decoding files a block at a time"""
+    if isinstance(log, LogView):
+        yield from log.iter_lines()
+        return
+    for block in iter_line_blocks(log):
+        yield from block.split("\n")
+
+
+class LogScanner:
+    """Find the matches of many regular expressions in a single pass over a log.
+
+    Note:
+        Each pattern is reduced to a literal string that all of its matches
+        contain. A substring search for each literal finds the few lines
+        which can match, and only these lines are given to the patterns
+        whose literal is in the line. Patterns without such a
+        literal are tried on every line. Patterns are applied to each line
+        separately, as with `re.findall` on each line of the log.
+
+    Args:
+        patterns (list): (key, regex) pairs, the key is returned with each match
+
+    """
+
+    def __init__(self, patterns: List[Tuple[Hashable, Union[str, re.Pattern]]]):
+        self.patterns = []
+        self.unfiltered_patterns = []
+        for key, pattern in patterns:
+            regexp = re.compile(pattern)
+            literal = None
+            if isinstance(regexp.pattern, str) and not regexp.flags & re.IGNORECASE:
+                literal = get_required_literal(regexp.pattern)
+            if literal is None:
+                logger.debug(f"No literal prefilter for '{regexp.pattern}', it is tried on every line")
+                self.unfiltered_patterns.append((key, regexp))
+            else:
+                self.patterns.append((key, regexp, literal))
+
+        self.literals = sorted({literal for _, _, literal in self.patterns}, key=len, reverse=True)
+
+    def candidate_lines(self, text: str) -> List[Tuple[int, int]]:
+        """Find the start and end of the lines containing any literal, using
+        `str.find` which is much faster than searching with a regex"""
+        lines = set()
+        for literal in self.literals:
+            position = text.find(literal)
+            while position != -1:
+                line_start = text.rfind("\n", 0, position) + 1
+                line_end = text.find("\n", position + len(literal))
+                if line_end == -1:
+                    line_end = len(text)
+                lines.add((line_start, line_end))
+                position = text.find(literal, line_end)
+        return sorted(lines)
+
+    def scan(self, text: str) -> Iterator[Tuple[Hashable, re.Match]]:
+        """Find all the matches of all the patterns in `text`.
+
+        Args:
+            text (str): Log lines separated by '\\n'
+
+        Yields:
+            key, match: The key of the pattern and its match, in the order of
+                the lines of the log
+
+        """
+
+        if self.unfiltered_patterns:
+            for line in text.split("\n"):
+                yield from self.scan_line(line)
+            return
+
+        for line_start, line_end in self.candidate_lines(text):
+            yield from self.scan_line(text[line_start:line_end])
+
+    def scan_numbered(self, text: str) -> Iterator[Tuple[int, Hashable, re.Match]]:
+        """Like `scan`, but also yields the index in `text` of the line of
+        each match"""
+        if self.unfiltered_patterns:
+            for line_number, line in enumerate(text.split("\n")):
+                for key, match in self.scan_line(line):
+                    yield line_number, key, match
+            return
+
+        line_number, counted_to = 0, 0
+        for line_start, line_end in self.candidate_lines(text):
+            line_number += text.count("\n", counted_to, line_start)
+            counted_to = line_start
+            for key, match in self.scan_line(text[line_start:line_end]):
+                yield line_number, key, match
+
+    def scan_line(self, line: str) -> Iterator[Tuple[Hashable, re.Match]]:
+        """Find all the matches of all the patterns in a single line"""
+        for key, regexp, literal in self.patterns:
+            if literal in line:
+                for match in regexp.finditer(line):
+                    yield key, match
+        for key, regexp in self.unfiltered_patterns:
+            for match in regexp.finditer(line):
+                yield key, match
+
+    def scan_log(self, log: Union[str, LogView]) -> Iterator[Tuple[Hashable, re.Match]]:
+        """Find all the matches in a log which may be a file, see `scan`"""
+        for block in iter_line_blocks(log):
+            yield from self.scan(block)
+
+
+def get_findall_value(match: re.Match):
+    """Get what `re.findall` returns for a match: the whole match if the regex
+    has no group, the group if it has one, or a tuple of all groups"""
+    if match.re.groups == 0:
+        return match.group(0)
+    if match.re.groups == 1:
+        return match.group(1)
+    return match.groups()
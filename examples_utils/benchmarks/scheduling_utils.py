@@ -0,0 +1,187 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+from examples_utils.benchmarks.command_utils import get_num_ipus
+
+# Get the module logger
+logger = logging.getLogger(__name__)
+
+
+def get_variant_ipu_demand(variant_name: str, max_ipus: int) -> int:
+    """Get the number of IPUs a variant will occupy while it runs.
+
+    Note:
+        Variants which do not declare their size in their name (no 'pod<N>')
+        are assumed to need the whole machine, so that they never share IPUs
+        with another variant. The same applies to variants asking for more
+        IPUs than the budget allows.
+
+    Args:
+        variant_name (str): Name of the variant, containing 'pod<N>'
+        max_ipus (int): Total number of IPUs available to the scheduler
+
+    Returns:
+        num_ipus (int): Number of IPUs reserved for this variant
+
+    """
+
+    try:
+        num_ipus = get_num_ipus(variant_name)
+    except ValueError:
+        logger.warning(
+            f"Could not determine the number of IPUs used by '{variant_name}', "
+            "it will be run on its own using the whole IPU budget."
+        )
+        return max_ipus
+
+    if num_ipus > max_ipus:
+        logger.warning(
+            f"'{variant_name}' requires {num_ipus} IPUs which is more than the "
+            f"budget of {max_ipus} IPUs, it will be run on its own."
+        )
+        return max_ipus
+
+    return num_ipus
+
+
+def run_variants_in_parallel(
+    jobs: List[Tuple[str, tuple]],
+    run_function: Callable,
+    max_ipus: int,
+    on_result: Optional[Callable[[str, dict], None]] = None,
+) -> Dict[str, dict]:
+    """Run variants concurrently, packing them within an IPU budget.
+
+    Note:
+        Jobs are started in the order they are given, but a job which fits in
+        the IPUs left free is started ahead of a larger job which does not
+        (first-fit backfilling). Each job runs in its own process so that the
+        working directory changes made while running a variant do not leak
+        into the other variants.
+
+    Args:
+        jobs (list): (variant_name, run_function arguments) pairs
+        run_function (Callable): Picklable function used to run one variant
+        max_ipus (int): Total number of IPUs which can be in use at once
+        on_result (Callable): Called with the variant name and result as soon
+            as each variant finishes
+
+    Returns:
+        results (dict): The return value of `run_function` for each variant,
+            keyed by variant name
+
+    """
+
+    pending = [(name, job_args, get_variant_ipu_demand(name, max_ipus)) for name, job_args in jobs]
+    running: Dict[Future, Tuple[str, int]] = {}
+    results: Dict[str, dict] = {}
+    free_ipus = max_ipus
+
+    with ProcessPoolExecutor(max_workers=max(1, min(len(pending), max_ipus))) as executor:
+        try:
+            while pending or running:
+                # Start every pending job which fits in the remaining budget
+                for job in list(pending):
+                    name, job_args, num_ipus = job
+                    if num_ipus <= free_ipus:
+                        logger.info(f"Starting '{name}' on {num_ipus} IPUs ({free_ipus - num_ipus} IPUs left free)")
+                        running[executor.submit(run_function, *job_args)] = (name, num_ipus)
+                        free_ipus -= num_ipus
+                        pending.remove(job)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, num_ipus = running.pop(future)
+                    free_ipus += num_ipus
+                    results[name] = future.result()
+                    if on_result is not None:
+                        on_result(name, results[name])
+                    logger.info(f"Finished '{name}', releasing {num_ipus} IPUs")
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    return results
+
+
+def run_timed(function: Callable, *function_args) -> Tuple[float, object]:
+    """Call `function`, returning how long it took (in seconds) and its result"""
+    start = time.monotonic()
+    result = function(*function_args)
+    return time.monotonic() - start, result
+
+
+class CompilePipeline:
+    """Compile upcoming variants ahead of their execution.
+
+    Compile-only runs of variants are started on a pool of CPU worker
+    processes as soon as they are submitted, so that they populate the
+    executable cache while earlier variants execute on the IPUs. Before a
+    variant is executed, `wait_for` blocks until its own compilation is done
+    and reports how much of the compilation was hidden behind the execution
+    of other variants.
+
+    Args:
+        compile_function (Callable): Picklable function compiling one variant
+        num_workers (int): Number of variants compiled at the same time
+
+    """
+
+    def __init__(self, compile_function: Callable, num_workers: int):
+        self.compile_function = compile_function
+        self.executor = ProcessPoolExecutor(max_workers=num_workers)
+        self.futures: Dict[str, Future] = {}
+
+    def submit(self, variant_name: str, *compile_args):
+        """Queue the compilation of a variant"""
+        self.futures[variant_name] = self.executor.submit(run_timed, self.compile_function, *compile_args)
+
+    def wait_for(self, variant_name: str) -> Optional[dict]:
+        """Wait until a variant has been compiled.
+
+        Args:
+            variant_name (str): Name of the variant about to be executed
+
+        Returns:
+            compile_stats (dict): Duration of the compile-only run, time spent
+                waiting for it and the compilation time saved by overlapping
+                it with other variants, or None if the variant was not
+                submitted
+
+        """
+
+        future = self.futures.pop(variant_name, None)
+        if future is None:
+            return None
+
+        wait_start = time.monotonic()
+        try:
+            compile_time, compile_result = future.result()
+        except Exception as error:
+            logger.warning(f"Ahead of time compilation of '{variant_name}' failed: {error}")
+            return None
+        wait_time = time.monotonic() - wait_start
+
+        compile_stats = {
+            "compile_time": compile_time,
+            "wait_time": wait_time,
+            "overlap_saving": max(compile_time - wait_time, 0.0),
+            "compile_exitcode": compile_result.get("exitcode"),
+        }
+        logger.info(
+            f"'{variant_name}' compiled ahead of time in {compile_time:.1f}s, waited "
+            f"{wait_time:.1f}s for it (saved {compile_stats['overlap_saving']:.1f}s)"
+        )
+        return compile_stats
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -0,0 +1,192 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import json
+import logging
+import math
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+from examples_utils.benchmarks.variant_utils import format_value
+
+# Get the module logger
+logger = logging.getLogger(__name__)
+
+SEARCH_RESULTS_FILE = "search_results.json"
+
+# Options of the 'search' section of a benchmark
+DEFAULT_SEARCH_CONFIG = {
+    # Metric to optimise, and whether to maximise ('max') or minimise ('min') it
+    "metric": "throughput",
+    "mode": "max",
+    # Parameter which sets the amount of work of a run (e.g. the number of
+    # steps), candidates are first run with 'min_budget' and the best ones
+    # with budgets up to 'max_budget'
+    "budget_parameter": None,
+    "min_budget": None,
+    "max_budget": None,
+    # Only the best 1/eta of the candidates of each rung go to the next one
+    "eta": 3,
+}
+
+
+def get_search_config(benchmark_name: str, benchmark_dict: dict) -> dict:
+    """Get the search options of a benchmark, with their defaults"""
+    search_config = {**DEFAULT_SEARCH_CONFIG, **(benchmark_dict.get("search") or {})}
+    unknown = set(search_config) - set(DEFAULT_SEARCH_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown 'search' options of '{benchmark_name}': {', '.join(sorted(unknown))}")
+    if search_config["mode"] not in ("max", "min"):
+        raise ValueError(f"The search 'mode' of '{benchmark_name}' must be 'max' or 'min'")
+    if search_config["eta"] < 2:
+        raise ValueError(f"The search 'eta' of '{benchmark_name}' must be at least 2")
+    if search_config["budget_parameter"] is not None and (
+        search_config["min_budget"] is None or search_config["max_budget"] is None
+    ):
+        raise ValueError(f"The search 'budget_parameter' of '{benchmark_name}' needs a 'min_budget' and 'max_budget'")
+    if search_config["budget_parameter"] is not None and not (
+        0 < search_config["min_budget"] <= search_config["max_budget"]
+    ):
+        raise ValueError(
+            f"The search budgets of '{benchmark_name}' must satisfy 0 < 'min_budget' <= 'max_budget', "
+            f"got {search_config['min_budget']} and {search_config['max_budget']}"
+        )
+    return search_config
+
+
+def get_rung_budgets(min_budget: float, max_budget: float, eta: int, num_candidates: int) -> List[float]:
+    """Get the budget of each rung of successive halving.
+
+    Note:
+        Budgets grow by a factor `eta` from one rung to the next, the last rung
+        uses `max_budget`. There are no more rungs than needed to bring the
+        candidates down to one.
+
+    Args:
+        min_budget (float): Budget of the first rung
+        max_budget (float): Budget of the last rung
+        eta (int): Ratio of the budgets of successive rungs
+        num_candidates (int): Number of candidates of the first rung
+
+    Returns:
+        budgets (list): Budget of each rung, integers if both bounds are
+
+    """
+
+    num_rungs = 1 + math.floor(math.log(max_budget / min_budget, eta) + 1e-9)
+    num_rungs = min(num_rungs, 1 + math.ceil(math.log(max(num_candidates, 1), eta) - 1e-9))
+    budgets = [max_budget / eta ** (num_rungs - 1 - rung) for rung in range(num_rungs)]
+    if isinstance(min_budget, int) and isinstance(max_budget, int):
+        budgets = [max(min_budget, round(budget)) for budget in budgets]
+    return budgets
+
+
+def get_score(variant_result: dict, metric: str) -> Optional[float]:
+    """Get the value of the optimised metric from the result of a run, None if
+    the run failed"""
+    if variant_result.get("exitcode"):
+        return None
+    metric_results = variant_result.get("results", {}).get(metric) or {}
+    score = next(iter(metric_results.values()), None) if isinstance(metric_results, dict) else metric_results
+    return score if isinstance(score, (int, float)) and not math.isnan(score) else None
+
+
+def successive_halving(
+    benchmark_name: str,
+    candidates: List[dict],
+    run_variant: Callable[[str, dict], dict],
+    search_config: dict,
+    name_variant: Callable[[dict], str],
+) -> dict:
+    """Search the candidate variants of a benchmark for the best value of a
+    metric with successive halving.
+
+    Note:
+        All candidates are run with the smallest budget, then only the best
+        1/eta of them are run again with a budget eta times larger, and so on
+        until the largest budget. Most of the time is therefore spent on the
+        most promising candidates. Failed runs are eliminated. Without a
+        'budget_parameter' every candidate is run once.
+
+    Args:
+        benchmark_name (str): Name of the benchmark
+        candidates (list): The parameters of each candidate variant
+        run_variant (Callable): Runs a variant from its name and parameters,
+            and returns its result
+        search_config (dict): The search options, see `get_search_config`
+        name_variant (Callable): Gives the name of a variant from its
+            parameters
+
+    Returns:
+        search_summary (dict): The 'best' trial and all the 'trials', with the
+            parameters, budget, score and result of each run
+
+    """
+
+    metric, mode = search_config["metric"], search_config["mode"]
+    budget_parameter = search_config["budget_parameter"]
+    if budget_parameter is None:
+        budgets = [None]
+    else:
+        budgets = get_rung_budgets(
+            search_config["min_budget"], search_config["max_budget"], search_config["eta"], len(candidates)
+        )
+    logger.info(
+        f"Searching {len(candidates)} candidates of '{benchmark_name}' for the {mode} '{metric}' "
+        f"in {len(budgets)} rungs" + (f", with '{budget_parameter}' budgets {budgets}" if budget_parameter else "")
+    )
+
+    trials = []
+    ranked = []
+    survivors = list(candidates)
+    for rung, budget in enumerate(budgets):
+        rung_trials = []
+        for params in survivors:
+            variant_dict = dict(params)
+            if budget_parameter is not None:
+                variant_dict[budget_parameter] = format_value(budget)
+            variant_name = name_variant(variant_dict)
+            variant_result = run_variant(variant_name, variant_dict)
+            trial = {
+                "rung": rung,
+                "budget": budget,
+                "variant_name": variant_name,
+                "params": params,
+                "score": get_score(variant_result, metric),
+            }
+            variant_result["search"] = {key: trial[key] for key in ("rung", "budget", "score")}
+            logger.info(f"Search rung {rung}: '{variant_name}' {metric} = {trial['score']}")
+            rung_trials.append((trial, variant_result))
+        trials.extend(rung_trials)
+
+        # Failed candidates are eliminated, the best 1/eta of the others go on
+        ranked = sorted(
+            (trial for trial, _ in rung_trials if trial["score"] is not None),
+            key=lambda trial: trial["score"],
+            reverse=mode == "max",
+        )
+        if rung < len(budgets) - 1:
+            num_promoted = max(1, math.ceil(len(survivors) / search_config["eta"]))
+            survivors = [trial["params"] for trial in ranked[:num_promoted]]
+            logger.info(f"Search rung {rung}: {len(survivors)} of {len(rung_trials)} candidates promoted")
+        if not survivors or not ranked:
+            logger.error(f"All candidates of '{benchmark_name}' failed in rung {rung} of the search")
+            break
+
+    best = ranked[0] if ranked else None
+    if best is not None:
+        logger.info(f"Best '{metric}' of '{benchmark_name}': {best['score']} with {best['params']}")
+    return {
+        "metric": metric,
+        "mode": mode,
+        "budget_parameter": budget_parameter,
+        "budgets": budgets,
+        "best": best,
+        "trials": [dict(trial, result=variant_result) for trial, variant_result in trials],
+    }
+
+
+def save_search_results(log_dir: Union[str, Path], search_summaries: Dict[str, dict]):
+    """Save the best configuration and trial history of each searched benchmark"""
+    search_path = Path(log_dir, SEARCH_RESULTS_FILE)
+    with open(search_path, "w") as f:
+        json.dump(search_summaries, f, indent=2)
+    logger.info(f"Search results saved to {str(search_path)}")
@@ -0,0 +1,365 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import logging
+import os
+import shlex
+import shutil
+import subprocess
+import textwrap
+import threading
+import time
+from io import TextIOWrapper
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from examples_utils.benchmarks.log_view_utils import LogView
+
+# Get the module logger
+logger = logging.getLogger(__name__)
+
+# Seconds between two polls of the SLURM queue
+SLURM_POLL_PERIOD = 5
+
+# Sub directory of the log directory in which the job array scripts are written
+ARRAY_SCRIPTS_DIR = "slurm_arrays"
+
+
+class ArrayTask:
+    """The SLURM job of a variant run, as a task of a job array"""
+
+    def __init__(
+        self,
+        job_name: str,
+        submission_command: List[str],
+        job_script_path: str,
+        stdout_log_path: str,
+        stderr_log_path: str,
+        env: dict,
+        timeout: Optional[float],
+    ):
+        self.job_name = job_name
+        self.submission_command = submission_command
+        self.job_script_path = job_script_path
+        self.stdout_log_path = stdout_log_path
+        self.stderr_log_path = stderr_log_path
+        self.exitcode_path = str(Path(stdout_log_path).with_name("exitcode"))
+        self.env = env
+        self.timeout = timeout
+        # Set once the job is in the queue and when it has started
+        self.job_id: Optional[str] = None
+        self.start_time: Optional[float] = None
+        # Set once the job has ended
+        self.exitcode: Optional[int] = None
+        self.timed_out = False
+        self.error = ""
+        self.done = threading.Event()
+
+    def finish(self, exitcode: int, error: str = ""):
+        self.exitcode = exitcode
+        self.error = error
+        self.done.set()
+
+
+def get_array_script(tasks: List[ArrayTask]) -> str:
+    """Script of a job array, task `i` runs the job script of the i-th variant
+    with its logs redirected to the log directory of the variant, and stores
+    the exit code of the job next to them"""
+
+    def bash_array(name: str, values: List[str]) -> str:
+        return f"{name}=({' '.join(shlex.quote(value) for value in values)})"
+
+    arrays = "\n".join(
+        [
+            bash_array("JOB_SCRIPTS", [task.job_script_path for task in tasks]),
+            bash_array("STDOUT_PATHS", [task.stdout_log_path for task in tasks]),
+            bash_array("STDERR_PATHS", [task.stderr_log_path for task in tasks]),
+            bash_array("EXITCODE_PATHS", [task.exitcode_path for task in tasks]),
+        ]
+    )
+    return (
+        "#!/bin/bash\n"
+        + arrays
+        + textwrap.dedent(
+            """
+            i=$SLURM_ARRAY_TASK_ID
+            bash "${JOB_SCRIPTS[$i]}" > "${STDOUT_PATHS[$i]}" 2> "${STDERR_PATHS[$i]}"
+            echo $? > "${EXITCODE_PATHS[$i]}"
+            """
+        )
+    )
+
+
+def read_exitcode(task: ArrayTask) -> Optional[int]:
+    """Get the exit code the job of a task stored, None if it has not ended"""
+    try:
+        return int(Path(task.exitcode_path).read_text().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class SlurmArrayScheduler:
+    """Run the SLURM jobs of many variants concurrently, submitting them as
+    job arrays rather than waiting for each job before submitting the next.
+
+    Note:
+        Each variant is run in its own thread by `run_variants`. The Python
+        side of the variants (creating the job script, extracting the metrics)
+        runs one variant at a time, as the variants change the working
+        directory, and `run_job` lets the other variants run while a variant
+        waits for its job. Once every variant is waiting, the waiting jobs are
+        submitted as one job array for each submission script and
+        environment. The queue is then polled until each job ends, and its
+        variant carries on with the usual processing of its logs.
+
+    Args:
+        log_dir (str or Path): Log directory of the benchmarks, the job array
+            scripts are written in its 'slurm_arrays' sub directory
+        poll_period (float): Seconds between two polls of the SLURM queue
+
+    """
+
+    def __init__(self, log_dir: Union[str, Path], poll_period: float = SLURM_POLL_PERIOD):
+        self.array_dir = Path(log_dir, ARRAY_SCRIPTS_DIR)
+        self.poll_period = poll_period
+        self.condition = threading.Condition()
+        # Held by the variant whose Python side is running
+        self.work_lock = threading.Lock()
+        self.num_active = 0
+        self.pending: List[ArrayTask] = []
+        self.submitted: Dict[str, List[ArrayTask]] = {}
+        self.num_arrays = 0
+
+    def run_job(
+        self,
+        cmd: list,
+        job_name: str,
+        stdout_log_path: str,
+        stderr_log_path: str,
+        listener: TextIOWrapper,
+        env: dict,
+        timeout: Optional[float] = None,
+        submission_command: Optional[List[str]] = None,
+        job_script_path: Optional[str] = None,
+        **kwargs,
+    ) -> Tuple[LogView, LogView, int]:
+        """Run the SLURM job of a variant in the next job array and wait for
+        it to end. This replaces `run_and_monitor_progress_on_slurm` for the
+        variants run by `run_variants`, see its documentation for the
+        arguments."""
+
+        if submission_command is None or job_script_path is None:
+            raise ValueError("SLURM job arrays need the 'submission_command' and 'job_script_path' of each job")
+        task = ArrayTask(job_name, submission_command, job_script_path, stdout_log_path, stderr_log_path, env, timeout)
+        Path(task.exitcode_path).unlink(missing_ok=True)
+
+        cwd = os.getcwd()
+        with self.condition:
+            self.pending.append(task)
+            self.condition.notify_all()
+        self.work_lock.release()
+        try:
+            task.done.wait()
+        finally:
+            self.work_lock.acquire()
+            os.chdir(cwd)
+
+        logs = []
+        for path in (stdout_log_path, stderr_log_path):
+            if Path(path).exists():
+                with open(path, "r", errors="backslashreplace") as log_file:
+                    shutil.copyfileobj(log_file, listener)
+                logs.append(LogView(path))
+            else:
+                logs.append(LogView())
+        listener.flush()
+        stdout, stderr = logs
+        if task.error:
+            stderr += task.error
+        if task.timed_out:
+            stderr += f"\nTimeout ({timeout})\n"
+
+        logger.info(f"SLURM job of '{job_name}' ended with exit code {task.exitcode}")
+        return stdout, stderr, task.exitcode
+
+    def run_variants(
+        self,
+        jobs: List[Tuple[str, tuple]],
+        run_function: Callable,
+        on_result: Optional[Callable[[str, dict], None]] = None,
+    ) -> Dict[str, dict]:
+        """Run variants concurrently, each submitting its SLURM jobs with
+        `run_job`.
+
+        Args:
+            jobs (list): (variant name, arguments) of each variant, the
+                arguments are given to `run_function`
+            run_function (Callable): Runs a variant and returns its result, it
+                is given `slurm_runner=self.run_job` in addition to the
+                arguments of the variant
+            on_result (Callable): Called with the name and result of each
+                variant as soon as it has finished
+
+        Returns:
+            results (dict): Result of each variant, by variant name
+
+        """
+
+        results = {}
+        errors = []
+
+        def run_variant(variant_name: str, function_args: tuple):
+            try:
+                with self.work_lock:
+                    results[variant_name] = run_function(*function_args, slurm_runner=self.run_job)
+                    if on_result is not None:
+                        on_result(variant_name, results[variant_name])
+            except BaseException as error:
+                logger.error(f"Variant '{variant_name}' failed: {error}")
+                errors.append(error)
+            finally:
+                with self.condition:
+                    self.num_active -= 1
+                    self.condition.notify_all()
+
+        self.num_active = len(jobs)
+        threads = [threading.Thread(target=run_variant, args=job, name=f"slurm-{job[0]}", daemon=True) for job in jobs]
+        for thread in threads:
+            thread.start()
+        try:
+            self.monitor()
+        finally:
+            self.cancel_all()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+        return results
+
+    def monitor(self):
+        """Submit the waiting jobs and poll the queue until all the variants
+        have finished"""
+        while True:
+            with self.condition:
+                if self.num_active == 0:
+                    return
+                num_waiting = len(self.pending) + sum(
+                    not task.done.is_set() for tasks in self.submitted.values() for task in tasks
+                )
+                to_submit = []
+                if self.pending and num_waiting >= self.num_active:
+                    to_submit, self.pending = self.pending, []
+
+            if to_submit:
+                self.submit(to_submit)
+            self.poll()
+
+            with self.condition:
+                if self.num_active and not self.pending:
+                    self.condition.wait(self.poll_period)
+
+    def submit(self, tasks: List[ArrayTask]):
+        """Submit tasks as one job array for each submission script and
+        environment"""
+        groups: Dict[tuple, List[ArrayTask]] = {}
+        for task in tasks:
+            key = (tuple(task.submission_command), tuple(sorted(task.env.items())))
+            groups.setdefault(key, []).append(task)
+
+        self.array_dir.mkdir(parents=True, exist_ok=True)
+        for group in groups.values():
+            array_name = f"benchmark_array_{self.num_arrays}"
+            self.num_arrays += 1
+            array_script_path = self.array_dir / f"{array_name}.sh"
+            array_script_path.write_text(get_array_script(group))
+
+            cmd = group[0].submission_command + [
+                f"--array=0-{len(group) - 1}",
+                "--job-name",
+                array_name,
+                "-o",
+                str(self.array_dir / f"{array_name}_%a.out"),
+                "-e",
+                str(self.array_dir / f"{array_name}_%a.err"),
+                str(array_script_path),
+            ]
+            logger.info(
+                f"Submitting {len(group)} SLURM jobs as job array '{array_name}': "
+                + ", ".join(task.job_name for task in group)
+            )
+            logger.info(f"SLURM job array submission command: {' '.join(cmd)}")
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=group[0].env)
+            output = proc.stdout.decode()
+            if proc.returncode != 0 or "Submitted" not in output:
+                err = f"Failed to submit SLURM job array '{array_name}': {proc.stderr.decode()}{output}"
+                logger.error(err)
+                for task in group:
+                    task.finish(proc.returncode or 1, "\n" + err)
+                continue
+
+            job_id = output.split()[-1]
+            logger.info(f"SLURM job array submitted. Job id: {job_id}. Job name: {array_name}")
+            for i, task in enumerate(group):
+                task.job_id = f"{job_id}_{i}"
+            self.submitted[job_id] = group
+
+    def queued_job_ids(self) -> Optional[set]:
+        """Get the ids of the submitted job arrays which are still queued or
+        running, None if the queue could not be read"""
+        proc = subprocess.run(
+            ["squeue", "--noheader", "--format=%i", f"--jobs={','.join(self.submitted)}"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        if proc.returncode != 0:
+            # squeue rejects the ids of jobs which have left the queue
+            if "Invalid job id" in proc.stderr.decode():
+                return set()
+            logger.warning(f"Failed to read the SLURM queue: {proc.stderr.decode()}")
+            return None
+        return {line.split("_")[0] for line in proc.stdout.decode().split()}
+
+    def poll(self):
+        """Finish the tasks whose job has ended, and cancel the jobs which
+        have timed out"""
+        if not self.submitted:
+            return
+        queued = self.queued_job_ids()
+        now = time.monotonic()
+        for job_id, tasks in list(self.submitted.items()):
+            for task in tasks:
+                if task.done.is_set():
+                    continue
+                exitcode = read_exitcode(task)
+                if exitcode is not None:
+                    task.finish(exitcode)
+                elif queued is not None and job_id not in queued:
+                    task.finish(1, f"\nSLURM job {task.job_id} left the queue without an exit code\n")
+                elif Path(task.stdout_log_path).exists():
+                    # The job has started, its timeout runs from now
+                    task.start_time = task.start_time or now
+                    if task.timeout is not None and now - task.start_time >= task.timeout:
+                        logger.error(f"TIMEOUT of SLURM job '{task.job_name}' ({task.job_id})")
+                        self.cancel(task.job_id)
+                        task.timed_out = True
+                        task.finish(1)
+            if all(task.done.is_set() for task in tasks):
+                del self.submitted[job_id]
+
+    def cancel(self, job_id: str):
+        proc = subprocess.run(["scancel", job_id], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if proc.returncode != 0:
+            logger.error(f"Unable to cancel SLURM job {job_id}: {proc.stderr.decode()}")
+
+    def cancel_all(self):
+        """Cancel the jobs which have not ended, when the run is interrupted"""
+        for job_id, tasks in list(self.submitted.items()):
+            if not all(task.done.is_set() for task in tasks):
+                logger.warning(f"Cancelling SLURM job array {job_id}")
+                self.cancel(job_id)
+            for task in tasks:
+                if not task.done.is_set():
+                    task.finish(1, "\nSLURM job cancelled\n")
+        self.submitted = {}
+        for task in self.pending:
+            task.finish(1, "\nSLURM job not submitted\n")
+        self.pending = []
@@ -11,12 +11,13 @@ import textwrap
 import time
 from datetime import timedelta
 from io import TextIOWrapper
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, Iterator, List, Optional
 from pathlib import Path
 import shutil
 import shlex
 
-from examples_utils.benchmarks.command_utils import get_num_ipus, query_option_in_cmd, determine_variant_timeout
+from examples_utils.benchmarks.command_utils import BenchmarkCommand, get_num_ipus, determine_variant_timeout
+from examples_utils.benchmarks.log_view_utils import LogView
 
 # Get the module logger
 logger = logging.getLogger(__name__)
@@ -26,52 +27,6 @@ class SlurmBenchmarkError(Exception):
     pass
 
 
-class StringFileEmulator:
-    def __init__(self, file_path):
-        self.file_path = file_path
-        self._open_for_reading()
-
-    def _open_for_reading(self) -> None:
-        self.file = open(self.file_path, "r")
-
-    def splitlines(self):
-        self.file.seek(0)
-        for line in self.file:
-            yield line
-
-    def split(self, str_pattern: str):
-        self.file.seek(0)
-        if str_pattern == "\n":
-            for line in self.file:
-                yield line
-        else:
-            for line in self.file:
-                for elem in line.split(str_pattern):
-                    yield elem
-
-    def __add__(self, rh_str: str) -> StringFileEmulator:
-        if isinstance(rh_str, str):
-            self.file.close()
-            with open(self.file_path, "a") as f:
-                f.write(rh_str)
-            self._open_for_reading()
-            return self
-        else:
-            raise ValueError(
-                "binary operator `+` with `StringFileEmulator` objects only supported with `str` right hand side operands"
-            )
-
-    def __contains__(self, value: Any) -> bool:
-        self.file.seek(0)
-        for line in self.file:
-            if value in line:
-                return True
-        return False
-
-    def close(self) -> None:
-        self.file.close()
-
-
 def check_slurm_configured() -> bool:
     proc = subprocess.run(
         "sinfo; sinfo | grep neverland",
@@ -126,10 +81,9 @@ def configure_python_command(cmd: list) -> str:
     Returns:
         bash instruction (str): benchmark variant python command
     """
-    python_index = query_option_in_cmd(cmd, ["python", "python3"])
     return textwrap.dedent(
         f"""
-        {shlex.join(cmd[python_index:])}
+        {shlex.join(BenchmarkCommand.parse(cmd).python_tokens)}
     """
     )
 
@@ -610,14 +564,14 @@ def configure_slurm_job(
 
     # pass --wait to sbatch so that we can obtain the return code from the submitted job
     if args.slurm_resource_reservation is not None:
-        slurm_job_command = [
+        submission_command = [
             submission_script,
             "--reservation",
             args.slurm_resource_reservation,
         ]
     else:
-        slurm_job_command = [submission_script]
-    slurm_job_command += [
+        submission_command = [submission_script]
+    slurm_job_command = submission_command + [
         "--wait",
         "--job-name",
         variant_name,
@@ -637,6 +591,8 @@ def configure_slurm_job(
         "job_name": variant_name,
         "timeout": variant_timeout,
         "env": env,
+        "submission_command": submission_command,
+        "job_script_path": job_script_path,
     }
 
 
@@ -672,6 +628,8 @@ def run_and_monitor_progress_on_slurm(
     listener: TextIOWrapper,
     env: dict,
     timeout: int = None,
+    submission_command: Optional[list] = None,
+    job_script_path: Optional[str] = None,
     **kwargs,
 ) -> Tuple[str, str, int]:
     """
@@ -685,6 +643,9 @@ def run_and_monitor_progress_on_slurm(
         listener (TextIOWrapper): Listener that takes the output from the process
         env (dict): dictionary of environment variables to propagate to SLURM allocated nodes
         timeout (int): Seconds until the process will timeout, forcing termination
+        submission_command (list): Unused, the submission script and its
+            options, to submit the job script in a job array instead
+        job_script_path (str): Unused, the job script included in `cmd`
         kwargs: all additional keyword arguments are passed to `subprocess.Popen`.
 
     Returns:
@@ -790,8 +751,8 @@ def run_and_monitor_progress_on_slurm(
     sys.stderr.write("\n")
 
     # open stdout and stderr log files which will be processed for metrics
-    stdout_log = StringFileEmulator(stdout_path)
-    stderr_log = StringFileEmulator(stderr_path)
+    stdout_log = LogView(stdout_path)
+    stderr_log = LogView(stderr_path)
     atexit.register(lambda x: x.close(), stdout_log)
     atexit.register(lambda x: x.close(), stderr_log)
 
@@ -0,0 +1,228 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import logging
+import math
+import statistics
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Get the module logger
+logger = logging.getLogger(__name__)
+
+# Fewest measurements from which the repetitions may stop early
+MIN_SAMPLES_FOR_STOPPING = 3
+
+# Fewest values of a metric in which a warmup is looked for
+MIN_SAMPLES_FOR_WARMUP_DETECTION = 10
+
+# Number of standard deviations from the steady state level within which a
+# metric is considered to have finished its warmup
+WARMUP_TOLERANCE = 3
+
+# Smallest tolerance of the warmup detection, relative to the steady state
+# level, for steady values which are quantised or constant and so have no MAD
+WARMUP_MIN_RELATIVE_TOLERANCE = 0.01
+
+
+def student_t_two_sided_probability(t: float, dof: int) -> float:
+    """Probability that |T| < t for a Student's t variable with `dof` degrees
+    of freedom, using the closed forms for integer degrees of freedom
+    (Abramowitz and Stegun 26.7.3 and 26.7.4)"""
+    theta = math.atan(t / math.sqrt(dof))
+    sin, cos2 = math.sin(theta), math.cos(theta) ** 2
+    if dof % 2 == 1:
+        term, total = 1.0, 1.0
+        for k in range(1, (dof - 1) // 2):
+            term *= cos2 * (2 * k) / (2 * k + 1)
+            total += term
+        series = sin * math.cos(theta) * total if dof > 1 else 0.0
+        return 2 / math.pi * (theta + series)
+    term, total = 1.0, 1.0
+    for k in range(1, dof // 2):
+        term *= cos2 * (2 * k - 1) / (2 * k)
+        total += term
+    return sin * total
+
+
+def student_t_critical_value(confidence: float, dof: int) -> float:
+    """Get t such that P(|T| < t) equals `confidence`, by bisection"""
+    low, high = 0.0, 1.0
+    while student_t_two_sided_probability(high, dof) < confidence:
+        high *= 2
+    for _ in range(100):
+        middle = (low + high) / 2
+        if student_t_two_sided_probability(middle, dof) < confidence:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def summarise_samples(samples: List[float], confidence: float = 0.95) -> Dict[str, Optional[float]]:
+    """Get the statistics of repeated measurements of a metric.
+
+    Args:
+        samples (list): Values of the metric in each measured run
+        confidence (float): Confidence level of the interval on the mean
+
+    Returns:
+        summary (dict): mean, standard deviation, coefficient of variation,
+            confidence interval on the mean and its width relative to the
+            mean. Statistics which need more samples are None.
+
+    """
+
+    mean = statistics.fmean(samples)
+    summary = {
+        "mean": mean,
+        "stddev": None,
+        "cv": None,
+        "ci_low": None,
+        "ci_high": None,
+        "relative_ci_width": None,
+        "num_samples": len(samples),
+    }
+    if len(samples) < 2:
+        return summary
+
+    stddev = statistics.stdev(samples)
+    half_width = student_t_critical_value(confidence, len(samples) - 1) * stddev / math.sqrt(len(samples))
+    summary.update(
+        {
+            "stddev": stddev,
+            "cv": stddev / abs(mean) if mean else None,
+            "ci_low": mean - half_width,
+            "ci_high": mean + half_width,
+            "relative_ci_width": 2 * half_width / abs(mean) if mean else None,
+        }
+    )
+    return summary
+
+
+def is_number(value) -> bool:
+    """Check if a metric value is a finite number"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def detect_warmup(values: Sequence[float]) -> int:
+    """Find how many leading values of a metric are taken before it reaches a
+    steady state.
+
+    Note:
+        The steady state is estimated from the second half of the values, with
+        their median and their median absolute deviation (MAD) as a standard
+        deviation robust to outliers. The warmup ends at the first value
+        within `WARMUP_TOLERANCE` deviations of the median, or within
+        `WARMUP_MIN_RELATIVE_TOLERANCE` of it when the values barely deviate.
+        Only the first half of the values can be discarded, and none are when
+        no value of the first half reaches the steady state.
+
+    Args:
+        values (sequence): The values of the metric in the order they were
+            found in the log
+
+    Returns:
+        warmup (int): Number of leading values to discard, 0 when there are
+            too few values to tell
+
+    """
+
+    if len(values) < MIN_SAMPLES_FOR_WARMUP_DETECTION:
+        return 0
+    x = np.asarray(values, dtype=np.float64)
+    steady = x[len(x) // 2 :]
+    level = np.median(steady)
+    # Scale the MAD to a standard deviation for normally distributed values
+    deviation = 1.4826 * np.median(np.abs(steady - level))
+    tolerance = max(WARMUP_TOLERANCE * deviation, WARMUP_MIN_RELATIVE_TOLERANCE * abs(level))
+    in_steady_state = np.abs(x[: len(x) // 2 + 1] - level) <= tolerance
+    return int(np.argmax(in_steady_state)) if in_steady_state.any() else 0
+
+
+def get_metric_samples(run_results: List[dict], metric_names: List[str]) -> Dict[str, List[float]]:
+    """Collect the value of each metric in each run.
+
+    Args:
+        run_results (list): `results` of each measured run
+        metric_names (list): Names of the metrics to collect
+
+    Returns:
+        samples (dict): Numeric values of each metric, runs in which the metric
+            has no value are left out
+
+    """
+
+    samples = {}
+    for name in metric_names:
+        values = []
+        for results in run_results:
+            value = next(iter(results.get(name, {}).values()), None)
+            if is_number(value):
+                values.append(value)
+        samples[name] = values
+    return samples
+
+
+def has_converged(samples: Dict[str, List[float]], target_relative_ci_width: float, confidence: float = 0.95) -> bool:
+    """Check if the confidence interval of every metric is narrow enough.
+
+    Args:
+        samples (dict): Values of each metric in each measured run
+        target_relative_ci_width (float): Largest width of the confidence
+            interval, relative to the mean, for the measurements to stop
+        confidence (float): Confidence level of the interval on the mean
+
+    Returns:
+        converged (bool): Whether all metrics reached the target
+
+    """
+
+    for name, values in samples.items():
+        if len(values) < MIN_SAMPLES_FOR_STOPPING:
+            return False
+        width = summarise_samples(values, confidence)["relative_ci_width"]
+        if width is None or width > target_relative_ci_width:
+            logger.debug(f"'{name}' confidence interval is {width} of the mean, above {target_relative_ci_width}")
+            return False
+    return True
+
+
+def aggregate_results(run_results: List[dict], metric_names: List[str], confidence: float = 0.95) -> dict:
+    """Combine the results of repeated runs of a variant.
+
+    The value of each metric becomes its mean over the runs, with the same
+    reduction type key so that it is reported as before, followed by the mean
+    of its other reduction types and the statistics from `summarise_samples`
+    prefixed with 'run_' (e.g. 'run_stddev'), so that they never replace a
+    reduction type of the same name. Other results are taken from the last
+    run.
+
+    Args:
+        run_results (list): `results` of each measured run
+        metric_names (list): Names of the metrics to aggregate
+        confidence (float): Confidence level of the interval on the mean
+
+    Returns:
+        results (dict): The aggregated results
+
+    """
+
+    results = dict(run_results[-1])
+    for name, values in get_metric_samples(run_results, metric_names).items():
+        if name not in results or not values:
+            continue
+        reduction_type, *other_reduction_types = list(results[name]) or ["mean"]
+        summary = summarise_samples(values, confidence)
+        # Metrics with several reduction types also report the mean of the others
+        other_reductions = {}
+        for other in other_reduction_types:
+            # Results which are not numbers, e.g. per instance values, are kept from the last run
+            if not is_number(results[name][other]):
+                other_reductions[other] = results[name][other]
+                continue
+            other_values = [r[name][other] for r in run_results if is_number(r.get(name, {}).get(other))]
+            other_reductions[other] = statistics.fmean(other_values) if other_values else None
+        mean = summary.pop("mean")
+        run_statistics = {f"run_{statistic}": value for statistic, value in summary.items()}
+        results[name] = {reduction_type: mean, **other_reductions, **run_statistics}
+    return results
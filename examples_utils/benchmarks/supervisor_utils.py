@@ -0,0 +1,287 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import asyncio
+import codecs
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from asyncio.subprocess import PIPE
+from datetime import datetime, timedelta
+from io import TextIOWrapper
+from pathlib import Path
+from typing import Awaitable, List, Optional, Tuple, TypeVar, Union
+
+import psutil
+
+from examples_utils.benchmarks.metrics_utils import MetricsExtractor
+from examples_utils.benchmarks.log_view_utils import LogView
+
+# Get the module logger
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Progress spinner frames to iterate through
+progress_frames = [
+    "      ",
+    ">     ",
+    "=>    ",
+    "==>   ",
+    "===>  ",
+    "====> ",
+    "<====>",
+    " <====",
+    "  <===",
+    "   <==",
+    "    <=",
+    "     <",
+]
+
+# Names of the streams read from the benchmark process, in order
+STREAM_NAMES = ("stdout", "stderr")
+
+# Size of the reads from the pipes of the benchmark process
+CAPTURE_CHUNK_SIZE = 1024 * 1024
+
+# Once the process has exited, its pipes are closed after this many seconds
+# without output (they may be held open by orphaned child processes)
+EXITED_PROCESS_IDLE_TIMEOUT = 10
+
+# Seconds to wait for the process to exit once its output has ended
+PROCESS_EXIT_TIMEOUT = 20
+
+# Period between samples of the IPU usage (in seconds)
+IPU_SAMPLING_PERIOD = 5
+
+
+def kill_process_tree(proc_pid: int):
+    """Kill a process and all of its children"""
+    try:
+        process = psutil.Process(proc_pid)
+    except psutil.NoSuchProcess:
+        return
+    for child in process.children(recursive=True):
+        logger.info("Killing child process %s", child.pid)
+        try:
+            child.kill()
+        except psutil.NoSuchProcess:
+            pass
+    logger.info("Killing process %s", proc_pid)
+    try:
+        process.kill()
+    except psutil.NoSuchProcess:
+        pass
+
+
+async def sample_ipu_usage(samples: List[str]):
+    """Append the output of 'gc-monitor' to `samples` until cancelled"""
+    while True:
+        try:
+            monitor = await asyncio.create_subprocess_exec("gc-monitor", "--json", stdout=PIPE, stderr=PIPE)
+            monitor_output, _ = await monitor.communicate()
+            timestamp = datetime.now().strftime("%Y-%m-%d-%H.%M.%S.%f")
+            ipu_log_line = json.dumps({"timestamp": timestamp, **json.loads(monitor_output)})
+            samples.append(f"{ipu_log_line}\n")
+        except (OSError, ValueError) as error:
+            logger.debug(f"Failed to sample IPU usage: {error}")
+        await asyncio.sleep(IPU_SAMPLING_PERIOD)
+
+
+async def show_progress(trace_period: float, metrics_extractor: Optional[MetricsExtractor] = None):
+    """Display the elapsed time and running metrics on stderr until cancelled"""
+    t0 = time.monotonic()
+    frame_idx = 0
+    try:
+        while True:
+            await asyncio.sleep(trace_period)
+            elapsed_time = int(time.monotonic() - t0)
+            frame_idx = (frame_idx + 1) % len(progress_frames)
+            running_metrics = ""
+            if metrics_extractor is not None:
+                running_metrics = " ".join(
+                    f"{name}={value:.6g}"
+                    for name, value in metrics_extractor.running_values().items()
+                    if value is not None
+                )
+            sys.stderr.write(
+                f"\r\tBenchmark elapsed time: {str(timedelta(seconds=elapsed_time))} "
+                f"({elapsed_time} seconds) {progress_frames[frame_idx]} {running_metrics}"
+            )
+            sys.stderr.flush()
+    finally:
+        sys.stderr.write("\r\n")
+
+
+async def supervise_process(
+    cmd: list,
+    listener: TextIOWrapper,
+    timeout: Optional[float] = None,
+    trace_period: Optional[float] = 1,
+    monitor_ipus: bool = True,
+    stdout_path: Optional[Union[str, Path]] = None,
+    stderr_path: Optional[Union[str, Path]] = None,
+    metrics_extractor: Optional[MetricsExtractor] = None,
+    **kwargs,
+) -> Tuple[LogView, LogView, int, List[str]]:
+    """Run a process and monitor it from the running event loop.
+
+    The output readers, timeout, IPU usage sampler and progress display of the
+    process are all tasks of the event loop, so that many processes can be
+    supervised at once with `asyncio.gather` without creating any thread.
+
+    The output of the process is read in large chunks and written straight to
+    spool files, so that the memory used by the harness does not grow with
+    the size of the logs.
+
+    Args:
+        cmd (list): The command to be run, as a list for use by subprocess
+        listener (TextIOWrapper): Listener that takes the output from the process
+        timeout (float): Seconds until the process will timeout, forcing termination
+        trace_period (float): Period between progress traces (in seconds), no
+            progress is displayed if None
+        monitor_ipus (bool): Sample the IPU usage with 'gc-monitor' while the
+            process runs
+        stdout_path (str or Path): File in which stdout is stored, if not
+            provided stdout is spooled to a temporary file and kept in memory
+        stderr_path (str or Path): File in which stderr is stored, if not
+            provided stderr is spooled to a temporary file and kept in memory
+        metrics_extractor (MetricsExtractor): Extractor which is given each line
+            of the output as soon as it is received, its running values are
+            shown in the progress trace
+        kwargs: all additional keyword arguments are passed to
+            `asyncio.create_subprocess_exec`.
+
+    Returns:
+        output (LogView): stdout from the process, as a memory mapped
+            view of `stdout_path` if it was provided
+        err (LogView): stderr from the process, as a memory mapped
+            view of `stderr_path` if it was provided
+        exitcode (int): The process exitcode
+        ipu_monitoring (list): JSON lines sampled from 'gc-monitor'
+
+    """
+
+    # The stream buffers hold up to twice the limit before the pipes are paused
+    proc = await asyncio.create_subprocess_exec(*cmd, stdout=PIPE, stderr=PIPE, limit=CAPTURE_CHUNK_SIZE, **kwargs)
+
+    spool_paths = [stdout_path, stderr_path]
+    spools = [open(path, "wb") if path is not None else tempfile.TemporaryFile() for path in spool_paths]
+    ipu_monitoring: List[str] = []
+
+    def process_output(text: str, partial_line: str, final: bool, stream: str) -> str:
+        listener.write(text)
+        if metrics_extractor is None:
+            return ""
+        text = partial_line + text
+        # Only whole lines are scanned, the last incomplete line is kept for later
+        lines_end = len(text) if final else text.rfind("\n")
+        if lines_end == -1:
+            return text
+        metrics_extractor.process_text(text[:lines_end], stream, time.time())
+        return text[lines_end + 1 :]
+
+    async def read_stream(index: int, stream: asyncio.StreamReader):
+        # Incremental decoders avoid mangling characters split across two reads
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="backslashreplace")
+        partial_line = ""
+        while True:
+            try:
+                data = await asyncio.wait_for(stream.read(CAPTURE_CHUNK_SIZE), EXITED_PROCESS_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                if proc.returncode is None:
+                    continue
+                logger.info("No output received since the process has exited, closing its output. Terminating.")
+                break
+            if not data:
+                break
+            spools[index].write(data)
+            partial_line = process_output(decoder.decode(data), partial_line, False, STREAM_NAMES[index])
+            listener.flush()
+        process_output(decoder.decode(b"", final=True), partial_line, True, STREAM_NAMES[index])
+        listener.flush()
+
+    helpers = []
+    if monitor_ipus:
+        helpers.append(asyncio.create_task(sample_ipu_usage(ipu_monitoring)))
+    if trace_period is not None:
+        helpers.append(asyncio.create_task(show_progress(trace_period, metrics_extractor)))
+
+    readers = asyncio.gather(read_stream(0, proc.stdout), read_stream(1, proc.stderr))
+    timeout_error = False
+    try:
+        try:
+            await asyncio.wait_for(asyncio.shield(readers), timeout)
+        except asyncio.TimeoutError:
+            logger.error("TIMEOUT")
+            timeout_error = True
+            kill_process_tree(proc.pid)
+            await readers
+
+        try:
+            await asyncio.wait_for(proc.wait(), PROCESS_EXIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Failed to communicate with process at the end of benchmark, timing out to avoid"
+                " lock up. Benchmark logs may be truncated."
+            )
+    finally:
+        for helper in helpers:
+            helper.cancel()
+        await asyncio.gather(*helpers, return_exceptions=True)
+        if proc.returncode is None:
+            kill_process_tree(proc.pid)
+
+    # return the info of the running of the benchmark
+    exitcode = proc.returncode
+    if timeout_error:
+        spools[1].write(f"\nTimeout ({timeout})\n".encode())
+
+    logs = []
+    for path, spool in zip(spool_paths, spools):
+        if path is None:
+            spool.seek(0)
+            logs.append(LogView(text=spool.read()))
+        spool.close()
+        if path is not None:
+            logs.append(LogView(path))
+    output, err = logs
+
+    return (output, err, exitcode, ipu_monitoring)
+
+
+def pidfd_supported() -> bool:
+    """Check if the processes can be waited for with pidfds (Linux 5.3+)"""
+    if not hasattr(os, "pidfd_open"):
+        return False
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+    except OSError:
+        return False
+    return True
+
+
+def run_supervised(coroutine: Awaitable[T]) -> T:
+    """Run a coroutine supervising processes in a new event loop.
+
+    Note:
+        Before Python 3.12 the default child watcher waits for each process
+        in its own thread. Processes are waited for with pidfds instead when
+        possible, so that no thread is created per process.
+
+    Args:
+        coroutine (Awaitable): Coroutine to run, such as `supervise_process`
+
+    Returns:
+        result: The result of the coroutine
+
+    """
+
+    if sys.version_info < (3, 12) and threading.current_thread() is threading.main_thread() and pidfd_supported():
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            asyncio.set_child_watcher(asyncio.PidfdChildWatcher())
+    return asyncio.run(coroutine)
@@ -0,0 +1,275 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import itertools
+import logging
+import math
+import random
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from examples_utils.benchmarks.expression_utils import VariantFilter
+
+# Get the module logger
+logger = logging.getLogger(__name__)
+
+# Methods to run a representative subset of the variants of a benchmark
+SAMPLING_METHODS = ("random", "latin-hypercube")
+
+
+def format_value(value: Any) -> str:
+    """Format a generated parameter value as it would be written in the spec"""
+    if isinstance(value, float):
+        return format(value, ".6g")
+    return str(value)
+
+
+def generate_values(name: str, generator: dict) -> List[str]:
+    """Expand a generator of parameter values.
+
+    Note:
+        Generators are written as a dict with a single entry, the bounds are
+        included in the values:
+            - range: [start, stop, step], step defaults to 1
+            - logspace: [start, stop, num], 'num' values evenly spaced on a
+              log scale
+            - pow2: [min, max], the powers of two between 'min' and 'max'
+
+    Args:
+        name (str): Name of the parameter
+        generator (dict): The generator, as given in the spec
+
+    Returns:
+        values (list): The values of the parameter, as strings
+
+    """
+
+    if len(generator) != 1:
+        err = f"Parameter '{name}' must have a single generator, one of 'range', 'logspace' or 'pow2': {generator}"
+        logger.error(err)
+        raise ValueError(err)
+    kind, bounds = next(iter(generator.items()))
+    bounds = list(bounds) if isinstance(bounds, (list, tuple)) else [bounds]
+
+    if kind == "range" and len(bounds) in (2, 3):
+        start, stop, step = bounds + [1] * (3 - len(bounds))
+        if step <= 0:
+            raise ValueError(f"Parameter '{name}' range step must be positive: {step}")
+        # Steps are counted to avoid accumulating floating point errors
+        num = math.floor((stop - start) / step + 1e-9) + 1
+        values = [start + i * step for i in range(max(num, 0))]
+    elif kind == "logspace" and len(bounds) == 3:
+        start, stop, num = bounds
+        if start <= 0 or stop <= 0 or num < 1:
+            raise ValueError(f"Parameter '{name}' logspace bounds must be positive: {bounds}")
+        values = [start * (stop / start) ** (i / max(num - 1, 1)) for i in range(int(num))]
+    elif kind == "pow2" and len(bounds) == 2:
+        low, high = bounds
+        if low <= 0 or high < low:
+            raise ValueError(f"Parameter '{name}' pow2 bounds must be positive and increasing: {bounds}")
+        values = [2**exponent for exponent in range(math.ceil(math.log2(low)), math.floor(math.log2(high)) + 1)]
+    else:
+        err = (
+            f"Parameter '{name}' generator '{kind}: {bounds}' is invalid, use 'range: [start, stop, step]', "
+            "'logspace: [start, stop, num]' or 'pow2: [min, max]'"
+        )
+        logger.error(err)
+        raise ValueError(err)
+
+    return [format_value(value) for value in values]
+
+
+def get_parameter_values(name: str, values: Any) -> List[str]:
+    """Get the values of a matrix-style parameter: a comma separated string,
+    a list or a generator"""
+    if isinstance(values, dict):
+        return generate_values(name, values)
+    if isinstance(values, list):
+        return [str(value) for value in values]
+    return str(values).split(",")
+
+
+class VariantSpace:
+    """All the variants of a benchmark, created only when they are used.
+
+    Note:
+        The space is the product of its dimensions. With matrix-style
+        parameters each parameter is a dimension, with declarative parameters
+        the listed variants form a single dimension. Variants are numbered with
+        the first dimension varying fastest, which is the order in which they
+        are run.
+
+    Args:
+        benchmark_name (str): Benchmarks name as given in the spec yaml file
+        benchmark_dict (dict): benchmark entry itself in yaml file
+
+    """
+
+    def __init__(self, benchmark_name: str, benchmark_dict: dict):
+        self.dimensions: List[Tuple[List[str], List[Tuple[str, ...]]]] = []
+        parameters = benchmark_dict.get("parameters")
+        if parameters is None:
+            return
+
+        # Matching parameters as listed
+        if isinstance(parameters, list):
+            rows = [tuple(str(value) for value in values) for values in parameters[1:]]
+            self.dimensions.append((list(parameters[0]), rows))
+
+        # Matching parameters by every possible combination
+        elif isinstance(parameters, dict):
+            for name, values in parameters.items():
+                self.dimensions.append(([name], [(value,) for value in get_parameter_values(name, values)]))
+
+        else:
+            err = (
+                f"In {benchmark_name} in {benchmark_dict['benchmark_path']},"
+                " the 'parameters' are defined in neither a list style or "
+                "a dict style. They must be defined as one of the two "
+                "(using a comma seperated list, optionally surrounded by "
+                "square brackets, or as a dict, surrounded by curly "
+                "brackets)."
+            )
+            logger.error(err)
+            raise ValueError(err)
+
+    @property
+    def parameter_names(self) -> List[str]:
+        return [name for names, _ in self.dimensions for name in names]
+
+    def __len__(self) -> int:
+        return math.prod(len(rows) for _, rows in self.dimensions)
+
+    def _variant(self, combination: Tuple[Tuple[str, ...], ...]) -> Dict[str, str]:
+        variant = {}
+        for (names, _), row in zip(self.dimensions, combination):
+            variant.update(zip(names, row))
+        return variant
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        for combination in itertools.product(*(rows for _, rows in reversed(self.dimensions))):
+            yield self._variant(combination[::-1])
+
+    def __getitem__(self, index: int) -> Dict[str, str]:
+        combination = []
+        for _, rows in self.dimensions:
+            index, row_index = divmod(index, len(rows))
+            combination.append(rows[row_index])
+        return self._variant(tuple(combination))
+
+    def random_indices(self, num_samples: int, rng: random.Random) -> List[int]:
+        """Pick variants uniformly at random, without repetition"""
+        return sorted(rng.sample(range(len(self)), min(num_samples, len(self))))
+
+    def latin_hypercube_indices(self, num_samples: int, rng: random.Random) -> List[int]:
+        """Pick variants with a Latin hypercube design: the range of values of
+        each dimension is split in `num_samples` strata, each of which is used
+        by one variant, so that every dimension is covered evenly"""
+        num_samples = min(num_samples, len(self))
+        indices = [0] * num_samples
+        stride = 1
+        for _, rows in self.dimensions:
+            strata = list(range(num_samples))
+            rng.shuffle(strata)
+            for sample, stratum in enumerate(strata):
+                row_index = int((stratum + rng.random()) / num_samples * len(rows))
+                indices[sample] += min(row_index, len(rows) - 1) * stride
+            stride *= len(rows)
+        # Small dimensions make some variants be picked several times
+        return sorted(set(indices))
+
+
+def get_variant_filters(
+    benchmark_name: str, benchmark_dict: dict, parameter_names: List[str], variant_filter: Optional[str]
+) -> List[VariantFilter]:
+    """Get the filters of a benchmark: its 'variant_filter' and the
+    `--variant-filter`, unless it uses parameters the benchmark does not have"""
+    filters = []
+    if benchmark_dict.get("variant_filter"):
+        filters.append(VariantFilter(f"{benchmark_name}.variant_filter", str(benchmark_dict["variant_filter"])))
+    if variant_filter:
+        filters.append(VariantFilter("--variant-filter", variant_filter))
+
+    applicable_filters = []
+    for expression in filters:
+        missing = [name for name in expression.dependencies if name not in parameter_names]
+        if not missing:
+            applicable_filters.append(expression)
+        elif expression.name == "--variant-filter":
+            logger.info(f"'--variant-filter' is not applied to '{benchmark_name}', it has no {', '.join(missing)}")
+        else:
+            err = f"'variant_filter' of '{benchmark_name}' uses {', '.join(missing)} which are not parameters"
+            logger.error(err)
+            raise ValueError(err)
+    return applicable_filters
+
+
+def iter_variants(
+    benchmark_name: str,
+    benchmark_dict: dict,
+    variant_filter: Optional[str] = None,
+    num_samples: Optional[int] = None,
+    sampling_method: str = "random",
+    seed: int = 0,
+) -> Iterator[Dict[str, str]]:
+    """Generate the variants of a benchmark, see `create_variants`.
+
+    Note:
+        Variants are generated one at a time, so that only those selected by
+        the filters and the sampling are ever created.
+
+    Args:
+        benchmark_name (str): Benchmarks name as given in the spec yaml file
+        benchmark_dict (dict): benchmark entry itself in yaml file
+        variant_filter (str): Expression over the parameters selecting the
+            variants to run, in addition to the 'variant_filter' of the
+            benchmark
+        num_samples (int): Number of variants to pick from those selected by
+            the filters, all of them if None
+        sampling_method (str): 'random' or 'latin-hypercube'
+        seed (int): Seed of the sampling, the same seed picks the same
+            variants
+
+    Returns:
+        variants (iterator): The variants, in the order in which they are
+            defined
+
+    """
+
+    space = VariantSpace(benchmark_name, benchmark_dict)
+    filters = get_variant_filters(benchmark_name, benchmark_dict, space.parameter_names, variant_filter)
+
+    def is_selected(variant: Dict[str, str]) -> bool:
+        return all(f.matches(variant) for f in filters)
+
+    if num_samples is None or num_samples >= len(space) and not filters:
+        yield from filter(is_selected, space)
+        return
+
+    if sampling_method not in SAMPLING_METHODS:
+        err = f"Unknown sampling method '{sampling_method}', use one of {', '.join(SAMPLING_METHODS)}"
+        logger.error(err)
+        raise ValueError(err)
+
+    rng = random.Random(seed)
+    if sampling_method == "latin-hypercube":
+        variants = [space[index] for index in space.latin_hypercube_indices(num_samples, rng)]
+        selected = [variant for variant in variants if is_selected(variant)]
+        if len(selected) < num_samples:
+            logger.warning(
+                f"Latin hypercube sampling picked {len(selected)} of {num_samples} variants of '{benchmark_name}', "
+                f"{len(variants) - len(selected)} of them were rejected by the filters"
+            )
+    elif not filters:
+        selected = [space[index] for index in space.random_indices(num_samples, rng)]
+    else:
+        # Reservoir sampling of the variants selected by the filters
+        reservoir: List[Tuple[int, Dict[str, str]]] = []
+        for seen, variant in enumerate(filter(is_selected, space)):
+            if len(reservoir) < num_samples:
+                reservoir.append((seen, variant))
+            else:
+                replaced = rng.randrange(seen + 1)
+                if replaced < num_samples:
+                    reservoir[replaced] = (seen, variant)
+        selected = [variant for _, variant in sorted(reservoir, key=lambda entry: entry[0])]
+
+    logger.info(f"Sampled {len(selected)} of the {len(space)} variants of '{benchmark_name}' ({sampling_method})")
+    yield from selected
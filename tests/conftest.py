@@ -0,0 +1,45 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import os
+import sys
+from pathlib import Path
+from typing import Callable, Union
+
+import pytest
+import yaml
+
+from examples_utils.testing import test_commands
+
+
+@pytest.fixture
+def benchmark_environment(tmp_path: Path, monkeypatch):
+    """Set the environment variables the 'benchmark' command requires, when
+    they are not already set. The benchmarks only record the paths of the SDK
+    and virtual environment, placeholders are enough for generated benchmarks."""
+    if "VIRTUAL_ENV" not in os.environ:
+        monkeypatch.setenv("VIRTUAL_ENV", sys.prefix)
+    if "POPLAR_SDK_ENABLED" not in os.environ:
+        monkeypatch.setenv("POPLAR_SDK_ENABLED", str(tmp_path / "poplar_sdk" / "poplar"))
+
+
+@pytest.fixture
+def run_examples_utils(tmp_path: Path, benchmark_environment) -> Callable[..., str]:
+    """Run `python -m examples_utils <args>` from `tmp_path`. It returns the
+    output of the command, a failure raises an error which shows it."""
+
+    def run(*args: Union[str, Path]) -> str:
+        command = [sys.executable, "-m", "examples_utils", *(str(arg) for arg in args)]
+        return test_commands.run_command_fail_explicitly(command, tmp_path)
+
+    return run
+
+
+@pytest.fixture
+def write_spec(tmp_path: Path) -> Callable[[dict], Path]:
+    """Write benchmark definitions to 'spec.yml' in `tmp_path`"""
+
+    def write(benchmarks: dict) -> Path:
+        spec = tmp_path / "spec.yml"
+        spec.write_text(yaml.dump(benchmarks))
+        return spec
+
+    return write
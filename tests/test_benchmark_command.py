@@ -0,0 +1,111 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import shlex
+from argparse import Namespace
+from pathlib import Path
+
+from examples_utils.benchmarks import command_utils
+from examples_utils.benchmarks.cache_utils import get_variant_fingerprint
+from examples_utils.benchmarks.command_utils import (
+    BenchmarkCommand,
+    get_benchmark_command,
+    get_local_poprun_hosts,
+    get_poprun_config,
+    remove_wandb_args,
+)
+from examples_utils.benchmarks.environment_utils import get_mpinum
+from examples_utils.benchmarks.logging_utils import get_latest_checkpoint_path
+from examples_utils.benchmarks.slurm_utils import configure_python_command
+
+POPRUN_CMD = (
+    "poprun -vv --host=host1,host2 --num-instances=2 --vipu-partition=part --mpi-global-args='--tag-output' "
+    "python3 -u train.py --config 'a b' --checkpoint-output-dir=ckpts --wandb --wandb-name run"
+)
+
+
+def test_command_parts():
+    command = BenchmarkCommand.parse(POPRUN_CMD)
+    assert command.launcher[0] == "poprun"
+    assert command.interpreter == "python3"
+    assert command.interpreter_options == ("-u",)
+    assert command.script == "train.py" and not command.is_module
+    assert command.args[:2] == ("--config", "a b")
+    assert shlex.split(str(command)) == shlex.split(POPRUN_CMD)
+    assert BenchmarkCommand.parse(command.tokens) == command
+
+    module = BenchmarkCommand.parse("mpirun --np 4 /venv/bin/python3.8 -m pkg.train --epochs 1")
+    assert module.interpreter == "/venv/bin/python3.8"
+    assert module.script == "pkg.train" and module.is_module
+    assert module.mpinum == 4
+    assert get_mpinum("mpirun --np=2 python3 run.py") == 2
+    assert get_mpinum("python3 run.py --np 8") == 1
+
+    # Environment variables stay unquoted, to be expanded and split later
+    assert str(BenchmarkCommand.parse("poprun $POPRUN_ARGS python3 run.py")) == "poprun $POPRUN_ARGS python3 run.py"
+
+
+def test_poprun_config():
+    config = get_poprun_config(None, shlex.split(POPRUN_CMD))
+    assert config["host"] == ["host1", "host2"]
+    assert config["num_instances"] == "2"
+    assert config["vipu_partition"] == "part"
+    assert config["mpi_global_args"] == "--tag-output"
+    assert config["other_args"] == "-vv"
+    assert get_poprun_config(None, "python3 train.py") == {}
+
+    # The configuration is parsed once, callers get their own copy
+    config["host"].append("host3")
+    assert BenchmarkCommand.parse(POPRUN_CMD).poprun_config["host"] == ["host1", "host2"]
+
+
+def test_local_host_is_removed(monkeypatch):
+    command_utils.get_local_host_identities.cache_clear()
+    calls = []
+
+    def fake_popen(cmd, stdout):
+        calls.append(cmd)
+
+        class Process:
+            def communicate(self):
+                return b"10.0.0.1 10.0.0.2 \n", None
+
+        return Process()
+
+    monkeypatch.setattr(command_utils.subprocess, "Popen", fake_popen)
+    for _ in range(3):
+        config = get_poprun_config(None, "poprun --host 10.0.0.2,10.0.0.3 python3 run.py")
+        assert get_local_poprun_hosts(config) == ["10.0.0.3"]
+        assert config["host"] == ["10.0.0.2", "10.0.0.3"]
+    assert calls == [["hostname", "-I"]]
+    command_utils.get_local_host_identities.cache_clear()
+
+
+def test_benchmark_command_modifications(tmp_path: Path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    args = Namespace(allow_wandb=False, compile_only=True)
+    command = get_benchmark_command({"cmd": POPRUN_CMD.replace("2 ", "{n} ")}, {"n": 2}, args)
+    assert command.script == str(tmp_path / "train.py")
+    assert command.args == ("--config", "a b", "--checkpoint-output-dir=ckpts", "--compile-only")
+    assert not any("vipu" in token for token in command.launcher)
+    assert "--num-instances=2" in command.launcher
+
+    assert remove_wandb_args("python3 run.py --wandb --wandb-name run --epochs 1") == "python3 run.py --epochs 1"
+    assert configure_python_command(shlex.split(POPRUN_CMD)).strip().startswith("python3 -u train.py")
+
+    (tmp_path / "ckpts").mkdir()
+    (tmp_path / "ckpts" / "model.pt").touch()
+    assert get_latest_checkpoint_path(tmp_path, command) == tmp_path / "ckpts" / "model.pt"
+    assert get_latest_checkpoint_path(tmp_path, "python3 run.py --checkpoint_output_dir missing") is None
+
+
+def test_canonical_hash():
+    reference = BenchmarkCommand.parse("python3 run.py --epochs 2 --name 'a b'")
+    assert BenchmarkCommand.parse('python3  run.py --epochs=2 --name "a b"').canonical_hash() == (
+        reference.canonical_hash()
+    )
+    assert BenchmarkCommand.parse("python3 run.py --epochs 3 --name 'a b'").canonical_hash() != (
+        reference.canonical_hash()
+    )
+    env = {"PATH": "/bin"}
+    assert get_variant_fingerprint(reference, env, "abc", "3.2.0") == get_variant_fingerprint(
+        str(reference), env, "abc", "3.2.0"
+    )
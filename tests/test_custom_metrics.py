@@ -5,8 +5,10 @@ import logging
 import sys
 import re
 import json
+import time
 
 from examples_utils.benchmarks import custom_metrics
+from examples_utils.benchmarks.log_view_utils import LogView
 from examples_utils.testing import test_commands
 
 EXPECTED_METRIC_HOOK_NAME = "log_lengths"
@@ -62,7 +64,7 @@ def test_metrics_execution(metrics_file: Path):
     stdout = "\n".join("12345678")
     stderr = "\n".join("1234567890")
     exit_code = 1
-    results = custom_metrics.process_registered_metrics(results, stdout, stderr, exit_code)
+    results = custom_metrics.process_registered_metrics(results, stdout, stderr, exit_code, plugins=[])
     assert not results
     custom_metrics.import_metrics_hooks_files([metrics_file])
     results = custom_metrics.process_registered_metrics(results, stdout, stderr, exit_code)
@@ -113,3 +115,152 @@ test_custom_metric:
     metric = results["test_custom_metric"][0]["results"][EXPECTED_METRIC_HOOK_NAME]
     print(out)
     assert metric["stdout"] == 3 and metric["stderr"] == 0
+
+
+def test_variant_result_is_written_when_compile_time_times_out(tmp_path: Path, write_spec, run_examples_utils):
+    script = tmp_path / "script.py"
+    script.write_text("print('throughput 10')")
+    hooks = tmp_path / "hooks.py"
+    hooks.write_text(
+        "import time\n"
+        "from examples_utils.benchmarks.custom_metrics import register_custom_metric\n"
+        "register_custom_metric('total_compiling_time', lambda *logs: time.sleep(60), timeout=1)\n"
+    )
+    spec = write_spec({"slow_compile_time": {"generated": True, "cmd": f"python3 {script}"}})
+    log_dir = tmp_path / "logs"
+    run_examples_utils("benchmark", "--spec", spec, "--log-dir", log_dir, "--custom-metrics-files", hooks)
+
+    variant_result = json.loads((log_dir / "slow_compile_time" / "variant_result.json").read_text())
+    assert variant_result["exitcode"] == 0
+    assert variant_result["results"]["total_compiling_time"] is None
+    assert variant_result["compilation_end_time"] == "None"
+    assert 1 <= variant_result["metric_hook_times"]["total_compiling_time"] < 60
+    assert (log_dir / "benchmark_results.json").exists()
+
+
+def sleep_then_count(stdout: str, stderr: str, exitcode: int):
+    time.sleep(0.5)
+    return len(stdout)
+
+
+def hang(stdout: str, stderr: str, exitcode: int):
+    time.sleep(60)
+
+
+def fail(stdout: str, stderr: str, exitcode: int):
+    raise RuntimeError("broken metric")
+
+
+def count_lines(stdout_lines, stderr_lines, exitcode: int):
+    assert not isinstance(stdout_lines, str)
+    return sum(1 for _ in stdout_lines), sum("error" in line for line in stderr_lines)
+
+
+def count_throughputs(stdout: str, stderr: str, exitcode: int):
+    return len(stdout), len(re.findall(r"throughput (\d+)", stdout)), stderr.count("error")
+
+
+def test_hooks_are_given_strings(tmp_path: Path):
+    custom_metrics.register_custom_metric("throughputs", count_throughputs)
+    stdout_path = tmp_path / "stdout"
+    stdout_path.write_text("throughput 1\nthroughput 2\n")
+    with LogView(stdout_path) as stdout, LogView(text="error\n") as stderr:
+        results = custom_metrics.process_registered_metrics({}, stdout, stderr + "error", 0)
+    assert results["throughputs"] == (26, 2, 2)
+
+
+def test_hook_times_are_combined_over_runs():
+    assert custom_metrics.combine_hook_times([{"a": 1.0, "b": 0.5}, {"a": 2.0}]) == {"a": 3.0, "b": 0.5}
+
+
+def test_hooks_run_concurrently_with_timeouts():
+    for i in range(3):
+        custom_metrics.register_custom_metric(f"slow_{i}", sleep_then_count)
+    custom_metrics.register_custom_metric("hung", hang, timeout=1)
+    custom_metrics.register_custom_metric("failed", fail)
+
+    start = time.perf_counter()
+    results = custom_metrics.process_registered_metrics({}, "abc", "", 0, max_workers=8, plugins=[])
+    assert time.perf_counter() - start < 5
+
+    assert all(results[f"slow_{i}"] == 3 for i in range(3))
+    assert results["hung"] is None and results["failed"] is None
+    hook_times = results[custom_metrics.HOOK_TIMES_RESULT]
+    assert set(hook_times) == {"slow_0", "slow_1", "slow_2", "hung", "failed"}
+    assert hook_times["slow_0"] >= 0.5
+    assert 1 <= hook_times["hung"] < 5
+
+
+def test_streaming_hook_reads_lines(tmp_path: Path):
+    custom_metrics.register_custom_metric("line_counts", count_lines, streaming=True)
+    stderr_path = tmp_path / "stderr"
+    stderr_path.write_text("ok\nerror 1\nerror 2\n")
+    stderr = LogView(stderr_path)
+    results = custom_metrics.process_registered_metrics({}, "a\nb\nc\nd", stderr, 0)
+    assert results["line_counts"] == (4, 2)
+    # The log is still readable in the parent process
+    assert stderr.splitlines()[1] == "error 1"
+    stderr.close()
+
+
+PLUGIN_MODULE = """
+from examples_utils.benchmarks.custom_metrics import metric_plugin
+
+
+@metric_plugin(streams=["stderr"])
+def count_errors(stdout: str, stderr: str, exitcode: int):
+    return {"stdout": len(stdout), "errors": stderr.count("error")}
+
+
+def unused(stdout: str, stderr: str, exitcode: int):
+    return 0
+"""
+
+
+@pytest.fixture
+def installed_plugins(tmp_path: Path, monkeypatch):
+    """Installs a package providing metric plugins through entry points"""
+    (tmp_path / "my_metric_plugins.py").write_text(PLUGIN_MODULE)
+    dist_info = tmp_path / "my_metric_plugins-1.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text("Metadata-Version: 2.1\nName: my-metric-plugins\nVersion: 1.0\n")
+    (dist_info / "entry_points.txt").write_text(
+        "[examples_utils.metrics]\n"
+        "num_errors = my_metric_plugins:count_errors\n"
+        "unused = my_metric_plugins:unused\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    custom_metrics.get_available_metric_plugins.cache_clear()
+    custom_metrics.load_metric_plugin.cache_clear()
+    yield
+    custom_metrics.get_available_metric_plugins.cache_clear()
+    custom_metrics.load_metric_plugin.cache_clear()
+    sys.modules.pop("my_metric_plugins", None)
+
+
+def test_plugins_are_loaded_only_when_used(installed_plugins):
+    plugins = custom_metrics.get_available_metric_plugins()
+    assert {"total_compiling_time", "num_errors", "unused"} <= set(plugins)
+    assert "my_metric_plugins" not in sys.modules
+
+    results = custom_metrics.process_registered_metrics({}, "out", "error 1\nerror 2\n", 0, plugins=["num_errors"])
+    # The plugin only needs stderr, it is given an empty stdout
+    assert results["num_errors"] == {"stdout": 0, "errors": 2}
+    assert "unused" not in results and "total_compiling_time" not in results
+    assert "my_metric_plugins" in sys.modules
+
+    with pytest.raises(ValueError, match="not_installed"):
+        custom_metrics.process_registered_metrics({}, "", "", 0, plugins=["not_installed"])
+
+
+def test_default_plugins_are_run():
+    results = custom_metrics.process_registered_metrics({}, "", "", 0)
+    assert results["total_compiling_time"] == {"mean": None}
+    assert set(results[custom_metrics.HOOK_TIMES_RESULT]) == {"total_compiling_time"}
+
+
+def test_metric_plugin_names_of_benchmark():
+    names = custom_metrics.get_metric_plugin_names({"metric_plugins": ["b", "a"]}, ["a"])
+    assert names == ["total_compiling_time", "a", "b"]
+    _, options = custom_metrics.load_metric_plugin("total_compiling_time")
+    assert options["streams"] == ("stderr",)
@@ -0,0 +1,70 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import pytest
+
+from examples_utils.benchmarks.expression_utils import DerivedExpression, VariantFilter, get_derived_metrics
+from examples_utils.benchmarks.metrics_utils import derive_metrics
+
+
+def test_derived_metrics_follow_dependencies():
+    derivation_config = {
+        # Uses a metric which is derived later in the spec
+        "tokens_per_sec_k": {"expr": "{tokens_per_sec} / 1000"},
+        "tokens_per_sec": {"expr": "{throughput} * {sequence-length}", "reduction_type": "final"},
+        "log_latency": {"expr": "round(log10(max({latency}, 1)), 3)"},
+    }
+    results = {"throughput": {"mean": 50.0}, "latency": {"final": 100.0}}
+    results, failed = derive_metrics(derivation_config, {"sequence-length": "128"}, results, 0)
+    assert not failed
+    assert results["tokens_per_sec"] == {"final": 6400.0}
+    assert results["tokens_per_sec_k"] == {"mean": 6.4}
+    assert results["log_latency"] == {"mean": 2.0}
+
+
+def test_expressions_are_parsed_once():
+    derivation_config = {"double": {"expr": "2 * {throughput}"}}
+    assert get_derived_metrics(derivation_config) is get_derived_metrics(dict(derivation_config))
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "__import__('os').system('true')",
+        "{throughput}.__class__",
+        "[x for x in ({throughput},)]",
+        "open('file')",
+        "throughput * 2",
+        "'text'",
+        "{throughput} +",
+    ],
+)
+def test_unsafe_or_invalid_expressions_are_rejected(expression):
+    with pytest.raises(ValueError):
+        DerivedExpression("metric", expression)
+
+
+def test_invalid_derivations_fail():
+    results, failed = derive_metrics({"a": {"expr": "{b} + 1"}, "b": {"expr": "{a} + 1"}}, {}, {}, 0)
+    assert failed and results["a"] == {"mean": None}
+
+    results, failed = derive_metrics(
+        {"ratio": {"expr": "{throughput} / {zero}"}}, {"zero": 0}, {"throughput": {"mean": 1.0}}, 0
+    )
+    assert failed and results["ratio"] == {"mean": None}
+
+    results, failed = derive_metrics({"double": {"expr": "2 * {missing}"}}, {}, {}, 0)
+    assert failed and results["double"] == {"mean": None}
+
+
+def test_large_powers_overflow_quickly():
+    results, failed = derive_metrics(
+        {"huge": {"expr": "{a} + 9**9**9"}, "power_fn": {"expr": "pow({a}, 10**100)"}, "small": {"expr": "{a} ** 10"}},
+        {"a": "2"},
+        {},
+        0,
+    )
+    assert failed and results["huge"] == {"mean": None} and results["power_fn"] == {"mean": None}
+    assert results["small"] == {"mean": 1024}
+
+    with pytest.raises(OverflowError):
+        VariantFilter("--variant-filter", "{batch_size} < 9**9**9").matches({"batch_size": "4"})
+    assert VariantFilter("--variant-filter", "{batch_size} == 2**2").matches({"batch_size": "4"})
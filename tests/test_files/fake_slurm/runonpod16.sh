@@ -0,0 +1,4 @@
+#!/bin/bash
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+# Local stand-in for the SLURM helper script of POD16 jobs
+exec sbatch "$@"
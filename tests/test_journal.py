@@ -0,0 +1,76 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import json
+from pathlib import Path
+
+from examples_utils.benchmarks.journal_utils import JOURNAL_FILE, BenchmarkJournal, load_journal
+
+
+def test_record_and_resume(tmp_path: Path):
+    with BenchmarkJournal(tmp_path) as journal:
+        journal.record("bench", {"variant_name": "a", "results": {}})
+        journal.record("bench", {"variant_name": "b", "results": {}})
+
+    with BenchmarkJournal(tmp_path, resume=True) as journal:
+        assert journal.get("a") == {"variant_name": "a", "results": {}}
+        assert journal.get("c") is None
+        journal.record("bench", {"variant_name": "c", "results": {}})
+    assert list(load_journal(tmp_path / JOURNAL_FILE)) == ["a", "b", "c"]
+
+
+def test_new_run_starts_new_journal(tmp_path: Path):
+    with BenchmarkJournal(tmp_path) as journal:
+        journal.record("bench", {"variant_name": "a"})
+    with BenchmarkJournal(tmp_path) as journal:
+        assert journal.get("a") is None
+    assert load_journal(tmp_path / JOURNAL_FILE) == {}
+
+
+def test_partially_written_entry_ignored(tmp_path: Path):
+    with BenchmarkJournal(tmp_path) as journal:
+        journal.record("bench", {"variant_name": "a"})
+    with open(tmp_path / JOURNAL_FILE, "a") as f:
+        f.write('{"benchmark_name": "bench", "variant_res')
+
+    with BenchmarkJournal(tmp_path, resume=True) as journal:
+        assert list(journal.completed) == ["a"]
+        journal.record("bench", {"variant_name": "b"})
+    assert list(load_journal(tmp_path / JOURNAL_FILE)) == ["a", "b"]
+
+
+def test_resume_skips_completed_variants(tmp_path: Path, write_spec, run_examples_utils):
+    counter = tmp_path / "runs.txt"
+    script = tmp_path / "count_runs.py"
+    script.write_text(
+        "import sys\n"
+        f"with open({str(counter)!r}, 'a') as f:\n"
+        "    f.write(sys.argv[1] + '\\n')\n"
+        "print('throughput', sys.argv[1])\n"
+    )
+    spec = write_spec(
+        {
+            "resume_pod4_gen": {
+                "generated": True,
+                "cmd": f"python3 {script} {{value}}",
+                "parameters": {"value": "10,20,30"},
+                "data": {"throughput": {"regexp": r"throughput (\d+)"}},
+            }
+        }
+    )
+    log_dir = tmp_path / "logs"
+    run_examples_utils("benchmark", "--spec", spec, "--log-dir", log_dir)
+    with open(log_dir / "benchmark_results.json") as f:
+        uninterrupted = json.load(f)
+
+    # Simulate the harness dying before the last variant was recorded
+    journal_lines = (log_dir / JOURNAL_FILE).read_text().splitlines(keepends=True)
+    (log_dir / JOURNAL_FILE).write_text("".join(journal_lines[:-1]))
+    (log_dir / "benchmark_results.json").unlink()
+    counter.write_text("")
+
+    run_examples_utils("benchmark", "--spec", spec, "--resume", log_dir)
+    assert counter.read_text() == "30\n"
+    with open(log_dir / "benchmark_results.json") as f:
+        resumed = json.load(f)
+    assert [(v["variant_name"], v["results"]) for v in resumed["resume_pod4_gen"]] == [
+        (v["variant_name"], v["results"]) for v in uninterrupted["resume_pod4_gen"]
+    ]
@@ -0,0 +1,93 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import re
+from pathlib import Path
+
+import pytest
+
+from examples_utils.benchmarks.metrics_utils import MetricsExtractor, extract_metrics, get_instance_compile_times
+from examples_utils.benchmarks.scanning_utils import LogScanner, get_findall_value, get_required_literal
+from examples_utils.benchmarks.log_view_utils import LogView
+
+EXTRACTION_CONFIG = {
+    "throughput": {"regexp": r"throughput: *(.*?) samples\/sec", "reduction_type": "mean"},
+    "loss": {"regexp": r"loss (\d+\.\d+)", "reduction_type": "final"},
+    "latency": {"regexp": r"(?:lat|latency)=(\d+)", "reduction_type": "min"},
+}
+
+
+def make_log(num_lines: int) -> str:
+    lines = []
+    for i in range(num_lines):
+        if i % 100 == 0:
+            lines.append(f"step {i} throughput: {1000 + i % 7} samples/sec loss {1 / (i + 1):.4f} latency={i % 13}")
+        else:
+            lines.append(f"2023-01-01 00:00:00.000000 some other output of step {i}")
+    return "\n".join(lines) + "\n"
+
+
+@pytest.mark.parametrize(
+    "pattern,literal",
+    [
+        (r"throughput: *(.*?) samples\/sec", " samples/sec"),
+        (r"(\d+) items", " items"),
+        (r"(?:lat|latency)=(\d+)", "lat"),
+        (r"(foo|bar)", None),
+        (r"(?i)throughput (\d+)", None),
+    ],
+)
+def test_required_literal(pattern, literal):
+    assert get_required_literal(pattern) == literal
+
+
+def test_scanner_matches_findall_on_each_line():
+    log = make_log(1000)
+    scanner = LogScanner([(name, metric["regexp"]) for name, metric in EXTRACTION_CONFIG.items()])
+    found = {name: [] for name in EXTRACTION_CONFIG}
+    for name, match in scanner.scan(log):
+        found[name].append(get_findall_value(match))
+
+    for name, metric in EXTRACTION_CONFIG.items():
+        expected = [value for line in log.split("\n") for value in re.findall(metric["regexp"], line)]
+        assert found[name] == expected
+
+
+def test_extraction_from_file_matches_string(tmp_path: Path):
+    log = make_log(1000)
+    log_path = tmp_path / "stdout"
+    log_path.write_text(log)
+    from_string = extract_metrics(EXTRACTION_CONFIG, log, "", 0, 1)
+
+    extractor = MetricsExtractor(EXTRACTION_CONFIG)
+    log_file = LogView(log_path)
+    for block in log_file.iter_blocks(1000):
+        extractor.process_text(block)
+    assert extractor.get_results(0, 1) == from_string
+    log_file.close()
+
+
+def test_compile_times_from_markers(tmp_path: Path):
+    log = (
+        "[1,0]<stderr>: 2023-01-01T00:00:00.000000 PO:ENGINE Poplar version: 3.1\n"
+        "unrelated line\n"
+        "[1,0]<stderr>: 2023-01-01T00:00:10.000000 PO:ENGINE Begin Poplar graph construction\n"
+        "[1,0]<stderr>: 2023-01-01T00:00:30.000000 PO:ENGINE End Poplar graph construction\n"
+    )
+    compile_times = get_instance_compile_times(log)
+    assert compile_times["pre_poplar_compilation_time"]["[1,0]"]["start_times"][0].second == 0
+    assert compile_times["pre_poplar_compilation_time"]["[1,0]"]["end_times"][0].second == 10
+    assert compile_times["graph_construction_time"]["[1,0]"]["end_times"][0].second == 30
+    assert compile_times["poplar_compilation_time"]["N/A"] == {"start_times": [], "end_times": []}
+
+    log_path = tmp_path / "stderr"
+    log_path.write_text(log)
+    log_file = LogView(log_path)
+    assert get_instance_compile_times(log_file) == compile_times
+    log_file.close()
+
+
+def test_scanning_log_with_few_metric_lines():
+    """Metrics are extracted from a large log where few lines contain them"""
+    log = make_log(200000)
+    results, failed = extract_metrics(EXTRACTION_CONFIG, log, log, 0, 1)
+    assert not failed
+    assert results["throughput"]["mean"] == pytest.approx(1003, abs=1)
@@ -0,0 +1,42 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+from pathlib import Path
+
+from examples_utils.benchmarks.log_view_utils import LogView
+
+
+def test_log_view_of_a_file(tmp_path: Path):
+    log_path = tmp_path / "stderr"
+    lines = [f"line {i} é" for i in range(1000)]
+    log_path.write_text("\n".join(lines) + "\n")
+
+    with LogView(log_path) as log:
+        assert log.splitlines() == lines
+        assert list(log.split("\n")) == lines
+        assert "\n".join(log.iter_blocks(100)) == "\n".join(lines)
+        assert log.tail(3) == lines[-3:]
+        assert log.tail(5000) == lines
+        assert "line 999 é" in log and "line 1000" not in log
+        assert [m.group(1) for m in log.finditer(r"line (99\d) ")] == [str(i).encode() for i in range(990, 1000)]
+        assert log.search(rb"line 5\d\d").group() == b"line 500"
+        assert str(log) == log_path.read_text()
+
+        # Added text is kept in memory, the file is left unchanged
+        log += "\nTimeout (10)\n"
+        assert log.tail(2) == ["", "Timeout (10)"]
+        assert "é\n\nTimeout" in log
+        assert log.splitlines()[-3:] == [lines[-1], "", "Timeout (10)"]
+        assert log_path.read_text().endswith("line 999 é\n")
+
+
+def test_log_view_without_file(tmp_path: Path):
+    empty_path = tmp_path / "stdout"
+    empty_path.touch()
+    with LogView(empty_path) as log:
+        assert log.splitlines() == [] and log.tail(10) == [] and "a" not in log
+        assert str(log + "a\nb") == "a\nb"
+        assert log.tail(1) == ["b"]
+
+    log = LogView(text=b"done \xc3\xa9\nlast")
+    assert log == "done é\nlast"
+    assert log.tail(1) == ["last"]
+    assert log.splitlines() == ["done é", "last"]
@@ -0,0 +1,233 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import sys
+from pathlib import Path
+
+import csv
+import numpy as np
+import pytest
+
+from examples_utils.benchmarks import metrics_utils
+from examples_utils.benchmarks.logging_utils import save_results
+from examples_utils.benchmarks.metrics_utils import (
+    MetricsExtractor,
+    OnlineReducer,
+    extract_metrics,
+    get_results_for_compile_time,
+)
+from examples_utils.benchmarks.quantile_utils import TDigest
+from examples_utils.benchmarks.run_benchmarks import run_and_monitor_progress
+
+STDOUT = "\n".join(
+    f"step {i} throughput: {v} latency: {l}" for i, (v, l) in enumerate(zip([1, 9, 4, 6, 5], [7, 1, 3, 2, 8]))
+)
+STDERR = "loss: 0.5\nloss: 0.25\n"
+
+
+def config(reduction_type: str, skip: int = 0) -> dict:
+    return {
+        "throughput": {"regexp": r"throughput: (\d+)", "reduction_type": reduction_type, "skip": skip},
+        "latency": {"regexp": r"latency: (\d+)", "reduction_type": reduction_type, "skip": skip},
+        "loss": {"regexp": r"loss: ([\d.]+)", "reduction_type": reduction_type},
+    }
+
+
+@pytest.mark.parametrize(
+    "reduction_type,skip,expected",
+    [
+        ("mean", 0, {"throughput": 5.0, "latency": 4.2, "loss": 0.375}),
+        # The lowest throughputs and the highest latencies are skipped
+        ("mean", 2, {"throughput": 20 / 3, "latency": 2.0, "loss": 0.375}),
+        ("final", 0, {"throughput": 5.0, "latency": 8.0, "loss": 0.25}),
+        ("min", 0, {"throughput": 1.0, "latency": 1.0, "loss": 0.25}),
+        ("value", 0, {"throughput": 1.0, "latency": 7.0, "loss": 0.5}),
+    ],
+)
+def test_reduction_types(reduction_type, skip, expected):
+    results, failed = extract_metrics(config(reduction_type, skip), STDOUT, STDERR, 0, 1)
+    assert not failed
+    for name, value in expected.items():
+        assert results[name][reduction_type] == pytest.approx(value)
+
+
+@pytest.mark.parametrize(
+    "reduction_type,expected",
+    [
+        ("median", lambda x: np.median(x)),
+        ("p90", lambda x: np.percentile(x, 90)),
+        ("p99.9", lambda x: np.percentile(x, 99.9)),
+        ("stddev", lambda x: np.std(x, ddof=1)),
+        ("iqr", lambda x: np.percentile(x, 75) - np.percentile(x, 25)),
+        ("trimmed_mean", lambda x: np.mean(np.sort(x)[100:900])),
+    ],
+)
+def test_distribution_reduction_types(reduction_type, expected):
+    values = np.random.default_rng(0).lognormal(size=1000)
+    exact = OnlineReducer("latency", reduction_type, 0)
+    streaming = OnlineReducer("latency", reduction_type, 0, streaming=True)
+    for value in values:
+        exact.add(value)
+        streaming.add(value)
+    assert exact.value() == pytest.approx(expected(values))
+    assert streaming.value() == pytest.approx(expected(values), rel=0.02)
+
+
+def test_tdigest_accuracy_in_constant_memory():
+    values = np.random.default_rng(1).exponential(size=200000)
+    digest = TDigest()
+    for value in values:
+        digest.add(value)
+    assert len(digest.centroids()[0]) < digest.compression
+    for percentile in (50, 90, 99):
+        assert digest.quantile(percentile / 100) == pytest.approx(np.percentile(values, percentile), rel=0.01)
+
+
+def test_several_reduction_types(tmp_path: Path):
+    extraction_config = {"latency": {"regexp": r"latency: (\d+)", "reduction_type": ["p50", "p99", "mean"]}}
+    results, failed = extract_metrics(extraction_config, STDOUT, "", 0, 1)
+    assert not failed
+    assert list(results["latency"]) == ["p50", "p99", "mean"]
+    assert results["latency"]["p50"] == 3.0
+
+    variant_result = {"variant_name": "v", "exitcode": 0, "results": results}
+    save_results(tmp_path, False, {"b": [variant_result]}, ["latency:p99"])
+    with open(tmp_path / "benchmark_results.csv") as f:
+        row = next(csv.DictReader(f))
+    assert float(row["latency"]) == 3.0
+    assert float(row["latency:p99"]) == pytest.approx(np.percentile([7, 1, 3, 2, 8], 99))
+
+
+def test_automatic_skip_of_warmup():
+    rng = np.random.default_rng(2)
+    warmup = [100.0, 400.0, 700.0, 850.0, 950.0]
+    values = warmup + (1000 + rng.normal(scale=5, size=60)).tolist()
+    stdout = "\n".join(f"throughput: {v:.2f}" for v in values)
+    extraction_config = {"throughput": {"regexp": r"throughput: ([\d.]+)", "skip": "auto"}}
+    results, failed = extract_metrics(extraction_config, stdout, "", 0, 1)
+    assert not failed
+    assert list(results["throughput"]) == ["mean", "detected_skip"]
+    assert results["throughput"]["detected_skip"] == len(warmup)
+    assert results["throughput"]["mean"] == pytest.approx(np.mean(values[len(warmup) :]), rel=1e-4)
+
+
+def test_automatic_skip_without_warmup():
+    values = [10.0, 11.0, 9.0, 10.0, 10.5, 9.5, 10.0, 10.2, 9.8, 10.0, 10.1, 9.9]
+    reducer = OnlineReducer("throughput", ["final", "median"], "auto")
+    for value in values:
+        reducer.add(value)
+    assert reducer.detected_skip() == 0
+    assert reducer.values() == {"final": 9.9, "median": 10.0}
+
+
+def test_metrics_per_instance():
+    stderr = "\n".join(
+        f"[1,{instance}]<stderr>: step {step} throughput: {throughput} latency: {latency}"
+        for step in range(3)
+        for instance, throughput, latency in [(0, 100, 2), (1, 50, 4), (2, 100, 1)]
+    )
+    extraction_config = {
+        "throughput": {"regexp": r"throughput: (\d+)", "instance_reduction": "auto"},
+        "latency": {"regexp": r"latency: (\d+)", "instance_reduction": "auto", "reduction_type": "final"},
+    }
+    # The throughput of each instance is not multiplied by the number of replicas
+    results, failed = extract_metrics(extraction_config, "", stderr, 0, 3)
+    assert not failed
+    assert results["throughput"]["mean"] == 250
+    assert results["throughput"]["instances"]["[1,1]"] == {"mean": 50}
+    assert results["throughput"]["imbalance"] == 2.0
+    assert results["throughput"]["slowest_instance"] == "[1,1]"
+    assert results["latency"]["final"] == 4
+    assert results["latency"]["imbalance"] == 4.0
+    assert results["latency"]["slowest_instance"] == "[1,1]"
+
+
+def test_too_few_results_for_skip():
+    results, failed = extract_metrics(config("mean", skip=5), STDOUT, STDERR, 0, 1)
+    assert failed
+    assert results["throughput"]["mean"] is None
+
+
+def test_throughput_scaled_by_replicas():
+    results, _ = extract_metrics(config("mean"), STDOUT, STDERR, 0, 4)
+    assert results["throughput"]["mean"] == pytest.approx(20.0)
+
+
+def test_failed_process_has_no_metrics():
+    results, failed = extract_metrics(config("mean"), STDOUT, STDERR, 1, 1)
+    assert failed
+    assert all(result["mean"] is None for result in results.values())
+
+
+def test_nan_metric_fails():
+    results, failed = extract_metrics({"loss": {"regexp": r"loss: (\S+)"}}, "loss: 1.0\nloss: nan\n", "", 0, 1)
+    assert failed and results["loss"]["mean"] is None
+
+
+def test_running_values():
+    extractor = MetricsExtractor(config("mean"))
+    assert extractor.running_values()["throughput"] is None
+    extractor.process_line("throughput: 4")
+    extractor.process_line("throughput: 8")
+    assert extractor.running_values()["throughput"] == pytest.approx(6.0)
+
+
+def test_running_values_do_not_reduce_all_values(monkeypatch):
+    extractor = MetricsExtractor(config("p50", skip="auto"))
+    for value in [4, 8, 12]:
+        extractor.process_line(f"throughput: {value}")
+    monkeypatch.setattr(metrics_utils, "detect_warmup", lambda values: pytest.fail("warmup detected while running"))
+    monkeypatch.setattr(metrics_utils, "reduce_samples", lambda *args: pytest.fail("samples reduced while running"))
+    assert extractor.running_values()["throughput"] == pytest.approx(8.0)
+
+
+def test_metrics_extracted_while_running(tmp_path: Path):
+    script = tmp_path / "script.py"
+    script.write_text("import sys\nsys.stdout.write(" + repr(STDOUT) + ")\nsys.stderr.write(" + repr(STDERR) + ")\n")
+    extractor = MetricsExtractor(config("final"))
+    with open(tmp_path / "output.log", "w") as listener:
+        _, _, exitcode, _ = run_and_monitor_progress(
+            [sys.executable, str(script)], listener, monitor_ipus=False, metrics_extractor=extractor
+        )
+    results, failed = extractor.get_results(exitcode, 1)
+    assert not failed
+    # The last line of stdout does not end with a new line
+    assert results["throughput"]["final"] == 5.0
+    assert results["loss"]["final"] == 0.25
+
+
+def compile_log(instance: str, construction_end: int, compilation_end: int) -> str:
+    return "\n".join(
+        f"[{instance}]<stderr>: 2023-01-01T00:00:{second:02d}.000000 PO:ENGINE {marker}"
+        for second, marker in [
+            (0, "Poplar version: 3.1"),
+            (5, "Begin Poplar graph construction"),
+            (construction_end, "End Poplar graph construction"),
+            (construction_end, "Begin compiling Poplar engine"),
+            (compilation_end, "End compiling Poplar engine"),
+        ]
+    )
+
+
+def test_compile_time_per_instance(caplog):
+    stderr = "\n".join(
+        [compile_log("1,0", 10, 20), compile_log("1,1", 10, 22), compile_log("1,2", 11, 21), compile_log("1,3", 30, 40)]
+    )
+    total_compiling_time = get_results_for_compile_time("", stderr, 0)
+
+    assert next(iter(total_compiling_time)) == "mean"
+    assert total_compiling_time["mean"] == 40.0
+    assert total_compiling_time["instances"]["[1,3]"] == {
+        "pre_poplar_compilation_time": 5.0,
+        "graph_construction_time": 25.0,
+        "poplar_compilation_time": 10.0,
+        "total": 40.0,
+    }
+    assert total_compiling_time["num_instances"] == 4
+    assert total_compiling_time["max_instance_time"] == 40.0
+    assert total_compiling_time["min_instance_time"] == 20.0
+    assert total_compiling_time["skew"] == 20.0
+    assert total_compiling_time["slowest_instance"] == "[1,3]"
+    assert "instance [1,3]" in caplog.text and "graph_construction_time" in caplog.text
+
+
+def test_failed_compile_has_no_breakdown():
+    assert get_results_for_compile_time("", compile_log("1,0", 10, 20), 1) == {"mean": None}
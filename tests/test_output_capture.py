@@ -0,0 +1,56 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import sys
+from pathlib import Path
+
+from examples_utils.benchmarks.log_view_utils import LogView
+from examples_utils.benchmarks.run_benchmarks import run_and_monitor_progress
+
+# Writes 'size_mb' MB of log lines on stdout and a few lines on stderr
+LOG_WRITER = """
+import sys
+line = "INFO: step 12345, throughput 1234.5 samples/sec " + "x" * 50 + "\\n"
+block = line * (1024 * 1024 // len(line))
+for _ in range({size_mb}):
+    sys.stdout.write(block)
+sys.stderr.write("done \\u00e9\\n")
+"""
+
+
+def run_log_writer(tmp_path: Path, size_mb: int, **kwargs):
+    script = tmp_path / "writer.py"
+    script.write_text(LOG_WRITER.format(size_mb=size_mb))
+    with open(tmp_path / "output.log", "w") as listener:
+        return run_and_monitor_progress([sys.executable, str(script)], listener, monitor_ipus=False, **kwargs)
+
+
+def test_capture_in_memory_without_spool_paths(tmp_path: Path):
+    out, err, exitcode, _ = run_log_writer(tmp_path, 1)
+    assert exitcode == 0
+    assert isinstance(out, LogView) and len(out.splitlines()) > 1000
+    assert err == "done é\n"
+
+
+def test_capture_to_spool_files(tmp_path: Path):
+    out_path, err_path = tmp_path / "stdout", tmp_path / "stderr"
+    out, err, exitcode, _ = run_log_writer(tmp_path, 1, stdout_path=out_path, stderr_path=err_path)
+    assert exitcode == 0
+    assert "done é" in err
+    assert str(err) == err_path.read_text() == "done é\n"
+    assert sum(1 for _ in out.split("\n")) == out_path.read_text().count("\n")
+    assert (tmp_path / "output.log").stat().st_size == out_path.stat().st_size + err_path.stat().st_size
+    out.close()
+    err.close()
+
+
+def test_large_output_is_spooled_not_buffered(tmp_path: Path):
+    """The output is written to the spool files as it is read, the logs
+    returned are views of these files rather than copies kept in memory"""
+    size_mb = 8
+    out_path, err_path = tmp_path / "stdout", tmp_path / "stderr"
+    out, err, exitcode, _ = run_log_writer(tmp_path, size_mb, stdout_path=out_path, stderr_path=err_path)
+    assert exitcode == 0
+    assert out_path.stat().st_size >= size_mb * 1024**2 * 0.99
+    assert out.file_path == out_path and err.file_path == err_path
+    assert out.tail(1)[0].startswith("INFO: step 12345, throughput 1234.5 samples/sec")
+    out.close()
+    err.close()
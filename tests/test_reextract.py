@@ -0,0 +1,106 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import json
+from pathlib import Path
+
+
+def reextract_spec(write_spec, script: Path, benchmark: dict) -> Path:
+    return write_spec({"reextract_pod4_gen": {"generated": True, "cmd": f"python3 {script}", **benchmark}})
+
+
+def test_reextract_with_fixed_regex_and_new_metrics(tmp_path: Path, write_spec, run_examples_utils):
+    script = tmp_path / "run.py"
+    script.write_text("for i in range(4):\n    print(f'throughput: {100 + i} samples/sec', flush=True)\n")
+    log_dir = tmp_path / "logs"
+
+    # The regex does not match the log, the variant fails
+    spec = reextract_spec(write_spec, script, {"data": {"throughput": {"regexp": r"throughput (\d+)"}}})
+    run_examples_utils("benchmark", "--spec", spec, "--log-dir", log_dir)
+    variant_result = json.loads((log_dir / "reextract_pod4_gen" / "variant_result.json").read_text())
+    assert variant_result["exitcode"] == 1
+    assert variant_result["results"]["throughput"] == {"mean": None}
+
+    hooks = tmp_path / "hooks.py"
+    hooks.write_text(
+        "from examples_utils.benchmarks.custom_metrics import register_custom_metric\n"
+        "register_custom_metric('num_lines', lambda stdout, stderr, exitcode: len(stdout.splitlines()))\n"
+    )
+    spec = reextract_spec(
+        write_spec,
+        script,
+        {
+            "data": {"throughput": {"regexp": r"throughput: (\d+)"}},
+            "derived": {"throughput_k": {"expr": "{throughput} / 1000"}},
+        },
+    )
+    run_examples_utils(
+        "benchmark-reextract",
+        "--spec",
+        spec,
+        "--log-dir",
+        log_dir,
+        "--custom-metrics-files",
+        hooks,
+        "--csv-metrics",
+        "throughput_k",
+    )
+
+    variant_result = json.loads((log_dir / "reextract_pod4_gen" / "variant_result.json").read_text())
+    assert variant_result["exitcode"] == 0
+    assert variant_result["results"]["throughput"] == {"mean": 101.5}
+    assert variant_result["results"]["throughput_k"] == {"mean": 0.1015}
+    assert variant_result["results"]["num_lines"] == 4
+    assert "num_lines" in variant_result["metric_hook_times"]
+
+    benchmark_results = json.loads((log_dir / "benchmark_results.json").read_text())
+    assert benchmark_results["reextract_pod4_gen"][0]["results"] == variant_result["results"]
+    csv_lines = (log_dir / "benchmark_results.csv").read_text().splitlines()
+    assert csv_lines[1].startswith('"reextract_pod4_gen","reextract_pod4_gen","101.5"')
+    assert csv_lines[1].endswith('"0.1015"')
+
+
+def test_reextract_repeated_runs(tmp_path: Path, write_spec, run_examples_utils):
+    script = tmp_path / "run.py"
+    script.write_text("print('throughput 100 latency 2.0')\nprint('throughput 200 latency 4.0')\n")
+    log_dir = tmp_path / "logs"
+    spec = reextract_spec(write_spec, script, {"data": {"throughput": {"regexp": r"throughput (\d+)"}}})
+    run_examples_utils("benchmark", "--spec", spec, "--log-dir", log_dir, "--repeat", "2")
+
+    spec = reextract_spec(
+        write_spec,
+        script,
+        {"data": {"throughput": {"regexp": r"throughput (\d+)"}, "latency": {"regexp": r"latency ([\d.]+)"}}},
+    )
+    run_examples_utils("benchmark-reextract", "--spec", spec, "--log-dir", log_dir)
+
+    variant_result = json.loads((log_dir / "reextract_pod4_gen" / "variant_result.json").read_text())
+    assert variant_result["exitcode"] == 0
+    assert variant_result["repeats"]["measured_runs"] == 2
+    assert [r["latency"]["mean"] for r in variant_result["repeats"]["run_results"]] == [3.0, 3.0]
+    assert variant_result["results"]["latency"]["mean"] == 3.0
+    assert variant_result["results"]["throughput"]["mean"] == 150.0
+
+
+def test_reextract_keeps_failed_repeated_runs(tmp_path: Path, write_spec, run_examples_utils):
+    counter = tmp_path / "runs.txt"
+    script = tmp_path / "run.py"
+    script.write_text(
+        f"with open({str(counter)!r}, 'a') as f:\n"
+        "    f.write('run\\n')\n"
+        f"runs = open({str(counter)!r}).read().count('run')\n"
+        "print('throughput 100')\n"
+        "raise SystemExit(3 if runs == 2 else 0)\n"
+    )
+    log_dir = tmp_path / "logs"
+    spec = reextract_spec(write_spec, script, {"data": {"throughput": {"regexp": r"throughput (\d+)"}}})
+    run_examples_utils("benchmark", "--spec", spec, "--log-dir", log_dir, "--repeat", "3")
+
+    variant_result = json.loads((log_dir / "reextract_pod4_gen" / "variant_result.json").read_text())
+    assert variant_result["failed_run"] == "repeat_1"
+    assert variant_result["exitcode"] == 3
+
+    (log_dir / "not_a_variant").mkdir()
+    output = run_examples_utils("benchmark-reextract", "--spec", spec, "--log-dir", log_dir)
+    assert "Skipping 'not_a_variant'" in output
+    benchmark_results = json.loads((log_dir / "benchmark_results.json").read_text())
+    assert benchmark_results["reextract_pod4_gen"][0]["exitcode"] == 3
+    assert benchmark_results["reextract_pod4_gen"][0]["failed_run"] == "repeat_1"
@@ -0,0 +1,105 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import csv
+import json
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pytest
+
+from examples_utils.benchmarks.logging_utils import save_results
+from examples_utils.benchmarks.regression_utils import compare_to_baseline, compare_variant
+from examples_utils.testing import test_commands
+
+
+def variant(throughput: dict, latency: float = 1.0, compile_time: float = 100.0) -> dict:
+    return {
+        "variant_name": "a_pod4",
+        "exitcode": 0,
+        "results": {
+            "throughput": throughput,
+            "latency": {"mean": latency},
+            "total_compiling_time": {"mean": compile_time},
+        },
+    }
+
+
+def test_regressions_beyond_thresholds():
+    comparison = compare_variant(
+        variant({"mean": 90.0}, latency=1.2, compile_time=105.0),
+        variant({"mean": 100.0}),
+        regression_threshold=0.05,
+        compile_time_threshold=0.1,
+    )
+    assert comparison["throughput"]["degradation"] == 0.1
+    assert comparison["throughput"]["regression"]
+    assert comparison["latency"]["regression"]
+    assert not comparison["total_compiling_time"]["regression"]
+
+
+def test_improvements_are_not_regressions():
+    comparison = compare_variant(
+        variant({"mean": 120.0}, latency=0.5, compile_time=50.0), variant({"mean": 100.0}), 0.05, 0.1
+    )
+    assert not any(c["regression"] for c in comparison.values())
+
+
+def test_noisy_repeated_measurements_are_not_regressions():
+    noisy = {"run_num_samples": 3, "run_stddev": 10.0}
+    precise = {"run_num_samples": 10, "run_stddev": 0.5}
+    assert not compare_variant(variant({"mean": 92.0, **noisy}), variant({"mean": 100.0, **noisy}), 0.05, 0.1)[
+        "throughput"
+    ]["regression"]
+    assert compare_variant(variant({"mean": 92.0, **precise}), variant({"mean": 100.0, **precise}), 0.05, 0.1)[
+        "throughput"
+    ]["regression"]
+
+
+def test_failed_metrics_are_not_compared(tmp_path: Path):
+    current = variant({"mean": 100.0})
+    current["results"]["total_compiling_time"] = None
+    comparison = compare_variant(current, variant({"mean": 100.0}), 0.05, 0.1)
+    assert "total_compiling_time" not in comparison
+    save_results(tmp_path, False, {"a": [current]})
+    with open(tmp_path / "benchmark_results.csv") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]["total_compiling_time"] == ""
+
+
+def test_regressions_in_csv_and_junit(tmp_path: Path):
+    results = {"a": [variant({"mean": 50.0})]}
+    assert compare_to_baseline(results, {"a_pod4": variant({"mean": 100.0})}, 0.05, 0.1) == ["a_pod4"]
+    save_results(tmp_path, False, results)
+
+    with open(tmp_path / "benchmark_results.csv") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]["regressions"] == "throughput 50.0% worse than baseline"
+    failures = ET.parse(tmp_path / "benchmark_results.xml").findall(".//failure")
+    assert [failure.get("type") for failure in failures] == ["regression"]
+
+
+def test_regression_exit_code(tmp_path: Path, write_spec, run_examples_utils):
+    script = tmp_path / "run.py"
+    script.write_text("print('throughput 100')\n")
+    spec = write_spec(
+        {
+            "compared_pod4_gen": {
+                "generated": True,
+                "cmd": f"python3 {script}",
+                "data": {"throughput": {"regexp": r"throughput (\d+)"}},
+            }
+        }
+    )
+    run_examples_utils("benchmark", "--spec", spec, "--log-dir", tmp_path / "baseline")
+    baseline_path = tmp_path / "baseline" / "benchmark_results.json"
+
+    # Same results as the baseline
+    run_examples_utils("benchmark", "--spec", spec, "--baseline", baseline_path)
+
+    # The baseline was faster
+    baseline = json.loads(baseline_path.read_text())
+    baseline["compared_pod4_gen"][0]["results"]["throughput"]["mean"] = 120
+    baseline_path.write_text(json.dumps(baseline))
+    with pytest.raises(test_commands.CalledProcessError) as error:
+        run_examples_utils("benchmark", "--spec", spec, "--baseline", baseline_path)
+    assert error.value.__cause__.returncode == 1
+    assert "REGRESSION" in error.value.output
@@ -0,0 +1,110 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import json
+import os
+from pathlib import Path
+
+from examples_utils.benchmarks.cache_utils import (
+    evict_cache_entries,
+    get_variant_fingerprint,
+    load_cached_result,
+    store_result,
+)
+
+FINGERPRINT_ARGS = ("python3 train.py --batch-size 4", {"POPLAR_ENGINE_OPTIONS": "{}"}, "abc123", "3.2.0")
+
+
+def test_fingerprint_is_stable():
+    assert get_variant_fingerprint(*FINGERPRINT_ARGS) == get_variant_fingerprint(*FINGERPRINT_ARGS)
+
+
+def test_fingerprint_ignores_volatile_env():
+    command, env, commit, sdk = FINGERPRINT_ARGS
+    assert get_variant_fingerprint(command, {**env, "PWD": "/elsewhere"}, commit, sdk) == get_variant_fingerprint(
+        *FINGERPRINT_ARGS
+    )
+
+
+def test_fingerprint_changes_with_inputs(tmp_path: Path):
+    command, env, commit, sdk = FINGERPRINT_ARGS
+    reference = get_variant_fingerprint(*FINGERPRINT_ARGS)
+    assert get_variant_fingerprint(command + " --epochs 2", env, commit, sdk) != reference
+    assert get_variant_fingerprint(command, {**env, "POPLAR_ENGINE_OPTIONS": "x"}, commit, sdk) != reference
+    assert get_variant_fingerprint(command, env, "def456", sdk) != reference
+    assert get_variant_fingerprint(command, env, commit, "3.3.0") != reference
+
+    requirements = tmp_path / "requirements.txt"
+    requirements.write_text("numpy==1.24\n")
+    with_requirements = get_variant_fingerprint(*FINGERPRINT_ARGS, requirements)
+    requirements.write_text("numpy==1.25\n")
+    assert get_variant_fingerprint(*FINGERPRINT_ARGS, requirements) != with_requirements
+
+
+def make_variant_logs(log_dir: Path, stdout: str) -> Path:
+    log_dir.mkdir(parents=True)
+    (log_dir / "stdout").write_text(stdout)
+    (log_dir / "stderr").write_text("")
+    return log_dir
+
+
+def test_store_and_load(tmp_path: Path):
+    cache_dir = tmp_path / "cache"
+    result = {"variant_name": "a", "start_time": "then", "test_duration": 1.0}
+    store_result(cache_dir, "f1", result, make_variant_logs(tmp_path / "run1", "throughput 10\n"))
+
+    assert load_cached_result(cache_dir, "f2", tmp_path) is None
+
+    restored_dir = make_variant_logs(tmp_path / "run2", "")
+    assert load_cached_result(cache_dir, "f1", restored_dir) == result
+    assert (restored_dir / "stdout").read_text() == "throughput 10\n"
+
+
+def test_incomplete_entry_is_ignored(tmp_path: Path):
+    cache_dir = tmp_path / "cache"
+    store_result(cache_dir, "f1", {"variant_name": "a"}, make_variant_logs(tmp_path / "run1", ""))
+    os.remove(cache_dir / "f1" / "cache_entry.json")
+    assert load_cached_result(cache_dir, "f1", tmp_path / "run1") is None
+
+
+def test_least_recently_used_evicted(tmp_path: Path):
+    cache_dir = tmp_path / "cache"
+    for i, name in enumerate(["old", "used", "new"]):
+        entry = cache_dir / name
+        entry.mkdir(parents=True)
+        os.utime(entry, (i, i))
+    os.utime(cache_dir / "used", (10, 10))
+
+    evict_cache_entries(cache_dir, 2)
+    assert sorted(p.name for p in cache_dir.iterdir()) == ["new", "used"]
+
+
+def test_unchanged_variant_not_rerun(tmp_path: Path, write_spec, run_examples_utils):
+    counter = tmp_path / "runs.txt"
+    script = tmp_path / "count_runs.py"
+    script.write_text(f"with open({str(counter)!r}, 'a') as f:\n    f.write('run\\n')\nprint('throughput 42')\n")
+    spec = write_spec(
+        {
+            "cached_pod4_gen": {
+                "generated": True,
+                "cmd": f"python3 {script}",
+                "data": {"throughput": {"regexp": r"throughput (\d+)"}},
+            }
+        }
+    )
+
+    for log_dir in ("logs1", "logs2"):
+        run_examples_utils(
+            "benchmark",
+            "--spec",
+            spec,
+            "--reuse-results",
+            "--results-cache-dir",
+            tmp_path / "cache",
+            "--log-dir",
+            tmp_path / log_dir,
+        )
+
+    assert counter.read_text() == "run\n"
+    with open(tmp_path / "logs2" / "cached_pod4_gen" / "variant_result.json") as f:
+        variant_result = json.load(f)
+    assert variant_result["results"]["throughput"]["mean"] == 42
+    assert "cached_result" in variant_result
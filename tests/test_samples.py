@@ -0,0 +1,72 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+from pathlib import Path
+
+import numpy as np
+
+from examples_utils.benchmarks.metrics_utils import MetricsExtractor
+from examples_utils.benchmarks.samples_utils import load_samples
+
+EXTRACTION_CONFIG = {
+    "throughput": {"regexp": r"throughput (\d+)"},
+    "loss": {"regexp": r"loss ([\d.]+)", "reduction_type": "final"},
+}
+
+
+def test_samples_from_processed_log(tmp_path: Path):
+    stdout = "start\nthroughput 10\nnothing\nthroughput 20 loss 0.5\n"
+    stderr = "[1,0]<stderr>: throughput 30\n[1,1]<stderr>: throughput 40\n"
+    extractor = MetricsExtractor(EXTRACTION_CONFIG, record_samples=True)
+    # The log is given in several blocks, line numbers continue across them
+    extractor.process_text("start\nthroughput 10", "stdout")
+    extractor.process_text("nothing\nthroughput 20 loss 0.5\n", "stdout")
+    extractor.process_log(stderr, "stderr")
+    extractor.samples.save(tmp_path / "samples.npz")
+
+    samples = load_samples(tmp_path)
+    assert samples["metric"].tolist() == ["throughput", "throughput", "loss", "throughput", "throughput"]
+    assert samples["value"].tolist() == [10, 20, 0.5, 30, 40]
+    assert samples["stream"].tolist() == ["stdout"] * 3 + ["stderr"] * 2
+    assert samples["line"].tolist() == [1, 3, 3, 0, 1]
+    assert samples["instance"].tolist() == ["", "", "", "[1,0]", "[1,1]"]
+    assert np.isnan(samples["timestamp"]).all()
+
+    results, failed = extractor.get_results(0, 1)
+    assert not failed and results["throughput"]["mean"] == 25
+    assert stdout.split("\n")[samples["line"][1]] == "throughput 20 loss 0.5"
+
+
+def test_samples_and_instance_reductions_agree(tmp_path: Path):
+    stdout = "[1,0]<stdout>: throughput 10\n[1,1]<stdout>: throughput 30\nthroughput 50\n"
+    config = {"throughput": {"regexp": r"throughput (\d+)", "instance_reduction": "sum"}}
+    extractor = MetricsExtractor(config, record_samples=True)
+    extractor.process_log(stdout, "stdout")
+    extractor.samples.save(tmp_path / "samples.npz")
+
+    samples = load_samples(tmp_path)
+    assert samples["instance"].tolist() == ["[1,0]", "[1,1]", ""]
+    results, failed = extractor.get_results(0, 1)
+    assert not failed
+    assert sorted(results["throughput"]["instances"]) == ["N/A", "[1,0]", "[1,1]"]
+
+
+def test_samples_saved_with_capture_time(tmp_path: Path, write_spec, run_examples_utils):
+    script = tmp_path / "run.py"
+    script.write_text(
+        "import sys, time\n"
+        "for i in range(3):\n"
+        "    print(f'throughput {100 + i}', flush=True)\n"
+        "    print(f'[1,{i}]<stderr>: loss 0.{i}', file=sys.stderr, flush=True)\n"
+        "    time.sleep(0.2)\n"
+    )
+    spec = write_spec({"sampled_pod4_gen": {"generated": True, "cmd": f"python3 {script}", "data": EXTRACTION_CONFIG}})
+    log_dir = tmp_path / "logs"
+    run_examples_utils("benchmark", "--spec", spec, "--log-dir", log_dir, "--save-samples")
+
+    samples = load_samples(log_dir / "sampled_pod4_gen" / "samples.npz")
+    throughput = samples["metric"] == "throughput"
+    assert samples["value"][throughput].tolist() == [100, 101, 102]
+    assert samples["line"][throughput].tolist() == [0, 1, 2]
+    assert samples["instance"][~throughput].tolist() == ["[1,0]", "[1,1]", "[1,2]"]
+    timestamps = samples["timestamp"][throughput]
+    assert not np.isnan(timestamps).any()
+    assert 0.3 < timestamps[-1] - timestamps[0] < 5
@@ -0,0 +1,103 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from examples_utils.benchmarks import scheduling_utils
+
+
+def sleep_and_time(duration: float):
+    start = time.time()
+    time.sleep(duration)
+    return {"start": start, "end": time.time()}
+
+
+def overlaps(a: dict, b: dict) -> bool:
+    return a["start"] < b["end"] and b["start"] < a["end"]
+
+
+def test_ipu_demand_from_name():
+    assert scheduling_utils.get_variant_ipu_demand("pytorch_bert_pod16_train", 64) == 16
+
+
+@pytest.mark.parametrize("name", ["no_size_in_name", "pytorch_bert_pod128_train"])
+def test_ipu_demand_defaults_to_whole_budget(name):
+    assert scheduling_utils.get_variant_ipu_demand(name, 64) == 64
+
+
+def test_variants_packed_within_budget():
+    jobs = [
+        ("a_pod4", (1.0,)),
+        ("b_pod8", (1.0,)),
+        ("c_pod4", (1.0,)),
+    ]
+    results = scheduling_utils.run_variants_in_parallel(jobs, sleep_and_time, max_ipus=8)
+
+    assert set(results) == {"a_pod4", "b_pod8", "c_pod4"}
+    # The two pod4 variants share the budget, the pod8 one needs all of it
+    assert overlaps(results["a_pod4"], results["c_pod4"])
+    assert not overlaps(results["a_pod4"], results["b_pod8"])
+    assert not overlaps(results["c_pod4"], results["b_pod8"])
+
+
+def test_worker_error_is_raised():
+    with pytest.raises(TypeError):
+        scheduling_utils.run_variants_in_parallel([("a_pod4", ("not a duration",))], sleep_and_time, max_ipus=4)
+
+
+def test_compile_pipeline_reports_overlap():
+    with scheduling_utils.CompilePipeline(sleep_and_time, num_workers=2) as pipeline:
+        pipeline.submit("a", 0.5)
+        pipeline.submit("b", 0.5)
+        # Simulate the execution of another variant while both compile
+        time.sleep(1.0)
+        stats = pipeline.wait_for("a")
+        assert pipeline.wait_for("unknown") is None
+
+    assert stats["compile_time"] == pytest.approx(0.5, abs=0.2)
+    assert stats["wait_time"] < 0.2
+    assert stats["overlap_saving"] == pytest.approx(stats["compile_time"] - stats["wait_time"])
+
+
+def test_compile_pipeline_failure_is_not_fatal():
+    with scheduling_utils.CompilePipeline(sleep_and_time, num_workers=1) as pipeline:
+        pipeline.submit("a", "not a duration")
+        assert pipeline.wait_for("a") is None
+
+
+def test_executions_use_executables_compiled_ahead(tmp_path: Path, write_spec, run_examples_utils):
+    script = tmp_path / "cached_compile.py"
+    script.write_text(
+        "import os, sys, time\n"
+        "executable = os.path.join(os.environ['POPLAR_EXECUTABLE_CACHE_DIR'], sys.argv[1] + '.popef')\n"
+        "if os.path.exists(executable):\n"
+        "    print('loaded from cache')\n"
+        "else:\n"
+        "    time.sleep(1)\n"
+        "    os.makedirs(os.path.dirname(executable), exist_ok=True)\n"
+        "    open(executable, 'w').close()\n"
+        "if '--compile-only' not in sys.argv:\n"
+        "    print('throughput', sys.argv[1])\n"
+    )
+    spec = write_spec(
+        {
+            "pipelined_pod4_gen": {
+                "generated": True,
+                "cmd": f"python3 {script} {{value}}",
+                "parameters": {"value": "10,20"},
+                "data": {"throughput": {"regexp": r"throughput (\d+)"}},
+            }
+        }
+    )
+    log_dir = tmp_path / "logs"
+    run_examples_utils("benchmark", "--spec", spec, "--log-dir", log_dir, "--pipeline-compile")
+
+    with open(log_dir / "benchmark_results.json") as f:
+        variant_results = json.load(f)["pipelined_pod4_gen"]
+    for variant_result in variant_results:
+        assert Path(variant_result["log_paths"]["out"]).read_text().startswith("loaded from cache")
+        assert variant_result["compile_pipeline"]["compile_exitcode"] == 0
+        assert variant_result["compile_pipeline"]["overlap_saving"] >= 0
+        assert variant_result["results"]["throughput"]["mean"] is not None
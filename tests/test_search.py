@@ -0,0 +1,96 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import json
+from pathlib import Path
+
+import pytest
+
+from examples_utils.benchmarks.search_utils import (
+    DEFAULT_SEARCH_CONFIG,
+    get_rung_budgets,
+    get_search_config,
+    successive_halving,
+)
+
+
+def test_rung_budgets():
+    assert get_rung_budgets(1, 81, 3, 100) == [1, 3, 9, 27, 81]
+    # No more rungs than needed to bring the candidates down to one
+    assert get_rung_budgets(1, 81, 3, 9) == [9, 27, 81]
+    assert get_rung_budgets(10, 10, 3, 9) == [10]
+    assert get_rung_budgets(0.5, 2.0, 2, 8) == [0.5, 1.0, 2.0]
+
+
+def test_successive_halving_spends_budget_on_best_candidates():
+    search_config = get_search_config(
+        "bench", {"search": {"budget_parameter": "steps", "min_budget": 10, "max_budget": 90}}
+    )
+    candidates = [{"batch_size": str(batch_size)} for batch_size in range(1, 10)]
+    runs = []
+
+    def run_variant(variant_name: str, variant_dict: dict) -> dict:
+        runs.append(variant_dict)
+        batch_size, steps = int(variant_dict["batch_size"]), int(variant_dict["steps"])
+        if batch_size == 9:
+            return {"exitcode": 1, "results": {"throughput": {"mean": None}}}
+        # Throughput peaks at batch size 6, measurements are noisier with few steps
+        throughput = 100 - (batch_size - 6) ** 2 + (5 if batch_size == 4 and steps < 30 else 0)
+        return {"exitcode": 0, "results": {"throughput": {"mean": throughput}}}
+
+    summary = successive_halving("bench", candidates, run_variant, search_config, lambda d: str(d))
+
+    assert summary["budgets"] == [10, 30, 90]
+    assert [run["steps"] for run in runs] == ["10"] * 9 + ["30"] * 3 + ["90"]
+    assert {run["batch_size"] for run in runs if run["steps"] == "30"} == {"4", "5", "6"}
+    assert summary["best"]["params"] == {"batch_size": "6"}
+    assert summary["best"]["budget"] == 90
+    assert len(summary["trials"]) == 13
+    assert summary["trials"][8]["score"] is None
+
+
+def test_invalid_search_config():
+    with pytest.raises(ValueError):
+        get_search_config("bench", {"search": {"budget_parameter": "steps"}})
+    with pytest.raises(ValueError):
+        get_search_config("bench", {"search": {"goal": "max"}})
+    for min_budget, max_budget in [(10, 5), (0, 5), (-1, 5)]:
+        with pytest.raises(ValueError, match="min_budget"):
+            get_search_config(
+                "bench", {"search": {"budget_parameter": "steps", "min_budget": min_budget, "max_budget": max_budget}}
+            )
+
+
+def test_search_without_rungs():
+    search_config = {**DEFAULT_SEARCH_CONFIG, "budget_parameter": "steps", "min_budget": 10, "max_budget": 5}
+    summary = successive_halving("bench", [{"batch_size": "1"}], lambda name, params: {}, search_config, str)
+    assert summary["best"] is None and summary["trials"] == []
+
+
+def test_search_end_to_end(tmp_path: Path, write_spec, run_examples_utils):
+    script = tmp_path / "run.py"
+    script.write_text(
+        "import sys\n"
+        "batch_size, steps = int(sys.argv[1]), int(sys.argv[2])\n"
+        "for _ in range(steps):\n"
+        "    print(f'throughput {1000 - (batch_size - 8) ** 2}')\n"
+    )
+    benchmark = {
+        "generated": True,
+        "cmd": f"python3 {script} {{batch_size}} {{steps}}",
+        "parameters": {"batch_size": {"pow2": [1, 32]}},
+        "data": {"throughput": {"regexp": r"throughput (\d+)"}},
+        "search": {"budget_parameter": "steps", "min_budget": 2, "max_budget": 8, "eta": 2},
+    }
+    spec = write_spec({"search_pod4_gen": benchmark})
+    log_dir = tmp_path / "logs"
+    run_examples_utils("benchmark", "--spec", spec, "--log-dir", log_dir, "--search")
+
+    search_results = json.loads((log_dir / "search_results.json").read_text())["search_pod4_gen"]
+    assert search_results["budgets"] == [2, 4, 8]
+    assert search_results["best"]["params"] == {"batch_size": "8"}
+    assert search_results["best"]["score"] == 1000
+    assert [trial["rung"] for trial in search_results["trials"]] == [0] * 6 + [1] * 3 + [2] * 2
+
+    benchmark_results = json.loads((log_dir / "benchmark_results.json").read_text())
+    assert len(benchmark_results["search_pod4_gen"]) == 11
+    assert benchmark_results["search_pod4_gen"][-2]["variant_name"] == "search_pod4_gen_batch_size_8_steps_8"
+    assert benchmark_results["search_pod4_gen"][-2]["search"] == {"rung": 2, "budget": 8, "score": 1000.0}
@@ -0,0 +1,94 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import io
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from examples_utils.benchmarks.slurm_array_utils import SlurmArrayScheduler
+
+FAKE_SLURM_DIR = Path(__file__).parent / "test_files" / "fake_slurm"
+
+
+@pytest.fixture()
+def fake_slurm(tmp_path: Path, monkeypatch) -> Path:
+    """Run the local stand-ins of the SLURM commands, returns their state directory"""
+    state_dir = tmp_path / "slurm_state"
+    monkeypatch.setenv("PATH", f"{FAKE_SLURM_DIR}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_SLURM_DIR", str(state_dir))
+    return state_dir
+
+
+def run_job(variant_dir: Path, script: str, slurm_runner, timeout=None, run: int = 0):
+    """Run a job the way `run_benchmark_variant` does"""
+    run_dir = variant_dir / f"run_{run}"
+    run_dir.mkdir(parents=True)
+    job_script_path = run_dir / "submit.sh"
+    job_script_path.write_text("#!/bin/bash\n" + script)
+    listener = io.StringIO()
+    stdout, stderr, exitcode = slurm_runner(
+        cmd=["runonpod16.sh", "--wait", str(job_script_path)],
+        job_name=variant_dir.name,
+        stdout_log_path=str(run_dir / "stdout"),
+        stderr_log_path=str(run_dir / "stderr"),
+        listener=listener,
+        env=dict(os.environ),
+        timeout=timeout,
+        submission_command=["runonpod16.sh"],
+        job_script_path=str(job_script_path),
+    )
+    return str(stdout), str(stderr), exitcode, listener.getvalue()
+
+
+def test_variants_are_submitted_together(tmp_path: Path, fake_slurm: Path, monkeypatch):
+    def run_variant(variant_dir: Path, exitcode: int, num_jobs: int, slurm_runner=None) -> dict:
+        outputs = []
+        for run in range(num_jobs):
+            script = f"echo 'throughput {exitcode}{run}'\necho 'warning' >&2\nexit {exitcode}\n"
+            outputs.append(run_job(variant_dir, script, slurm_runner, run=run))
+        # The working directory is restored after each job
+        assert Path.cwd() == tmp_path
+        return {"outputs": outputs}
+
+    monkeypatch.chdir(tmp_path)
+    finished = []
+    jobs = [(name, (tmp_path / name, exitcode, num_jobs)) for name, exitcode, num_jobs in [("a", 0, 2), ("b", 3, 1)]]
+    scheduler = SlurmArrayScheduler(tmp_path / "logs", poll_period=0.1)
+    results = scheduler.run_variants(jobs, run_variant, lambda name, result: finished.append(name))
+
+    assert sorted(finished) == ["a", "b"]
+    assert results["a"]["outputs"] == [
+        ("throughput 00\n", "warning\n", 0, "throughput 00\nwarning\n"),
+        ("throughput 01\n", "warning\n", 0, "throughput 01\nwarning\n"),
+    ]
+    assert results["b"]["outputs"] == [("throughput 30\n", "warning\n", 3, "throughput 30\nwarning\n")]
+
+    # The first job of each variant goes in one array, the second job of 'a' in the next
+    submissions = [json.loads(line) for line in (fake_slurm / "submissions.jsonl").read_text().splitlines()]
+    assert [submission[0] for submission in submissions] == ["--array=0-1", "--array=0-0"]
+    assert (tmp_path / "logs" / "slurm_arrays" / "benchmark_array_0.sh").exists()
+    assert not (fake_slurm / "cancellations").exists()
+
+
+def test_timed_out_job_is_cancelled(tmp_path: Path, fake_slurm: Path, monkeypatch):
+    def run_variant(variant_dir: Path, script: str, timeout, slurm_runner=None) -> tuple:
+        return run_job(variant_dir, script, slurm_runner, timeout=timeout)
+
+    monkeypatch.chdir(tmp_path)
+    jobs = [("slow", (tmp_path / "slow", "echo started\nsleep 60\n", 0.5)), ("fast", (tmp_path / "fast", "", 30))]
+    results = SlurmArrayScheduler(tmp_path / "logs", poll_period=0.1).run_variants(jobs, run_variant)
+
+    stdout, stderr, exitcode, _ = results["slow"]
+    assert stdout == "started\n"
+    assert "Timeout (0.5)" in stderr and exitcode == 1
+    assert results["fast"][2] == 0
+    assert (fake_slurm / "cancellations").read_text() == "1_0\n"
+
+
+def test_variant_errors_are_raised(tmp_path: Path, fake_slurm: Path):
+    def run_variant(slurm_runner=None):
+        raise RuntimeError("variant failed")
+
+    with pytest.raises(RuntimeError, match="variant failed"):
+        SlurmArrayScheduler(tmp_path, poll_period=0.1).run_variants([("a", ())], run_variant)
@@ -0,0 +1,117 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import json
+from pathlib import Path
+
+import pytest
+
+from examples_utils.benchmarks.statistics_utils import (
+    aggregate_results,
+    detect_warmup,
+    has_converged,
+    student_t_critical_value,
+    summarise_samples,
+)
+
+
+@pytest.mark.parametrize(
+    "confidence,dof,expected",
+    [(0.95, 1, 12.706), (0.95, 2, 4.303), (0.95, 5, 2.571), (0.95, 30, 2.042), (0.99, 10, 3.169)],
+)
+def test_student_t_critical_value(confidence, dof, expected):
+    assert student_t_critical_value(confidence, dof) == pytest.approx(expected, abs=1e-3)
+
+
+def test_summarise_samples():
+    summary = summarise_samples([98.0, 100.0, 102.0])
+    assert summary["mean"] == pytest.approx(100.0)
+    assert summary["stddev"] == pytest.approx(2.0)
+    assert summary["cv"] == pytest.approx(0.02)
+    half_width = 4.303 * 2.0 / 3**0.5
+    assert summary["ci_low"] == pytest.approx(100.0 - half_width, rel=1e-4)
+    assert summary["ci_high"] == pytest.approx(100.0 + half_width, rel=1e-4)
+    assert summary["relative_ci_width"] == pytest.approx(2 * half_width / 100.0, rel=1e-4)
+
+
+def test_single_sample_has_no_interval():
+    summary = summarise_samples([5.0])
+    assert summary["mean"] == 5.0 and summary["ci_low"] is None and summary["num_samples"] == 1
+
+
+def test_warmup_detection_of_quantised_values():
+    # The steady values are constant, their MAD is 0
+    assert detect_warmup([1001, 999] * 3 + [1000] * 14) == 0
+    assert detect_warmup([10, 500, 900] + [1000] * 17) == 3
+
+
+def test_no_warmup_detected_keeps_all_values():
+    # No value of the first half reaches the level of the second half
+    assert detect_warmup([float(i) for i in range(1, 12)] + [1000.0, 1001.0] * 5) == 0
+
+
+def test_has_converged():
+    assert not has_converged({"throughput": [100.0, 100.0]}, 0.1)
+    assert has_converged({"throughput": [100.0, 100.5, 99.5]}, 0.1)
+    assert not has_converged({"throughput": [100.0, 100.5, 99.5], "latency": [1.0, 2.0, 3.0]}, 0.1)
+
+
+def test_aggregate_results_keeps_reduction_type_first():
+    run_results = [
+        {"throughput": {"final": 10.0}, "total_compiling_time": {"mean": 5.0}},
+        {"throughput": {"final": 20.0}, "total_compiling_time": {"mean": 6.0}},
+    ]
+    results = aggregate_results(run_results, ["throughput"])
+    assert next(iter(results["throughput"])) == "final"
+    assert results["throughput"]["final"] == pytest.approx(15.0)
+    assert results["throughput"]["run_num_samples"] == 2
+    assert results["total_compiling_time"] == {"mean": 6.0}
+
+
+def test_repeats_stop_once_interval_is_narrow(tmp_path: Path, write_spec, run_examples_utils):
+    counter = tmp_path / "runs.txt"
+    script = tmp_path / "noisy.py"
+    script.write_text(
+        f"with open({str(counter)!r}, 'a') as f:\n"
+        "    f.write('run\\n')\n"
+        f"runs = open({str(counter)!r}).read().count('run')\n"
+        "print('throughput', [100, 101, 99, 100, 100, 100][runs - 1])\n"
+    )
+    spec = write_spec(
+        {
+            "repeated_pod4_gen": {
+                "generated": True,
+                "cmd": f"python3 {script}",
+                "data": {"throughput": {"regexp": r"throughput (\d+)"}},
+            }
+        }
+    )
+    log_dir = tmp_path / "logs"
+    run_examples_utils(
+        "benchmark", "--spec", spec, "--log-dir", log_dir, "--warmup-runs", "1", "--repeat", "5", "--target-ci", "0.1"
+    )
+
+    # One warmup run, then the measurements stop after the minimum of 3 runs
+    assert counter.read_text().count("run") == 4
+    with open(log_dir / "benchmark_results.json") as f:
+        variant_result = json.load(f)["repeated_pod4_gen"][0]
+    assert variant_result["repeats"]["measured_runs"] == 3
+    assert variant_result["repeats"]["converged"]
+    throughput = variant_result["results"]["throughput"]
+    assert throughput["mean"] == pytest.approx(100.0)
+    assert throughput["run_ci_low"] < 100.0 < throughput["run_ci_high"]
+    assert (log_dir / "repeated_pod4_gen" / "warmup_0" / "stdout").read_text() == "throughput 100\n"
+
+
+def test_aggregate_results_averages_other_reduction_types():
+    run_results = [{"latency": {"p50": 1.0, "p99": 4.0}}, {"latency": {"p50": 3.0, "p99": 6.0}}]
+    results = aggregate_results(run_results, ["latency"])
+    assert list(results["latency"])[:2] == ["p50", "p99"]
+    assert results["latency"]["p50"] == pytest.approx(2.0)
+    assert results["latency"]["p99"] == pytest.approx(5.0)
+
+
+def test_aggregate_results_keeps_reductions_named_like_statistics():
+    run_results = [{"loss": {"mean": 1.0, "stddev": stddev}} for stddev in (0.1, 0.2, 0.3)]
+    results = aggregate_results(run_results, ["loss"])
+    assert results["loss"]["stddev"] == pytest.approx(0.2)
+    assert results["loss"]["run_stddev"] == 0.0
+    assert results["loss"]["run_num_samples"] == 3
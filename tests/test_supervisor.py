@@ -0,0 +1,68 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from examples_utils.benchmarks.supervisor_utils import pidfd_supported, run_supervised, supervise_process
+
+
+def test_timeout_is_precise(tmp_path: Path):
+    start = time.monotonic()
+    with open(tmp_path / "output.log", "w") as listener:
+        out, err, exitcode, _ = run_supervised(
+            supervise_process(
+                [sys.executable, "-c", "import time; print('started', flush=True); time.sleep(30)"],
+                listener,
+                timeout=0.5,
+                trace_period=None,
+                monitor_ipus=False,
+            )
+        )
+    assert time.monotonic() - start < 3
+    assert exitcode != 0
+    assert out == "started\n"
+    assert "Timeout (0.5)" in err
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 12) and not pidfd_supported(), reason="Processes are waited for by threads without pidfds"
+)
+def test_many_processes_without_threads(tmp_path: Path):
+    num_processes = 20
+    thread_counts = []
+
+    async def supervise_all():
+        async def count_threads():
+            while True:
+                thread_counts.append(threading.active_count())
+                await asyncio.sleep(0.05)
+
+        counter = asyncio.create_task(count_threads())
+        with open(tmp_path / "output.log", "w") as listener:
+            results = await asyncio.gather(
+                *(
+                    supervise_process(
+                        [sys.executable, "-c", f"import time; time.sleep(0.5); print({i})"],
+                        listener,
+                        trace_period=None,
+                        monitor_ipus=False,
+                    )
+                    for i in range(num_processes)
+                )
+            )
+        counter.cancel()
+        return results
+
+    threads_before = threading.active_count()
+    start = time.monotonic()
+    results = run_supervised(supervise_all())
+
+    # The processes ran concurrently
+    assert time.monotonic() - start < num_processes * 0.5
+    assert [out for out, _, _, _ in results] == [f"{i}\n" for i in range(num_processes)]
+    assert all(exitcode == 0 for _, _, exitcode, _ in results)
+    assert max(thread_counts) == threads_before
@@ -0,0 +1,156 @@
+# Copyright (c) 2023 Graphcore Ltd. All rights reserved.
+import json
+from pathlib import Path
+
+import pytest
+
+from examples_utils.benchmarks.command_utils import create_variants, fan_out_results, get_benchmark_variants
+from examples_utils.benchmarks.variant_utils import VariantSpace, generate_values, iter_variants
+
+SPEC_PATH = {"benchmark_path": "benchmarks.yml"}
+
+
+def test_variants_keep_their_order():
+    matrix = {"parameters": {"batch_size": "3,4", "gradient_accumulation": "150,120"}, **SPEC_PATH}
+    assert create_variants("bench", matrix) == [
+        {"batch_size": "3", "gradient_accumulation": "150"},
+        {"batch_size": "4", "gradient_accumulation": "150"},
+        {"batch_size": "3", "gradient_accumulation": "120"},
+        {"batch_size": "4", "gradient_accumulation": "120"},
+    ]
+    declarative = {"parameters": [["batch_size", "steps"], [3, 150], [4, 120]], **SPEC_PATH}
+    assert create_variants("bench", declarative) == [
+        {"batch_size": "3", "steps": "150"},
+        {"batch_size": "4", "steps": "120"},
+    ]
+    assert create_variants("bench", SPEC_PATH) == [{}]
+
+    space = VariantSpace("bench", matrix)
+    assert [space[i] for i in range(len(space))] == list(space)
+
+
+def test_generated_parameter_values():
+    assert generate_values("steps", {"range": [10, 40, 10]}) == ["10", "20", "30", "40"]
+    assert generate_values("ratio", {"range": [0.1, 0.3, 0.1]}) == ["0.1", "0.2", "0.3"]
+    assert generate_values("lr", {"logspace": [1e-4, 1e-1, 4]}) == ["0.0001", "0.001", "0.01", "0.1"]
+    assert generate_values("batch_size", {"pow2": [3, 64]}) == ["4", "8", "16", "32", "64"]
+    with pytest.raises(ValueError):
+        generate_values("batch_size", {"geometric": [1, 2]})
+
+    benchmark = {"parameters": {"batch_size": {"pow2": [1, 4]}, "device": ["ipu", "cpu"]}, **SPEC_PATH}
+    assert len(create_variants("bench", benchmark)) == 6
+
+
+def test_variant_filter():
+    benchmark = {
+        "parameters": {"batch_size": {"pow2": [1, 1024]}, "gradient_accumulation": {"pow2": [1, 1024]}},
+        "variant_filter": "{batch_size} >= 4",
+        **SPEC_PATH,
+    }
+    variants = get_benchmark_variants("bench", benchmark, "{batch_size} * {gradient_accumulation} == 1024")
+    assert [v["config"]["batch_size"] for v in variants] == ["1024", "512", "256", "128", "64", "32", "16", "8", "4"]
+    assert variants[0]["name"] == "bench_batch_size_1024_gradient_accumulation_1"
+
+    # The command line filter is not applied to benchmarks without its parameters
+    assert len(get_benchmark_variants("bench", benchmark, "{precision} == '16.16'")) == 99
+
+    # Parameters compared with strings are not converted to numbers
+    benchmark = {"parameters": {"precision": ["16.16", "16.32", "32.32"], "batch_size": [4, 8]}, **SPEC_PATH}
+    variants = get_benchmark_variants("bench", benchmark, "{precision} == '16.16' and {batch_size} > 4")
+    assert [v["config"] for v in variants] == [{"precision": "16.16", "batch_size": "8"}]
+    variants = get_benchmark_variants("bench", benchmark, "{precision} in ('16.32', '32.32') and {precision} > 20")
+    assert [v["config"]["precision"] for v in variants] == ["32.32", "32.32"]
+
+    with pytest.raises(ValueError):
+        get_benchmark_variants("bench", benchmark, "__import__('os')")
+    with pytest.raises(ValueError):
+        get_benchmark_variants("bench", {**benchmark, "variant_filter": "{unknown} > 1"})
+
+
+def test_sampling_a_large_matrix():
+    # One million variants, which are never all created
+    parameters = {name: {"range": [0, 99]} for name in ("a", "b", "c")}
+    benchmark = {"parameters": parameters, **SPEC_PATH}
+
+    sampled = list(iter_variants("bench", benchmark, num_samples=20, seed=1))
+    assert len(sampled) == 20 and len({tuple(v.values()) for v in sampled}) == 20
+    assert sampled == list(iter_variants("bench", benchmark, num_samples=20, seed=1))
+    assert sampled != list(iter_variants("bench", benchmark, num_samples=20, seed=2))
+
+    # A Latin hypercube design uses a different tenth of each parameter in each variant
+    sampled = list(iter_variants("bench", benchmark, num_samples=10, sampling_method="latin-hypercube"))
+    assert len(sampled) == 10
+    for name in parameters:
+        assert sorted(int(v[name]) // 10 for v in sampled) == list(range(10))
+
+    # Sampling from the variants selected by a filter
+    benchmark = {"parameters": {name: {"range": [0, 19]} for name in "abc"}, **SPEC_PATH}
+    sampled = list(iter_variants("bench", benchmark, "{a} + {b} + {c} < 6", num_samples=15))
+    assert len(sampled) == 15
+    assert all(int(v["a"]) + int(v["b"]) + int(v["c"]) < 6 for v in sampled)
+
+
+def test_duplicate_variants_are_coalesced():
+    benchmark = {
+        "cmd": "python3 run.py --batch-size {batch_size}",
+        "parameters": {"batch_size": "1,2", "unused": "a,b"},
+        **SPEC_PATH,
+    }
+    variants = get_benchmark_variants("bench", benchmark, coalesce=True)
+    assert [v["name"] for v in variants] == ["bench_batch_size_1_unused_a", "bench_batch_size_2_unused_a"]
+    assert [a["name"] for a in variants[0]["aliases"]] == ["bench_batch_size_1_unused_b"]
+    assert len(get_benchmark_variants("bench", benchmark)) == 4
+
+    results = fan_out_results(variants, [{"variant_name": v["name"], "params": v["config"]} for v in variants])
+    assert [r["variant_name"] for r in results] == [
+        "bench_batch_size_1_unused_a",
+        "bench_batch_size_1_unused_b",
+        "bench_batch_size_2_unused_a",
+        "bench_batch_size_2_unused_b",
+    ]
+    assert results[1]["params"] == {"batch_size": "1", "unused": "b"}
+    assert results[1]["coalesced_with"] == "bench_batch_size_1_unused_a"
+
+    # Parameters used by derived metrics make variants different
+    derived = {**benchmark, "derived": {"per_item": {"expr": "{throughput} / {unused}"}}}
+    assert len(get_benchmark_variants("bench", derived, coalesce=True)) == 4
+
+
+def test_coalesced_variants_end_to_end(tmp_path: Path, write_spec, run_examples_utils):
+    script = tmp_path / "run.py"
+    script.write_text("import sys\nprint(f'throughput {sys.argv[1]}')\nprint('ran', file=open('runs', 'a'))\n")
+    benchmark = {
+        "generated": True,
+        "cmd": f"python3 {script} {{batch_size}}",
+        "parameters": [["batch_size", "label"], [4, "a"], [8, "b"], [4, "c"]],
+        "data": {"throughput": {"regexp": r"throughput (\d+)"}},
+    }
+    spec = write_spec({"dup_pod4_gen": benchmark})
+    log_dir = tmp_path / "logs"
+    run_examples_utils("benchmark", "--spec", spec, "--log-dir", log_dir)
+
+    assert len((tmp_path / "runs").read_text().splitlines()) == 2
+    benchmark_results = json.loads((log_dir / "benchmark_results.json").read_text())["dup_pod4_gen"]
+    assert [r["variant_name"] for r in benchmark_results] == [
+        "dup_pod4_gen_batch_size_4_label_a",
+        "dup_pod4_gen_batch_size_4_label_c",
+        "dup_pod4_gen_batch_size_8_label_b",
+    ]
+    assert benchmark_results[1]["results"]["throughput"] == {"mean": 4.0}
+    assert len((log_dir / "benchmark_results.csv").read_text().splitlines()) == 4
+    report = json.loads((log_dir / "coalesced_variants.json").read_text())
+    assert report == {
+        "dup_pod4_gen": {
+            "dup_pod4_gen_batch_size_4_label_a": {
+                "dup_pod4_gen_batch_size_4_label_c": {"batch_size": "4", "label": "c"},
+            }
+        }
+    }
+
+    # Re-extracting the metrics gives the aliases their results again
+    run_examples_utils("benchmark-reextract", "--spec", spec, "--log-dir", log_dir)
+    reextracted_results = json.loads((log_dir / "benchmark_results.json").read_text())["dup_pod4_gen"]
+    assert [r["variant_name"] for r in reextracted_results] == [r["variant_name"] for r in benchmark_results]
+    assert reextracted_results[1]["coalesced_with"] == "dup_pod4_gen_batch_size_4_label_a"
+    assert reextracted_results[1]["params"] == {"batch_size": "4", "label": "c"}
+    assert len((log_dir / "benchmark_results.csv").read_text().splitlines()) == 4